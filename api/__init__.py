@@ -1,2 +1,3 @@
-from flask import Blueprint
-from .routes import api_blueprint
\ No newline at end of file
+from .routes import api_blueprint
+
+__all__ = ["api_blueprint"]
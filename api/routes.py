@@ -1,40 +1,62 @@
 from __future__ import annotations
 
 import base64
+import hashlib
 import io
 import json
+import keyword
 # Standard library
+import logging
 import os
+import re
+import threading
+import time
 import uuid
+from collections import defaultdict
+from uuid import UUID as _UUID
+from concurrent.futures import ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from datetime import datetime, date
 
+import orjson
 import requests
 from PIL import Image
 # Third-party
-from flask import Blueprint, jsonify, current_app, request, abort, g, url_for
+from flask import Blueprint, jsonify, current_app, request, abort, g, url_for, stream_with_context
 from flask import current_app
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import raiseload, selectinload
+from werkzeug.exceptions import HTTPException
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename, send_from_directory
 from werkzeug.security import check_password_hash
 from werkzeug.security import generate_password_hash
-from sqlalchemy import func, or_
+from sqlalchemy import DateTime, and_, bindparam, delete, exists, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import IntegrityError, DataError
-from functools import wraps
-from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
 import secrets
 
 # Export/seed utilities
-from models.scripts.replay_changes import seed_from_changes, write_changes_delete, write_changes_upsert
-from models.base import SessionLocal
+from models.scripts.replay_changes import (
+    seed_from_changes,
+    write_changes_delete,
+    write_changes_delete_many,
+    write_changes_upsert,
+)
+from models.base import Base, ScopedSession, SessionLocal
 from services.image_processing_service import ImageProcessingService
 from services.reminder_service import ReminderService
 
 # Local application
 from services.repository_service import RepositoryService
 from utils.jwt_helper import generate_token, validate_token
-from models.entities import SizeEnum, QuestionOption
+from utils.json_provider import orjson_dumps
+from utils.compression import compress_json_response
+from models.entities import SizeEnum, QuestionOption, HealthStatus
 from models.entities import (
+    AppMeta,
     Disease,
     Family,
     Friendship,
@@ -50,10 +72,41 @@ from models.entities import (
     WateringPlan,
     RefreshToken,
     UserQuestionAnswer,
+    gen_uuid7,
 )
 
 api_blueprint = Blueprint("api", __name__)
-repo = RepositoryService()
+logger = logging.getLogger(__name__)
+
+
+def get_repo() -> RepositoryService:
+    """
+    RepositoryService della richiesta corrente (g.repo), che punta all'istanza
+    per-processo registrata dall'app factory in app.extensions["repo"].
+    """
+    if "repo" not in g:
+        g.repo = current_app.extensions["repo"]
+    return g.repo
+
+
+@api_blueprint.before_request
+def _bind_repo():
+    get_repo()
+
+
+@api_blueprint.teardown_request
+def _remove_scoped_session(exc=None):
+    # rilascia la sessione della richiesta (la connessione torna nel pool)
+    ScopedSession.remove()
+
+
+@api_blueprint.after_request
+def _compress_response(response):
+    return compress_json_response(response, request.accept_encodings)
+
+
+# le route che usano il nome di modulo "repo" passano comunque da g.repo
+repo = LocalProxy(get_repo)
 REFRESH_TTL_DAYS = int(os.getenv("REFRESH_TTL_DAYS", "90"))
 DISEASE_PROB_THRESHOLD = float(os.getenv("DISEASE_PROB_THRESHOLD", "0.05"))
 UPLOAD_FOLDER = "uploads"
@@ -124,7 +177,7 @@ def auth_login():
         rt = RefreshToken(
             user_id=str(u.id),
             token=raw_refresh,
-            expires_at=datetime.utcnow() + timedelta(days=REFRESH_TTL_DAYS),
+            expires_at=_now() + timedelta(days=REFRESH_TTL_DAYS),
         )
         s.add(rt)
         # se vuoi tracciare anche qui:
@@ -168,7 +221,7 @@ def auth_refresh():
     if not raw:
         return jsonify({"error": "refresh token mancante"}), 401
 
-    now = datetime.utcnow()
+    now = _now()
     with _session_ctx() as s:
         rt = s.query(RefreshToken).filter(RefreshToken.token == raw).first()
         if not rt or rt.expires_at < now:
@@ -231,6 +284,18 @@ def require_jwt(fn):
 
 # ========= Helpers =========
 
+def _now() -> datetime:
+    """
+    Istante UTC (naive, come le colonne DATETIME) della richiesta corrente:
+    calcolato una volta per richiesta e riusato da tutte le scritture.
+    datetime.utcnow() è deprecato da Python 3.12.
+    """
+    now = g.get("_now")
+    if now is None:
+        now = g._now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now
+
+
 def _collect_plant_cascade_ids(session, plant_id: str):
     """
     Raccoglie TUTTE le entità figlie legate a una plant, per poi loggarle
@@ -329,36 +394,31 @@ def _log_plant_cascade_to_changes(plant_id: str, cascade: dict):
     write_changes_delete("plant", plant_id)
 
     # plant_photo
-    for pid in cascade["photo_ids"]:
-        write_changes_delete("plant_photo", pid)
+    write_changes_delete_many("plant_photo", cascade["photo_ids"])
+    _invalidate_catalog("plant", "plant_photo")
+    _invalidate_main_photo(plant_id, catalog=False)
 
     # user_plant (PK composta, via upsert con _delete=True)
     if cascade["user_plant_pairs"]:
         write_changes_upsert("user_plant", cascade["user_plant_pairs"])
 
     # watering_plan
-    for wid in cascade["watering_plan_ids"]:
-        write_changes_delete("watering_plan", wid)
+    write_changes_delete_many("watering_plan", cascade["watering_plan_ids"])
 
     # watering_log
-    for lid in cascade["watering_log_ids"]:
-        write_changes_delete("watering_log", lid)
+    write_changes_delete_many("watering_log", cascade["watering_log_ids"])
 
     # plant_disease
-    for pdid in cascade["plant_disease_ids"]:
-        write_changes_delete("plant_disease", pdid)
+    write_changes_delete_many("plant_disease", cascade["plant_disease_ids"])
 
     # shared_plant
-    for sid in cascade["shared_plant_ids"]:
-        write_changes_delete("shared_plant", sid)
+    write_changes_delete_many("shared_plant", cascade["shared_plant_ids"])
 
     # question
-    for qid in cascade["question_ids"]:
-        write_changes_delete("question", qid)
+    write_changes_delete_many("question", cascade["question_ids"])
 
     # reminder
-    for rid in cascade["reminder_ids"]:
-        write_changes_delete("reminder", rid)
+    write_changes_delete_many("reminder", cascade["reminder_ids"])
 
 
 def _remove_plant_files(photos):
@@ -376,6 +436,7 @@ def _remove_plant_files(photos):
                     dirpath = os.path.dirname(full)
                     try:
                         os.rmdir(dirpath)
+                        _forget_dirs()
                     except OSError:
                         # cartella non vuota → ok
                         pass
@@ -385,17 +446,19 @@ def _remove_plant_files(photos):
                 )
 
 
-def _model_columns(Model) -> set[str]:
-    """Returns the SQLAlchemy column names of the Model."""
-    return {c.name for c in Model.__table__.columns}
+@lru_cache(maxsize=None)
+def _model_columns(Model) -> frozenset[str]:
+    """Returns the SQLAlchemy column names of the Model (computed once per model)."""
+    return frozenset(c.name for c in Model.__table__.columns)
 
 
 def _filter_fields_for_model(payload: dict, Model, *, exclude: set[str] = None) -> dict:
     """Filters the payload keeping only fields that exist on the Model."""
-    cols = _model_columns(Model)
+    keys = payload.keys() & _model_columns(Model)
     if exclude:
-        cols = cols - set(exclude)
-    return {k: v for k, v in payload.items() if k in cols}
+        keys -= exclude
+    return {k: payload[k] for k in keys}
+
 
 
 def _serialize_full_plant(plant):
@@ -440,21 +503,42 @@ def _serialize_full_plant(plant):
     }
 
 
+def _encode_photo_webp(plant_id: str, filename: str) -> str | None:
+    """Ritorna la foto (ridimensionata) come WEBP base64, oppure None."""
+    resized_filename = _get_or_create_resized_image(plant_id, filename)
+    filename_only = os.path.basename(resized_filename or filename)
+    image_path = os.path.join(UPLOAD_FOLDER, plant_id, filename_only)
+
+    logger.debug("[LOG] Tentativo lettura immagine: %s", image_path)
+
+    try:
+        with Image.open(image_path) as img:
+            img = img.convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="WEBP", quality=70, method=6)
+            webp_bytes = buf.getvalue()
+
+        return base64.b64encode(webp_bytes).decode("ascii")
+    except Exception as e:
+        logger.warning("[WARN] Image compress failed for %s: %s", filename, e)
+        return None
+
+
 def _serialize_with_relations(instance):
-    print("\n===== DEBUG _serialize_with_relations START =====")
+    logger.debug("===== DEBUG _serialize_with_relations START =====")
 
     # Serializziamo UserPlant
     data = _serialize_instance(instance)
-    print("[LOG] DATA (dopo _serialize_instance):", data)
+    logger.debug("[LOG] DATA (dopo _serialize_instance): %s", data)
 
     plant = getattr(instance, "plant", None)
     if not plant:
-        print("[LOG] Nessuna plant associata! RETURN")
-        print("===== DEBUG _serialize_with_relations END =====\n")
+        logger.debug("[LOG] Nessuna plant associata! RETURN")
+        logger.debug("===== DEBUG _serialize_with_relations END =====")
         return data
 
-    print("[LOG] Plant trovata, ID:", plant.id)
-    print("[LOG] SIZE RAW:", plant.size, type(plant.size))
+    logger.debug("[LOG] Plant trovata, ID: %s", plant.id)
+    logger.debug("[LOG] SIZE RAW: %s %s", plant.size, type(plant.size))
 
     # SERIALIZZAZIONE MANUALE DELLA PIANTA
     plant_data = {
@@ -473,7 +557,7 @@ def _serialize_with_relations(instance):
         "created_at": plant.created_at.isoformat() if plant.created_at else None,
     }
 
-    print("[LOG] plant_data PRIMA DI SIZE:", plant_data)
+    logger.debug("[LOG] plant_data PRIMA DI SIZE: %s", plant_data)
 
     # ENUM → STRING
     if plant.size is not None:
@@ -484,56 +568,38 @@ def _serialize_with_relations(instance):
     plant_data["size"] = size_value
     data["size"] = size_value
 
-    print("[LOG] plant_data DOPO SIZE:", plant_data)
-    print("[LOG] data DOPO SIZE:", data)
+    logger.debug("[LOG] plant_data DOPO SIZE: %s", plant_data)
+    logger.debug("[LOG] data DOPO SIZE: %s", data)
 
     # --- FOTO ---
     photos = getattr(plant, "photos", [])
     serialized_photos = []
 
-    print("[LOG] Numero foto:", len(photos))
+    logger.debug("[LOG] Numero foto: %s", len(photos))
 
     for photo in photos:
         photo_data = _serialize_instance(photo)
-        print("[LOG] Foto base:", photo_data)
+        logger.debug("[LOG] Foto base: %s", photo_data)
 
         plant_id = str(plant.id)
         filename = photo.url
 
         if not filename:
-            print("[LOG] Foto senza filename → aggiunta senza immagine")
+            logger.debug("[LOG] Foto senza filename → aggiunta senza immagine")
             serialized_photos.append(photo_data)
             continue
 
-        resized_filename = _get_or_create_resized_image(plant_id, filename)
-        filename_only = os.path.basename(resized_filename or filename)
-        image_path = os.path.join(UPLOAD_FOLDER, plant_id, filename_only)
-
-        print("[LOG] Tentativo lettura immagine:", image_path)
-
-        image_b64 = None
-        try:
-            with Image.open(image_path) as img:
-                img = img.convert("RGB")
-                buf = io.BytesIO()
-                img.save(buf, format="WEBP", quality=70, method=6)
-                webp_bytes = buf.getvalue()
-
-            image_b64 = base64.b64encode(webp_bytes).decode("ascii")
-        except Exception as e:
-            print(f"[WARN] Image compress failed for {filename}: {e}")
-
-        photo_data["image"] = image_b64
+        photo_data["image"] = _encode_photo_webp(plant_id, filename)
         serialized_photos.append(photo_data)
 
     plant_data["photos"] = serialized_photos
 
-    print("[LOG] plant_data FINALE:", plant_data)
+    logger.debug("[LOG] plant_data FINALE: %s", plant_data)
 
     data["plant"] = plant_data
 
-    print("[LOG] data FINALE PRIMA DEL RETURN:", data)
-    print("===== DEBUG _serialize_with_relations END =====\n")
+    logger.debug("[LOG] data FINALE PRIMA DEL RETURN: %s", data)
+    logger.debug("===== DEBUG _serialize_with_relations END =====")
 
     return data
 
@@ -563,7 +629,7 @@ def _get_or_create_resized_image(plant_id: str, filename: str) -> str | None:
 
     # Se non esiste neanche l'originale, non posso fare nulla
     if not os.path.exists(orig_path):
-        print(f"[WARN] Original image not found: {orig_path}")
+        logger.warning("[WARN] Original image not found: %s", orig_path)
         return None
 
     try:
@@ -572,72 +638,345 @@ def _get_or_create_resized_image(plant_id: str, filename: str) -> str | None:
             img.thumbnail(MAX_SIZE)
             os.makedirs(os.path.dirname(resized_path), exist_ok=True)
             img.save(resized_path, format="JPEG", quality=80, optimize=True)
-            print(f"[DEBUG] Created resized image: {resized_path}")
+            logger.debug("[DEBUG] Created resized image: %s", resized_path)
             return resized_name
     except Exception as e:
-        print(f"[ERROR] Failed to resize image {orig_path}: {e}")
+        logger.error("[ERROR] Failed to resize image %s: %s", orig_path, e)
         return None
 
 
+def _iso_or_none(v):
+    # le istanze appena scritte (expire_on_commit=False) possono avere ancora
+    # la stringa ISO ricevuta dal client al posto del datetime
+    if v is None or v.__class__ is str:
+        return v
+    return v.isoformat()
+
+
+def _str_or_none(v):
+    return str(v) if v is not None else None
+
+
+@lru_cache(maxsize=None)
+def _serializers(Model) -> tuple:
+    """
+    (nome colonna, convertitore) per ogni colonna del Model, calcolati una
+    volta per classe. Convertitore None = valore restituito così com'è.
+    """
+    out = []
+    for c in Model.__table__.columns:
+        if isinstance(c.type, DateTime):
+            conv = _iso_or_none
+        else:
+            try:
+                py_type = c.type.python_type
+            except NotImplementedError:
+                py_type = None
+            # stessi casi del vecchio check hasattr(v, "hex"): UUID/bytes/float → str
+            conv = _str_or_none if py_type is not None and hasattr(py_type, "hex") else None
+        out.append((c.name, conv))
+    return tuple(out)
+
+
+_CONV_NAMES = {_iso_or_none: "_iso", _str_or_none: "_str"}
+
+
+@lru_cache(maxsize=None)
+def _compiled_serializer(Model):
+    """
+    Genera (una volta per classe) una funzione con accessi e conversioni
+    scritti in chiaro, es. {"id": obj.id, "created_at": _iso(obj.created_at)}:
+    niente loop né branch per riga.
+    """
+    fields = []
+    for name, conv in _serializers(Model):
+        if name.isidentifier() and not keyword.iskeyword(name):
+            acc = f"obj.{name}"
+        else:
+            acc = f"getattr(obj, {name!r}, None)"
+        if conv is not None:
+            acc = f"{_CONV_NAMES[conv]}({acc})"
+        fields.append(f"        {name!r}: {acc},\n")
+    src = "def _ser(obj):\n    return {\n" + "".join(fields) + "    }\n"
+    ns = {"_iso": _iso_or_none, "_str": _str_or_none}
+    exec(compile(src, f"<serializer {Model.__name__}>", "exec"), ns)
+    return ns["_ser"]
+
+
 def _serialize_instance(instance) -> dict:
     """
     Serializes the instance based on actual model columns:
     - converts UUID/DateTime to strings if needed
     - includes only actual columns (no extra attributes)
     """
-    cols = _model_columns(type(instance))
-    out = {}
-    for c in cols:
-        v = getattr(instance, c, None)
-        # UUID → string (if needed)
-        if v is not None and hasattr(v, "hex"):
-            v = str(v)
-        # datetime → ISO8601
-        if isinstance(v, datetime):
-            v = v.isoformat()
-        out[c] = v
-    return out
+    return _compiled_serializer(type(instance))(instance)
+
+
+# le colonne non cambiano a runtime: pre-calcolate per tutti i modelli all'import
+for _mapper in Base.registry.mappers:
+    _model_columns(_mapper.class_)
+    _compiled_serializer(_mapper.class_)
+
+
+def _json(data, status: int = 200):
+    """
+    Response JSON serializzata con orjson (C, datetime/date in ISO-8601 nativi).
+    Da usare sulle liste grandi al posto di jsonify.
+    """
+    return current_app.response_class(
+        orjson_dumps(data),
+        status=status,
+        mimetype="application/json",
+    )
+
+
+KEYSET_MAX_LIMIT = 1000
+
+
+def _keyset_args():
+    """
+    Legge i parametri di paginazione keyset dalla query string:
+      ?after=<ISO datetime>&after_id=<id>&limit=<n>
+    Senza "limit" la lista è completa (compatibile con i client esistenti).
+    Da chiamare PRIMA di iniziare lo streaming (abort 400 su input non valido).
+    """
+    after_raw = request.args.get("after")
+    after_id = request.args.get("after_id") or None
+    limit_raw = request.args.get("limit")
+
+    after = None
+    if after_raw:
+        after = _parse_iso_datetime(after_raw)
+        if after is None:
+            abort(400, description="Invalid after: expected ISO 8601 datetime")
+        # naive UTC come le colonne: PyMySQL scarterebbe l'offset in silenzio
+        after = _naive_utc(after)
+
+    limit = None
+    if limit_raw:
+        try:
+            limit = int(limit_raw)
+        except ValueError:
+            abort(400, description="Invalid limit")
+        if limit < 1:
+            abort(400, description="Invalid limit")
+        limit = min(limit, KEYSET_MAX_LIMIT)
+
+    return after, after_id, limit
+
+
+def _keyset(query, sort_col, id_col, args, *, descending: bool = False):
+    """
+    Applica ordinamento (sort_col, id_col) e il filtro "dopo il cursore".
+    Il cursore è l'ultima riga ricevuta: after=<sort_col>, after_id=<id>.
+    """
+    after, after_id, limit = args
+
+    if after is not None:
+        if descending:
+            past = sort_col < after
+            tie = id_col < after_id if after_id else None
+        else:
+            past = sort_col > after
+            tie = id_col > after_id if after_id else None
+        query = query.filter(or_(past, and_(sort_col == after, tie)) if tie is not None else past)
+
+    if descending:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.asc(), id_col.asc())
+
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def _stream_json_list(stmt, params=None, serialize=dict, batch_size: int = 500):
+    """
+    Streaming di una lista JSON: le righe di una select() Core arrivano dal
+    DB a blocchi tramite cursore lato server (stream_results + yield_per,
+    SSCursor con PyMySQL: memoria costante qualunque sia la lunghezza
+    della lista) e ogni blocco viene serializzato da orjson con
+    una sola chiamata, senza oggetti ORM e senza materializzare l'intera lista.
+    params: valori dei bindparam di stmt (per le select precostruite)
+    serialize(RowMapping) -> oggetto serializzabile (default: dict colonne→valori)
+
+    Il SELECT resta aperto finché il client non ha letto tutto il corpo:
+    l'hint MAX_EXECUTION_TIME(0) lo esenta dal limite di sessione
+    (DB_MAX_EXECUTION_MS), che altrimenti troncherebbe a metà una lista
+    lunga letta da un client lento, con il 200 già inviato.
+    """
+    def generate():
+        with _session_ctx() as s:
+            result = s.execute(
+                stmt.prefix_with("/*+ MAX_EXECUTION_TIME(0) */", dialect="mysql")
+                .execution_options(stream_results=True, yield_per=batch_size),
+                params,
+            )
+            if serialize is dict:
+                # tuple grezze + nomi colonna una volta sola (niente RowMapping)
+                keys = tuple(result.keys())
+                to_items = lambda part: [dict(zip(keys, r)) for r in part]
+            else:
+                result = result.mappings()
+                to_items = lambda part: [serialize(m) for m in part]
+
+            yield b"["
+            sep = b""
+            for part in result.partitions():
+                # "[a,b,c]" del blocco senza le parentesi esterne
+                yield sep + orjson_dumps(to_items(part))[1:-1]
+                sep = b","
+            yield b"]"
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype="application/json",
+    )
+
+
+def _json_rows(stmt, params=None):
+    """
+    Come _stream_json_list ma bufferizzata: righe Core (niente ORM) lette
+    tutte insieme e serializzate con una sola chiamata orjson. Per le route
+    sotto _catalog_cached, che comunque raccolgono l'intero corpo per
+    metterlo in cache: lo streaming lì terrebbe solo aperto il cursore.
+    """
+    with _session_ctx() as s:
+        result = s.execute(stmt, params)
+        keys = tuple(result.keys())
+        rows = [dict(zip(keys, r)) for r in result]
+    return _json(rows)
 
 
 @contextmanager
 def _session_ctx():
-    s = SessionLocal()
+    # sessione della richiesta corrente (scoped): chiusa a fine blocco,
+    # l'oggetto viene riusato dai blocchi successivi e rimosso in teardown
+    s = ScopedSession()
     try:
         yield s
     finally:
         s.close()
 
 
+# Forma ISO 8601 accettata per i timestamp inviati dai client
+_ISO_RE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}"
+    r"(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?:Z|[+-]\d{2}:?\d{2})?)?$"
+)
+
+
+def _parse_iso_datetime(raw: str) -> datetime | None:
+    """
+    Parsing ISO 8601 con pre-check via regex: l'input malformato viene
+    scartato senza passare da fromisoformat/eccezioni. None se non valido.
+    """
+    if not _ISO_RE.match(raw):
+        return None
+    if raw.endswith("Z"):
+        raw = raw[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:  # es. mese 13
+        return None
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    """datetime con offset → naive UTC (come _now() e le colonne DateTime)."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _coerce_iso_fields(data: dict, fields) -> str | None:
+    """
+    Converte in datetime (naive UTC, come _now()) i campi ISO 8601 presenti
+    in data, in place. Ritorna il nome del primo campo non valido (→ 400),
+    così l'errore emerge prima del round trip al DB e non come 500.
+    """
+    for field in fields:
+        v = data.get(field)
+        if v is None or isinstance(v, datetime):
+            continue
+        dt = _parse_iso_datetime(v) if isinstance(v, str) else None
+        if dt is None:
+            return field
+        data[field] = _naive_utc(dt)
+    return None
+
+
+def _owns_plant(s, user_id: str, plant_id: str) -> bool:
+    """True se esiste il legame UserPlant (EXISTS, senza caricare la riga)."""
+    return bool(
+        s.scalar(
+            select(
+                exists().where(UserPlant.user_id == user_id, UserPlant.plant_id == plant_id)
+            )
+        )
+    )
+
+
+# forma canonica a 36 caratteri (quella che generiamo e che arriva dai client)
+_UUID_RE = re.compile(
+    r"\A[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\Z"
+)
+_match_uuid = _UUID_RE.match
+
+
 def _ensure_uuid(s: str, field: str = "id"):
+    # fast path: regex precompilata sulla forma canonica, senza creare oggetti;
+    # le altre forme accettate da uuid.UUID ({...}, urn:uuid:, 32 hex) passano
+    # dal parse completo. Solo gli errori di formato diventano 400 (il resto
+    # deve emergere come bug vero).
+    if isinstance(s, str) and _match_uuid(s):
+        return
     try:
-        uuid.UUID(str(s))
-    except Exception:
+        _UUID(str(s))
+    except (ValueError, TypeError, AttributeError):
         abort(400, description=f"Invalid {field} format")
 
 
+# i body JSON possono contenere immagini in base64 (create_plant, ...):
+# oltre questa soglia si risponde 413 senza leggere il body
+JSON_BODY_MAX_BYTES = int(os.getenv("JSON_BODY_MAX_BYTES", str(20 * 1024 * 1024)))
+
+
 def _parse_json_body():
     """
     JSON parser robusto che NON va mai in blocco.
     - Usa request.get_data() invece di request.json
     - Non fa buffering lento
     - Funziona dietro localtunnel / ngrok
-    - Supporta payload grandi (base64)
+    - Supporta payload grandi (base64): orjson decodifica direttamente i
+      bytes, senza passare da una str intermedia
+    - Content-Length oltre JSON_BODY_MAX_BYTES → 413 prima di leggere il body
+    - Body vuoto, JSON non valido o non oggetto → 400 (non più 500)
     """
+    if request.content_length is not None and request.content_length > JSON_BODY_MAX_BYTES:
+        abort(413, description=f"Body too large (max {JSON_BODY_MAX_BYTES} bytes)")
+
+    raw = request.get_data(cache=False)
+    logger.debug("[_parse_json_body] RAW length: %s", len(raw))
+
+    if not raw:
+        abort(400, description="Empty body")
 
     try:
-        raw = request.get_data(cache=False, as_text=True)
-        print(f"[_parse_json_body] RAW length: {len(raw)}")
+        body = orjson.loads(raw)
+    except orjson.JSONDecodeError as e:
+        logger.debug("[_parse_json_body] ERRORE PARSING: %s", e)
+        abort(400, description="Invalid JSON body")
 
-        if not raw:
-            raise ValueError("Empty body")
+    if not isinstance(body, dict):
+        abort(400, description="JSON body must be an object")
+    logger.debug("[_parse_json_body] JSON Parsed OK → keys: %s", list(body.keys()))
+    return body
 
-        body = json.loads(raw)
-        print(f"[_parse_json_body] JSON Parsed OK → keys: {list(body.keys())}")
-        return body
 
-    except Exception as e:
-        print("[_parse_json_body] ERRORE PARSING:", e)
-        raise
+# codici MySQL: chiave duplicata (PK/UNIQUE) e FK verso una riga inesistente
+_ER_DUP_ENTRY = 1062
+_ER_NO_REFERENCED_ROW = 1452
 
 
 def _commit_or_409(session):
@@ -654,6 +993,26 @@ def _commit_or_409(session):
         abort(500, description="Commit failed")
 
 
+def _insert_one(s, Model, data: dict) -> dict:
+    """
+    INSERT Core di una riga: niente istanza ORM da tracciare né unit of work.
+    Ritorna la riga serializzata come _serialize_instance, con i default
+    lato Python (id, created_at, ...) già valorizzati. Errori di vincolo o
+    di dati → 409/400 come _commit_or_409. Il commit resta al chiamante.
+    """
+    try:
+        res = s.execute(insert(Model).values(**data))
+    except IntegrityError as e:
+        s.rollback()
+        abort(409, description=f"Conflict: {e.orig}")
+    except DataError as e:
+        s.rollback()
+        abort(400, description=f"Bad data: {e.orig}")
+    row = dict.fromkeys(_model_columns(Model))
+    row.update(res.last_inserted_params())
+    return _compiled_serializer(Model)(SimpleNamespace(**row))
+
+
 def _parse_unknown_threshold(raw_value) -> float | None:
     if raw_value is None:
         return None
@@ -772,35 +1131,35 @@ def check_auth():
 @api_blueprint.route("/user/me", methods=["GET"])
 @require_jwt
 def user_me():
-    print("\n---- [GET /user/me] START ----")
+    logger.debug("---- [GET /user/me] START ----")
 
     user_id = g.user_id
-    print(f"[GET /user/me] Extracted user_id from JWT: {user_id}")
+    logger.debug("[GET /user/me] Extracted user_id from JWT: %s", user_id)
 
-    repo = RepositoryService()
+    repo = g.repo
 
     try:
         with repo.Session() as s:
-            print("[GET /user/me] DB session opened")
+            logger.debug("[GET /user/me] DB session opened")
 
             user = s.query(User).filter(User.id == user_id).first()
 
             if not user:
-                print(f"[GET /user/me] User NOT FOUND in DB → id={user_id}")
-                print("---- [GET /user/me] END (404) ----\n")
+                logger.debug("[GET /user/me] User NOT FOUND in DB → id=%s", user_id)
+                logger.debug("---- [GET /user/me] END (404) ----")
                 return jsonify({"error": "User not found"}), 404
 
-            print(f"[GET /user/me] User found in DB: {user.id} {user.first_name} {user.last_name}")
+            logger.debug("[GET /user/me] User found in DB: %s %s %s", user.id, user.first_name, user.last_name)
 
             serialized = _serialize_instance(user)
-            print("[GET /user/me] Serialized user:", serialized)
+            logger.debug("[GET /user/me] Serialized user: %s", serialized)
 
-            print("---- [GET /user/me] END (200) ----\n")
+            logger.debug("---- [GET /user/me] END (200) ----")
             return jsonify(serialized), 200
 
     except Exception as e:
-        print(f"[GET /user/me] ERROR: {e}")
-        print("---- [GET /user/me] END (500) ----\n")
+        logger.error("[GET /user/me] ERROR: %s", e)
+        logger.debug("---- [GET /user/me] END (500) ----")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -813,21 +1172,21 @@ def ping():
 @api_blueprint.route("/ai/model/disease-detection", methods=["POST"])
 @require_jwt
 def ai_model_disease_detection():
-    print("\n========= [ai_model_disease_detection] REQUEST RECEIVED =========\n")
+    logger.debug("========= [ai_model_disease_detection] REQUEST RECEIVED =========")
 
     if "image" not in request.files:
-        print("[ERROR] Missing 'image' file in request")
+        logger.debug("[ERROR] Missing 'image' file in request")
         return jsonify({"error": "Missing 'image' file in request."}), 400
 
     uploaded_image_file = request.files["image"]
     image_bytes = uploaded_image_file.read()
-    print(f"[DEBUG] Uploaded image size (bytes): {len(image_bytes)}")
+    logger.debug("[DEBUG] Uploaded image size (bytes): %s", len(image_bytes))
 
     image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-    print(f"[DEBUG] Image converted to base64, length = {len(image_base64)}")
+    logger.debug("[DEBUG] Image converted to base64, length = %s", len(image_base64))
 
     uploaded_image_file.stream.seek(0)
-    print("[DEBUG] Reset file stream pointer")
+    logger.debug("[DEBUG] Reset file stream pointer")
 
     body = request.get_json(silent=True) if request.is_json else None
     try:
@@ -835,13 +1194,13 @@ def ai_model_disease_detection():
         if raw_thr is None and isinstance(body, dict):
             raw_thr = body.get("unknown_threshold")
         unknown_threshold = _parse_unknown_threshold(raw_thr)
-        print(f"[DEBUG] Parsed unknown_threshold = {unknown_threshold}")
+        logger.debug("[DEBUG] Parsed unknown_threshold = %s", unknown_threshold)
     except ValueError as exc:
-        print("[ERROR] Invalid unknown_threshold:", exc)
+        logger.debug("[ERROR] Invalid unknown_threshold: %s", exc)
         return jsonify({"error": str(exc)}), 400
 
     family = request.values.get("family") or (body.get("family") if isinstance(body, dict) else None)
-    print(f"[DEBUG] family = {family}")
+    logger.debug("[DEBUG] family = %s", family)
 
     disease_suggestions: list[str] = []
     if request.values:
@@ -854,7 +1213,7 @@ def ai_model_disease_detection():
     # ----------------------------------------------------------------------
     # CALL DISEASE MODEL
     # ----------------------------------------------------------------------
-    print("[ImageProcessingService] Running disease detection inference...")
+    logger.debug("[ImageProcessingService] Running disease detection inference...")
     try:
         result = image_service.disease_detection_raw(
             image_file=uploaded_image_file,
@@ -862,12 +1221,12 @@ def ai_model_disease_detection():
             family=family,
             disease_suggestions=disease_suggestions or None,
         )
-        print("[ImageProcessingService] ← Model inference completed")
+        logger.debug("[ImageProcessingService] ← Model inference completed")
     except ValueError as exc:
-        print("[ImageProcessingService] Model ValueError:", exc)
+        logger.debug("[ImageProcessingService] Model ValueError: %s", exc)
         return jsonify({"error": str(exc)}), 400
     except Exception as exc:
-        print("[ImageProcessingService] Model inference failed:", exc)
+        logger.error("[ImageProcessingService] Model inference failed: %s", exc)
         return jsonify({"error": f"Inference failed: {exc}"}), 502
 
     # ----------------------------------------------------------------------
@@ -879,36 +1238,36 @@ def ai_model_disease_detection():
         .get("classes", [])
     )
 
-    print("[DEBUG] Model returned classes:")
+    logger.debug("[DEBUG] Model returned classes:")
     for c in classes:
-        print(f"    → {c.get('label')}: {c.get('probability')}")
+        logger.debug("→ %s: %s", c.get('label'), c.get('probability'))
 
     # ----------------------------------------------------------------------
     # FAMILY FILTERING (NEW)
     # ----------------------------------------------------------------------
     valid_labels = set(repo.get_diseases_for_family(family)) if family else None
-    print(f"[DEBUG] Valid diseases for family {family}: {valid_labels}")
+    logger.debug("[DEBUG] Valid diseases for family %s: %s", family, valid_labels)
 
     if valid_labels:
         filtered = [c for c in classes if c.get("label") in valid_labels]
         if not filtered:
-            print("[DEBUG] No family-compatible class found → best_label = 'unknown'")
+            logger.debug("[DEBUG] No family-compatible class found → best_label = 'unknown'")
             best_label = "unknown"
         else:
             best = max(filtered, key=lambda x: x.get("probability", 0))
             best_label = best.get("label")
     else:
         # fallback normale
-        print("[DEBUG] No family provided → selecting best overall")
+        logger.debug("[DEBUG] No family provided → selecting best overall")
         best = max(classes, key=lambda x: x.get("probability", 0)) if classes else None
         best_label = best.get("label") if best else None
 
-    print(f"[DEBUG] Best label (after family filter) = {best_label}")
+    logger.debug("[DEBUG] Best label (after family filter) = %s", best_label)
 
     # ----------------------------------------------------------------------
     # ENRICH PREDICTION WITH REPOSITORY
     # ----------------------------------------------------------------------
-    print("[RepositoryService] Enriching prediction with metadata...")
+    logger.debug("[RepositoryService] Enriching prediction with metadata...")
     enriched = repo.enrich_disease_prediction(
         family_id=family,
         predicted_label=best_label,
@@ -936,6 +1295,7 @@ def ai_model_disease_detection():
         image_base64=image_base64,
         caption=f"Detection result: {best_label}",
     )
+    _invalidate_main_photo(plant_id)
 
     repo.update_user_plant_status(
         user_id=user_id,
@@ -1023,7 +1383,108 @@ def ai_model_disease_latest():
     }), 200
 
 
+# Cache delle risposte dei cataloghi (per processo, con TTL come la foto
+# principale). Ogni voce ricorda la versione delle tabelle da cui dipende:
+# _invalidate_catalog(tabella) cambia la versione e le voci collegate
+# smettono di valere, senza scansioni. La versione sta in app_meta
+# ("catalog_version:<tabella>"), così una scrittura servita da un worker
+# invalida subito anche le cache degli altri worker/istanze; la lettura è
+# una SELECT per chiave primaria, molto più leggera della query di catalogo.
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))
+CATALOG_CACHE_SIZE = 256
+# cache lato client/CDN: il client riusa la risposta per max-age secondi,
+# poi rivalida con If-None-Match e riceve 304 senza corpo se non è cambiata
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "60"))
+_CATALOG_CACHE_CONTROL = f"public, max-age={CATALOG_MAX_AGE}, stale-while-revalidate=30"
+_CATALOG_VERSION_PREFIX = "catalog_version:"
+_catalog_versions: dict[str, int] = {}
+_catalog_cache: dict[str, tuple[float, tuple, bytes, str]] = {}
+# con worker gthread più richieste dello stesso processo scrivono insieme:
+# l'incremento get+1 non è atomico e un bump perso lascerebbe voci vecchie
+_catalog_lock = threading.Lock()
+
+
+def _invalidate_catalog(*tables: str) -> None:
+    """
+    Da chiamare dopo ogni scrittura su plant/family/disease/plant_photo,
+    con TUTTE le tabelle toccate in una sola chiamata: un solo upsert
+    multi-riga (e un solo commit) su app_meta.
+    """
+    with _catalog_lock:
+        for t in tables:
+            _catalog_versions[t] = _catalog_versions.get(t, 0) + 1
+
+    # versione condivisa: un token nuovo per tabella, visto da tutti i worker
+    token = uuid.uuid4().hex
+    stmt = mysql_insert(AppMeta).values(
+        [{"key": _CATALOG_VERSION_PREFIX + t, "value": token} for t in tables]
+    )
+    try:
+        with SessionLocal() as s:
+            s.execute(stmt.on_duplicate_key_update(
+                value=stmt.inserted.value, updated_at=_now()
+            ))
+            s.commit()
+    except Exception as e:
+        # resta valido il bump locale; gli altri worker si allineano al TTL
+        logger.warning("[catalog] shared version bump failed for %s: %s", tables, e)
+
+
+def _catalog_shared_versions(stmt) -> tuple:
+    try:
+        with SessionLocal() as s:
+            return tuple(sorted(s.execute(stmt).all()))
+    except Exception as e:
+        logger.warning("[catalog] shared version read failed: %s", e)
+        return ()
+
+
+def _catalog_cached(*tables: str):
+    """
+    Decoratore per le GET di catalogo: su hit ritorna i byte JSON già
+    serializzati, senza encoding e con la sola lettura delle versioni dal
+    DB. Si mettono in cache solo i 200, con ETag (weak: il corpo può uscire
+    compresso) e Cache-Control; un If-None-Match che corrisponde riceve 304
+    senza corpo.
+    """
+    versions_stmt = select(AppMeta.key, AppMeta.value).where(
+        AppMeta.key.in_([_CATALOG_VERSION_PREFIX + t for t in tables])
+    )
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            # versioni lette PRIMA della query: una scrittura concorrente
+            # rende subito obsoleta la voce salvata
+            versions = (
+                tuple(_catalog_versions.get(t, 0) for t in tables),
+                _catalog_shared_versions(versions_stmt),
+            )
+            now = time.monotonic()
+            hit = _catalog_cache.get(key)
+            if hit and hit[0] > now and hit[1] == versions:
+                resp = current_app.response_class(hit[2], mimetype="application/json")
+                etag = hit[3]
+            else:
+                resp = current_app.make_response(fn(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                body = resp.get_data()
+                etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+                if len(_catalog_cache) >= CATALOG_CACHE_SIZE:
+                    _catalog_cache.pop(next(iter(_catalog_cache)), None)
+                _catalog_cache[key] = (now + CATALOG_TTL, versions, body, etag)
+
+            resp.set_etag(etag, weak=True)
+            resp.headers["Cache-Control"] = _CATALOG_CACHE_CONTROL
+            return resp.make_conditional(request)
+        return wrapper
+    return decorator
+
+
 @api_blueprint.route("/families", methods=["GET"])
+@_catalog_cached("family", "plant")
 def get_families():
     try:
         families = repo.get_all_families()
@@ -1052,10 +1513,14 @@ def get_plants():
 
 
 ALLOWED_SIZES = {e.value for e in SizeEnum}
+# lookup valore → membro e messaggio d'errore pronti all'import
+_SIZE_BY_VALUE = {e.value: e for e in SizeEnum}
+_SIZE_ERROR = f"size must be one of {sorted(ALLOWED_SIZES)}"
 
 
 # ========= Plants (catalog) =========
 @api_blueprint.route("/plants/all", methods=["GET"])
+@_catalog_cached("plant", "family", "plant_photo")
 def get_all_plants():
     try:
         plants = repo.get_all_plants_catalog()
@@ -1168,51 +1633,53 @@ def get_full_plant(plant_id):
 @api_blueprint.route("/plant/add", methods=["POST"])
 @require_jwt
 def create_plant():
-    print("\n================== [create_plant] THE REQUEST IS ARRIVED ==================\n")
+    logger.debug("================== [create_plant] THE REQUEST IS ARRIVED ==================")
 
     # LOG PRIMA DI PARSARE
     try:
         raw = request.get_data()
-        print(f"[DEBUG] request.get_data() LENGTH = {len(raw)}")
-        print(f"[DEBUG] request.get_data() FIRST 300 CHARS = {raw[:300]}")
+        logger.debug("[DEBUG] request.get_data() LENGTH = %s", len(raw))
+        logger.debug("[DEBUG] request.get_data() FIRST 300 CHARS = %s", raw[:300])
     except Exception as e:
-        print(f"[DEBUG] ERROR WHILE READING RAW BODY: {e}")
+        logger.debug("[DEBUG] ERROR WHILE READING RAW BODY: %s", e)
 
-    print("[DEBUG] Avvio _parse_json_body()…")
+    logger.debug("[DEBUG] Avvio _parse_json_body()…")
 
     # =====================================================================
     # 1) PARSE JSON BODY
     # =====================================================================
     try:
         body = _parse_json_body()
-        print("[DEBUG] JSON PARSATO CORRETTAMENTE")
+        logger.debug("[DEBUG] JSON PARSATO CORRETTAMENTE")
         # print("[DEBUG] BODY:", body)
+    except HTTPException:
+        raise
     except Exception as e:
-        print("[ERRORE] _parse_json_body() ha fallito:", e)
+        logger.debug("[ERRORE] _parse_json_body() ha fallito: %s", e)
         return jsonify({"error": "Invalid JSON"}), 400
 
     # =====================================================================
     # 2) RECUPERO BASE64
     # =====================================================================
-    print("[DEBUG] Checking the image…")
+    logger.debug("[DEBUG] Checking the image…")
 
     image_b64 = body.get("image")
     if not image_b64:
-        print("[ERRORE] Image non presente nel body JSON")
+        logger.debug("[ERRORE] Image non presente nel body JSON")
         return jsonify({"error": "Field 'image' is required"}), 400
 
-    print(f"[DEBUG] Lunghezza Base64 ricevuta = {len(image_b64)}")
+    logger.debug("[DEBUG] Lunghezza Base64 ricevuta = %s", len(image_b64))
 
     # =====================================================================
     # 3) BASE64 → BYTES
     # =====================================================================
-    print("[DEBUG] Decoding base64…")
+    logger.debug("[DEBUG] Decoding base64…")
 
     try:
         image_bytes = base64.b64decode(image_b64)
-        print(f"[DEBUG] Base64 decoded. Bytes = {len(image_bytes)}")
+        logger.debug("[DEBUG] Base64 decoded. Bytes = %s", len(image_bytes))
     except Exception as e:
-        print("[ERRORE] Base64 non valido:", e)
+        logger.debug("[ERRORE] Base64 non valido: %s", e)
         return jsonify({"error": "Invalid base64 image data"}), 400
 
     # wrapper compatibile col servizio
@@ -1221,37 +1688,37 @@ def create_plant():
             self.stream = io.BytesIO(b)
 
     fake_file = _FileWrapper(image_bytes)
-    print("[DEBUG] _FileWrapper created")
+    logger.debug("[DEBUG] _FileWrapper created")
 
     # =====================================================================
     # 4) CALL TO PLANTNET
     # =====================================================================
-    print("[DEBUG] → Sending the image to PlantNet using ImageProcessing…")
+    logger.debug("[DEBUG] → Sending the image to PlantNet using ImageProcessing…")
 
     try:
         plant_info = image_service.process_image(fake_file)
-        print("[DEBUG] ← Response from PlantNet:", plant_info)
+        logger.debug("[DEBUG] ← Response from PlantNet: %s", plant_info)
     except Exception as e:
-        print("[ERRORE] PlantNet FALLITA:", e)
+        logger.error("[ERRORE] PlantNet FALLITA: %s", e)
         return jsonify({"error": "Image processing failed"}), 500
 
     if not plant_info or not plant_info.get("scientific_name"):
-        print("[ERRORE] Nessun match da PlantNet")
+        logger.debug("[ERRORE] Nessun match da PlantNet")
         return jsonify({"error": "No plant match found from PlantNet"}), 422
 
     scientific_name = plant_info["scientific_name"]
     family_name = plant_info.get("family_name")
 
-    print(f"[DEBUG] scientific_name = {scientific_name}")
-    print(f"[DEBUG] family_name (PlantNet) = {family_name}")
+    logger.debug("[DEBUG] scientific_name = %s", scientific_name)
+    logger.debug("[DEBUG] family_name (PlantNet) = %s", family_name)
 
     # =====================================================================
     # 5) DEFAULTS
     # =====================================================================
-    print("[DEBUG] Load defaults  from repository…")
+    logger.debug("[DEBUG] Load defaults  from repository…")
 
     defaults = repo.get_plant_defaults(scientific_name) or {}
-    print("[DEBUG] Defaults caricati:", defaults)
+    logger.debug("[DEBUG] Defaults caricati: %s", defaults)
 
     # Base payload: scientific_name + tutto ciò che il JSON conosce
     payload = {
@@ -1259,13 +1726,13 @@ def create_plant():
         **{k: v for k, v in defaults.items() if v is not None},
     }
 
-    print("[DEBUG] Payload:", payload)
+    logger.debug("[DEBUG] Payload: %s", payload)
 
     # =====================================================================
     # 6) ID + TIMESTAMPS
     # =====================================================================
     cols = _model_columns(Plant)
-    now = datetime.utcnow()
+    now = _now()
 
     if "id" in cols and "id" not in payload:
         payload["id"] = str(uuid.uuid4())
@@ -1273,12 +1740,12 @@ def create_plant():
     payload["created_at"] = now
     payload["updated_at"] = now
 
-    print("[DEBUG] Payload with ID + timestamps:", payload)
+    logger.debug("[DEBUG] Payload with ID + timestamps: %s", payload)
 
     # =====================================================================
     # 7) NORMALIZZAZIONI CAMPI
     # =====================================================================
-    print("[DEBUG] Normalization…")
+    logger.debug("[DEBUG] Normalization…")
 
     # use
     if "use" in cols:
@@ -1328,23 +1795,23 @@ def create_plant():
         if insects is not None:
             payload["pests"] = insects
 
-    print("[DEBUG] Payload after normalizzazione:", payload)
+    logger.debug("[DEBUG] Payload after normalizzazione: %s", payload)
 
     # =====================================================================
     # 8) VALIDAZIONE NUMERICA
     # =====================================================================
-    print("[DEBUG] Numeric validation…")
+    logger.debug("[DEBUG] Numeric validation…")
 
     try:
         wl = int(payload["water_level"])
         ll = int(payload["light_level"])
         if not (1 <= wl <= 5) or not (1 <= ll <= 5):
-            print("[ERRORE] Valori acqua/luce fuori range")
+            logger.debug("[ERRORE] Valori acqua/luce fuori range")
             return jsonify({"error": "water_level/light_level must be in [1..5]"}), 400
         payload["water_level"] = wl
         payload["light_level"] = ll
     except Exception as e:
-        print("[ERRORE] Valori numerici acqua/luce non validi:", e)
+        logger.debug("[ERRORE] Valori numerici acqua/luce non validi: %s", e)
         return jsonify({"error": "water_level/light_level must be integer"}), 400
 
     try:
@@ -1355,50 +1822,51 @@ def create_plant():
         payload["min_temp_c"] = tmin
         payload["max_temp_c"] = tmax
     except Exception as e:
-        print("[ERRORE] Temp non valide:", e)
+        logger.debug("[ERRORE] Temp non valide: %s", e)
         return jsonify({"error": "min_temp_c/max_temp_c must be integer"}), 400
 
-    print("[DEBUG] Payload validated:", payload)
+    logger.debug("[DEBUG] Payload validated: %s", payload)
 
     # =====================================================================
     # 9) FILTRAGGIO MODELLO
     # =====================================================================
     data = _filter_fields_for_model(payload, Plant)
-    print("[DEBUG] Final payload for DB:", data)
+    logger.debug("[DEBUG] Final payload for DB: %s", data)
 
     # =====================================================================
     # 10) TRANSAZIONE DB
     # =====================================================================
-    print("[RepositoryService] Saving on DB…")
+    logger.debug("[RepositoryService] Saving on DB…")
 
     with _session_ctx() as s:
         try:
             # family
-            print("[DEBUG] Risoluzione family…")
+            logger.debug("[DEBUG] Risoluzione family…")
 
             fam_id = None
             if family_name:
                 fam_id = repo.get_family_by_name(family_name)
-                print("[RepositoryService] family da PlantNet:", fam_id)
+                logger.debug("[RepositoryService] family da PlantNet: %s", fam_id)
 
             if not fam_id:
                 fam_id = repo.get_family(data["scientific_name"])
-                print("[RepositoryService] family da defaults JSON:", fam_id)
+                logger.debug("[RepositoryService] family da defaults JSON: %s", fam_id)
 
             if not fam_id:
-                print("[ERRORE] Family non trovata")
+                logger.debug("[ERRORE] Family non trovata")
                 return jsonify({"error": "Family not found"}), 400
 
             data["family_id"] = fam_id
 
             # create plant
-            print("[RepositoryService] Creazione pianta nel DB…")
+            logger.debug("[RepositoryService] Creazione pianta nel DB…")
             p = Plant(**data)
             s.add(p)
             _commit_or_409(s)
-            print(f"[RepositoryService] Pianta creata ID={p.id}")
+            logger.debug("[RepositoryService] Pianta creata ID=%s", p.id)
 
             write_changes_upsert("plant", [_serialize_instance(p)])
+            _invalidate_catalog("plant")
 
             # ================================================================
             #  SALVATAGGIO IMMAGINE SU FILESYSTEM + RECORD PlantPhoto
@@ -1417,7 +1885,7 @@ def create_plant():
                 with open(image_path, "wb") as f:
                     f.write(image_bytes)
 
-                print(f"[DEBUG] Image saved in: {image_path}")
+                logger.debug("[DEBUG] Image saved in: %s", image_path)
 
                 # Crea la riga in plant_photo
                 photo = PlantPhoto(
@@ -1433,11 +1901,11 @@ def create_plant():
                 write_changes_upsert("plant_photo", [_serialize_instance(photo)])
 
             except Exception as e:
-                print(f"[ERRORE] Salvataggio immagine/PlantPhoto fallito: {e}")
+                logger.error("[ERRORE] Salvataggio immagine/PlantPhoto fallito: %s", e)
             # ================================================================
 
             # LINK USER → PLANT (SEMPRE)
-            print("[RepositoryService] creation of user-plant…")
+            logger.debug("[RepositoryService] creation of user-plant…")
             repo.ensure_user_plant_link(
                 user_id=g.user_id,
                 plant_id=str(p.id),
@@ -1449,28 +1917,28 @@ def create_plant():
             # ================================================================
             # WATERING PLAN (NON DEVE MAI ROMPERE NULLA)
             # ================================================================
-            print("[ReminderService] Creation of watering plan from quiz + plant info…")
+            logger.debug("[ReminderService] Creation of watering plan from quiz + plant info…")
             try:
                 # usa il ReminderService istanziato in alto:
                 reminder_service.create_plan_for_new_plant(
                     user_id=str(g.user_id),
                     plant_id=str(p.id),
                 )
-                print("[ReminderService] Watering plan created")
+                logger.debug("[ReminderService] Watering plan created")
             except Exception as e:
-                print("[ReminderService] Creation of watering plan failed:", e)
+                logger.debug("[ReminderService] Creation of watering plan failed: %s", e)
 
             # ================================================================
             # COMMIT FINALE — SALVA TUTTO SENZA ROLLBACK
             # ================================================================
             s.commit()
 
-            print("\n================== [create_plant] COMPLETED ==================\n")
+            logger.debug("================== [create_plant] COMPLETED ==================")
 
             return jsonify({"ok": True, "id": str(p.id)}), 201
 
         except Exception as e:
-            print(f"[ERRORE GENERALE DB] {e}")
+            logger.error("[ERRORE GENERALE DB] %s", e)
             s.rollback()
             return jsonify({"error": f"DB error: {e}"}), 500
 
@@ -1487,37 +1955,35 @@ def update_plant(plant_id: str):
 
     # --- size in update: se fornita, valida e converte a Enum ---
     if "size" in payload and payload["size"] is not None:
-        size_val = str(payload["size"])
-        if size_val not in ALLOWED_SIZES:
-            return jsonify(
-                {"error": f"size must be one of {sorted(ALLOWED_SIZES)}"}
-            ), 400
-        payload["size"] = SizeEnum(size_val)
+        size_enum = _SIZE_BY_VALUE.get(str(payload["size"]))
+        if size_enum is None:
+            return jsonify({"error": _SIZE_ERROR}), 400
+        payload["size"] = size_enum
 
     current_user_id = str(g.user_id)
 
     with _session_ctx() as s:
-        # 1) Recupero pianta
-        p = s.get(Plant, plant_id)
+        # 1) Recupero pianta: solo colonne, le relazioni lazy="selectin" non
+        #    servono all'update (raiseload: un accesso sarebbe un bug visibile)
+        p = s.get(Plant, plant_id, options=[raiseload("*")])
         if p is None:
             return jsonify({"error": "Plant not found"}), 404
 
         # 2) Controllo che l'utente abbia la pianta nel suo giardino (UserPlant)
-        up = s.get(UserPlant, (current_user_id, plant_id))
-        if up is None:
+        if not _owns_plant(s, current_user_id, plant_id):
             # L'utente non ha alcun legame con questa pianta → vietato
             return jsonify(
                 {"error": "Forbidden: you do not own this plant"}
             ), 403
 
         # 3) Se la pianta è condivisa, consenti update solo all'OWNER
-        shared_rows = (
-            s.query(SharedPlant)
-            .filter(SharedPlant.plant_id == plant_id)
-            .all()
-        )
-        if shared_rows:
-            owner_ids = {str(sp.owner_user_id) for sp in shared_rows}
+        owner_ids = {
+            str(oid)
+            for oid in s.scalars(
+                select(SharedPlant.owner_user_id).where(SharedPlant.plant_id == plant_id)
+            )
+        }
+        if owner_ids:
             if current_user_id not in owner_ids:
                 # L'utente è solo recipient (o comunque non owner) → vietato
                 return jsonify(
@@ -1549,10 +2015,11 @@ def update_plant(plant_id: str):
             if k in allowed:
                 setattr(p, k, v)
 
-        p.updated_at = datetime.utcnow()
+        p.updated_at = _now()
         _commit_or_409(s)
 
         write_changes_upsert("plant", [_serialize_instance(p)])
+        _invalidate_catalog("plant")
         return jsonify({"ok": True, "id": str(p.id)}), 200
 
 
@@ -1586,8 +2053,9 @@ def delete_plant(plant_id: str):
     reminder_ids: list[str] = []
 
     with _session_ctx() as s:
-        plant: Plant | None = s.get(Plant, plant_id)
-        if not plant:
+        # solo esistenza: s.get(Plant) caricherebbe anche tutte le relazioni
+        # lazy="selectin" (foto, link, piani, log, ...) senza usarle
+        if not s.scalar(_STMT_PLANT_EXISTS, {"pid": plant_id}):
             # Idempotente: se la pianta non esiste più, allineiamo comunque il JSON
             write_changes_delete("plant", plant_id)
             return "", 204
@@ -1596,98 +2064,62 @@ def delete_plant(plant_id: str):
         # 1) Controllo ownership
         # ---------------------------
         # Se esistono share attive, l’unico che può cancellare è l’owner_user_id.
-        active_shares = (
-            s.query(SharedPlant)
-            .filter(
-                SharedPlant.plant_id == plant_id,
-                SharedPlant.ended_sharing_at.is_(None),
+        owner_ids = set(
+            s.scalars(
+                select(SharedPlant.owner_user_id).where(
+                    SharedPlant.plant_id == plant_id,
+                    SharedPlant.ended_sharing_at.is_(None),
+                )
             )
-            .all()
         )
 
-        if active_shares:
-            owner_ids = {sp.owner_user_id for sp in active_shares}
+        if owner_ids:
             # In pratica owner_ids dovrebbe contenere un solo ID
             if current_user_id not in owner_ids:
                 abort(403, description="You are not the owner of this plant.")
         else:
             # Nessuna share attiva: chiedo che esista un UserPlant per (current_user_id, plant_id)
-            owner_link = s.get(UserPlant, (current_user_id, plant_id))
-            if owner_link is None:
+            if not _owns_plant(s, current_user_id, plant_id):
                 abort(403, description="You are not the owner of this plant.")
 
         # ---------------------------
         # 2) Raccolgo tutto ciò che verrà cancellato (per changes.json)
-        #    Importante: NON chiamiamo s.delete() sui figli, lascia fare al CASCADE.
+        #    Solo gli id (niente istanze ORM): ai figli pensa il CASCADE.
         # ---------------------------
+        def _ids(col, fk):
+            return list(s.scalars(select(col).where(fk == plant_id)))
 
-        # PlantPhoto via relazione
-        photo_ids = [p.id for p in plant.photos]
+        photo_ids = _ids(PlantPhoto.id, PlantPhoto.plant_id)
 
         # Tutti i UserPlant legati a questa pianta (owner + recipient)
-        user_plant_links = (
-            s.query(UserPlant)
-            .filter(UserPlant.plant_id == plant_id)
-            .all()
-        )
         user_plant_pairs = [
-            {"user_id": up.user_id, "plant_id": up.plant_id, "_delete": True}
-            for up in user_plant_links
+            {"user_id": uid, "plant_id": plant_id, "_delete": True}
+            for uid in _ids(UserPlant.user_id, UserPlant.plant_id)
         ]
 
-        # WateringPlan
-        watering_plans = (
-            s.query(WateringPlan)
-            .filter(WateringPlan.plant_id == plant_id)
-            .all()
-        )
-        watering_plan_ids = [wp.id for wp in watering_plans]
-
-        # WateringLog
-        watering_logs = (
-            s.query(WateringLog)
-            .filter(WateringLog.plant_id == plant_id)
-            .all()
-        )
-        watering_log_ids = [wl.id for wl in watering_logs]
-
-        # PlantDisease
-        plant_diseases = (
-            s.query(PlantDisease)
-            .filter(PlantDisease.plant_id == plant_id)
-            .all()
-        )
-        plant_disease_ids = [pd.id for pd in plant_diseases]
-
-        # SharedPlant
-        shared_records = (
-            s.query(SharedPlant)
-            .filter(SharedPlant.plant_id == plant_id)
-            .all()
-        )
-        shared_ids = [sp.id for sp in shared_records]
+        watering_plan_ids = _ids(WateringPlan.id, WateringPlan.plant_id)
+        watering_log_ids = _ids(WateringLog.id, WateringLog.plant_id)
+        plant_disease_ids = _ids(PlantDisease.id, PlantDisease.plant_id)
+        shared_ids = _ids(SharedPlant.id, SharedPlant.plant_id)
 
         # Reminder legati alla pianta (la logica esistente usa entity_type/entity_id)
-        reminders = (
-            s.query(Reminder)
-            .filter(
-                Reminder.entity_type == "plant",
-                Reminder.entity_id == plant_id,
-            )
-            .all()
+        reminder_filter = and_(
+            Reminder.entity_type == "plant",
+            Reminder.entity_id == plant_id,
         )
-        reminder_ids = [r.id for r in reminders]
+        reminder_ids = list(s.scalars(select(Reminder.id).where(reminder_filter)))
 
         # Guardando entities.py, la tabella Reminder non ha una FK vera verso Plant:
         # è solo un campo stringa generico, quindi il DB non può fare CASCADE automaticamente.
-        # I reminder devono essere cancellati manualmente.
-        for rem in reminders:
-            s.delete(rem)
+        # I reminder devono essere cancellati manualmente (un solo DELETE).
+        if reminder_ids:
+            s.execute(delete(Reminder).where(reminder_filter))
 
         # ---------------------------
-        # 3) Cancellazione vera (DB CASCADE)
+        # 3) Cancellazione vera (DB CASCADE): un solo DELETE, senza
+        #    caricare la pianta né le collezioni per il cascade ORM
         # ---------------------------
-        s.delete(plant)
+        s.execute(delete(Plant).where(Plant.id == plant_id))
         _commit_or_409(s)
 
     # ---------------------------
@@ -1698,42 +2130,87 @@ def delete_plant(plant_id: str):
     write_changes_delete("plant", plant_id)
 
     # plant_photo
-    for pid in photo_ids:
-        write_changes_delete("plant_photo", pid)
+    write_changes_delete_many("plant_photo", photo_ids)
+    _invalidate_catalog("plant", "plant_photo")
+    _invalidate_main_photo(plant_id, catalog=False)
 
     # user_plant (PK composta, via upsert con _delete=True)
     if user_plant_pairs:
         write_changes_upsert("user_plant", user_plant_pairs)
 
     # watering_plan
-    for wp_id in watering_plan_ids:
-        write_changes_delete("watering_plan", wp_id)
+    write_changes_delete_many("watering_plan", watering_plan_ids)
 
     # watering_log
-    for wl_id in watering_log_ids:
-        write_changes_delete("watering_log", wl_id)
+    write_changes_delete_many("watering_log", watering_log_ids)
 
     # plant_disease
-    for pd_id in plant_disease_ids:
-        write_changes_delete("plant_disease", pd_id)
+    write_changes_delete_many("plant_disease", plant_disease_ids)
 
     # shared_plant
-    for sp_id in shared_ids:
-        write_changes_delete("shared_plant", sp_id)
+    write_changes_delete_many("shared_plant", shared_ids)
 
     # reminder
-    for rid in reminder_ids:
-        write_changes_delete("reminder", rid)
+    write_changes_delete_many("reminder", reminder_ids)
 
     return "", 204
 
 
+def _register_update_delete(Model, table: str, id_label: str, *, catalog: bool = False):
+    """
+    Registra le route generiche /<table>/update/<id> (PATCH, PUT) e
+    /<table>/delete/<id> (DELETE) per le entità senza regole di ownership.
+    Endpoint "<table>_update" / "<table>_delete" come le vecchie funzioni.
+    catalog=True: le scritture invalidano anche la cache dei cataloghi.
+    """
+    not_found = f"{Model.__name__} not found"
+
+    def update(obj_id: str):
+        _ensure_uuid(obj_id, id_label)
+        payload = _parse_json_body()
+        with _session_ctx() as s:
+            # solo colonne: le relazioni lazy="selectin" non servono all'update
+            obj = s.get(Model, obj_id, options=[raiseload("*")])
+            if not obj:
+                return jsonify({"error": not_found}), 404
+            for k, v in _filter_fields_for_model(payload, Model).items():
+                setattr(obj, k, v)
+            _commit_or_409(s)
+            write_changes_upsert(table, [_serialize_instance(obj)])
+            if catalog:
+                _invalidate_catalog(table)
+            return jsonify({"ok": True, "id": obj.id}), 200
+
+    def remove(obj_id: str):
+        _ensure_uuid(obj_id, id_label)
+        with _session_ctx() as s:
+            # delete ORM: mantiene il comportamento delle relazioni (es. le
+            # piante di una family restano, con family_id a NULL)
+            obj = s.get(Model, obj_id)
+            if obj:
+                s.delete(obj)
+                _commit_or_409(s)
+            write_changes_delete(table, obj_id)
+            if catalog:
+                _invalidate_catalog(table)
+            return ("", 204)
+
+    update.__name__ = f"{table}_update"
+    remove.__name__ = f"{table}_delete"
+    api_blueprint.add_url_rule(
+        f"/{table}/update/<obj_id>", view_func=require_jwt(update), methods=["PATCH", "PUT"]
+    )
+    api_blueprint.add_url_rule(
+        f"/{table}/delete/<obj_id>", view_func=require_jwt(remove), methods=["DELETE"]
+    )
+
+
 # ========= Family =========
 @api_blueprint.route("/family/all", methods=["GET"])
+@_catalog_cached("family")
 def family_all():
-    with _session_ctx() as s:
-        rows = s.query(Family).order_by(Family.name.asc()).all()
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    # sola lettura: colonne via Core, niente istanze ORM
+    return _json_rows(select(*Family.__table__.c).order_by(Family.name.asc()))
 
 
 @api_blueprint.route("/family/add", methods=["POST"])
@@ -1744,61 +2221,36 @@ def family_add():
     if not data.get("name"):
         return jsonify({"error": "Field 'name' is required"}), 400
     with _session_ctx() as s:
-        f = Family(**data)
-        s.add(f)
+        row = _insert_one(s, Family, data)
         _commit_or_409(s)
-        write_changes_upsert("family", [_serialize_instance(f)])
-        return jsonify({"ok": True, "id": f.id}), 201
+        write_changes_upsert("family", [row])
+        _invalidate_catalog("family")
+        return jsonify({"ok": True, "id": row["id"]}), 201
 
 
-@api_blueprint.route("/family/update/<fid>", methods=["PATCH", "PUT"])
-@require_jwt
-def family_update(fid: str):
-    _ensure_uuid(fid, "family_id")
-    payload = _parse_json_body()
-    with _session_ctx() as s:
-        f = s.get(Family, fid)
-        if not f: return jsonify({"error": "Family not found"}), 404
-        for k, v in _filter_fields_for_model(payload, Family).items():
-            setattr(f, k, v)
-        _commit_or_409(s)
-        write_changes_upsert("family", [_serialize_instance(f)])
-        return jsonify({"ok": True, "id": f.id}), 200
-
-
-@api_blueprint.route("/family/delete/<fid>", methods=["DELETE"])
-@require_jwt
-def family_delete(fid: str):
-    _ensure_uuid(fid, "family_id")
-    with _session_ctx() as s:
-        f = s.get(Family, fid)
-        if f:
-            s.delete(f)
-            _commit_or_409(s)
-        write_changes_delete("family", fid)
-        return ("", 204)
+_register_update_delete(Family, "family", "family_id", catalog=True)
 
 
 @api_blueprint.route("/plants/by-size/<size>", methods=["GET"])
+@_catalog_cached("plant")
 def plants_by_size(size: str):
     """
     Returns all plants with the specified size.
     size ∈ {small, medium, large, giant}
     """
-    if not size or size not in ALLOWED_SIZES:
-        return jsonify({"error": f"size must be one of {sorted(ALLOWED_SIZES)}"}), 400
-
-    with _session_ctx() as s:
-        rows = (
-            s.query(Plant)
-            .filter(Plant.size == SizeEnum(size))
-            .order_by(Plant.scientific_name.asc())
-            .all()
-        )
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    size_enum = _SIZE_BY_VALUE.get(size)
+    if size_enum is None:
+        return jsonify({"error": _SIZE_ERROR}), 400
+
+    return _json_rows(
+        select(*Plant.__table__.c)
+        .where(Plant.size == size_enum)
+        .order_by(Plant.scientific_name.asc())
+    )
 
 
 @api_blueprint.route("/plants/by-use/<use>", methods=["GET"])
+@_catalog_cached("plant")
 def plants_by_use(use: str):
     """
     Returns all plants with the given 'use' (case-insensitive match).
@@ -1808,23 +2260,28 @@ def plants_by_use(use: str):
         return jsonify({"error": "Missing 'use' parameter"}), 400
 
     use_norm = use.strip().lower()
-    with _session_ctx() as s:
-        rows = (
-            s.query(Plant)
-            .filter(func.lower(Plant.use) == use_norm)
-            .order_by(Plant.scientific_name.asc())
-            .all()
-        )
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    return _json_rows(
+        select(*Plant.__table__.c)
+        .where(func.lower(Plant.use) == use_norm)
+        .order_by(Plant.scientific_name.asc())
+    )
 
 
 # ========= PlantPhoto =========
 @api_blueprint.route("/plant_photo/all", methods=["GET"])
 @require_jwt
 def plant_photo_all():
-    with _session_ctx() as s:
-        rows = s.query(PlantPhoto).order_by(PlantPhoto.created_at.desc()).all()
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    """
+    Tutte le foto, dalla più recente. Paginazione keyset opzionale:
+    ?limit=N, poi ?after=<created_at ultima riga>&after_id=<id ultima riga>
+    """
+    page = _keyset_args()
+    return _stream_json_list(
+        _keyset(
+            select(*PlantPhoto.__table__.c),
+            PlantPhoto.created_at, PlantPhoto.id, page, descending=True,
+        )
+    )
 
 
 @api_blueprint.route("/plant/photo/add/<plant_id>", methods=["POST"])
@@ -1839,6 +2296,7 @@ def plant_photo_add(plant_id: str):
         ph = PlantPhoto(**data)
         s.add(ph)
         _commit_or_409(s)
+        _invalidate_main_photo(plant_id)
         write_changes_upsert("plant_photo", [_serialize_instance(ph)])
         return jsonify({"ok": True, "id": ph.id}), 201
 
@@ -1854,6 +2312,7 @@ def plant_photo_update(photo_id: str):
         for k, v in _filter_fields_for_model(payload, PlantPhoto).items():
             setattr(ph, k, v)
         _commit_or_409(s)
+        _invalidate_main_photo(ph.plant_id)
         write_changes_upsert("plant_photo", [_serialize_instance(ph)])
         return jsonify({"ok": True, "id": ph.id}), 200
 
@@ -1881,6 +2340,7 @@ def plant_photo_delete(photo_id: str):
                     dirpath = os.path.dirname(full)
                     try:
                         os.rmdir(dirpath)
+                        _forget_dirs()
                     except OSError:
                         pass
             except Exception as e:
@@ -1889,6 +2349,7 @@ def plant_photo_delete(photo_id: str):
         if pp:
             s.delete(pp)
             _commit_or_409(s)
+            _invalidate_main_photo(pp.plant_id)
 
     write_changes_delete("plant_photo", photo_id)
     return ("", 204)
@@ -1896,10 +2357,10 @@ def plant_photo_delete(photo_id: str):
 
 # ========= Disease =========
 @api_blueprint.route("/disease/all", methods=["GET"])
+@_catalog_cached("disease")
 def disease_all():
-    with _session_ctx() as s:
-        rows = s.query(Disease).order_by(Disease.name.asc()).all()
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    # sola lettura: colonne via Core (symptoms/cure_tips già decodificati dal tipo JSON)
+    return _json_rows(select(*Disease.__table__.c).order_by(Disease.name.asc()))
 
 
 @api_blueprint.route("/disease/add", methods=["POST"])
@@ -1919,47 +2380,22 @@ def disease_add():
         val = data.get(field)
         if isinstance(val, str):  # se il client invia stringa JSON
             try:
-                data[field] = json.loads(val)
+                data[field] = orjson.loads(val)
             except Exception:
                 return jsonify({"error": f"{field} must be valid JSON"}), 400
 
     # Insert
     with _session_ctx() as s:
-        d = Disease(**data)
-        s.add(d)
+        row = _insert_one(s, Disease, data)
         _commit_or_409(s)
 
-        write_changes_upsert("disease", [_serialize_instance(d)])
-
-        return jsonify({"ok": True, "id": d.id}), 201
+        write_changes_upsert("disease", [row])
+        _invalidate_catalog("disease")
 
-
-@api_blueprint.route("/disease/update/<did>", methods=["PATCH", "PUT"])
-@require_jwt
-def disease_update(did: str):
-    _ensure_uuid(did, "disease_id")
-    payload = _parse_json_body()
-    with _session_ctx() as s:
-        d = s.get(Disease, did)
-        if not d: return jsonify({"error": "Disease not found"}), 404
-        for k, v in _filter_fields_for_model(payload, Disease).items():
-            setattr(d, k, v)
-        _commit_or_409(s)
-        write_changes_upsert("disease", [_serialize_instance(d)])
-        return jsonify({"ok": True, "id": d.id}), 200
+        return jsonify({"ok": True, "id": row["id"]}), 201
 
 
-@api_blueprint.route("/disease/delete/<did>", methods=["DELETE"])
-@require_jwt
-def disease_delete(did: str):
-    _ensure_uuid(did, "disease_id")
-    with _session_ctx() as s:
-        d = s.get(Disease, did)
-        if d:
-            s.delete(d)
-            _commit_or_409(s)
-        write_changes_delete("disease", did)
-        return ("", 204)
+_register_update_delete(Disease, "disease", "disease_id", catalog=True)
 
 
 @api_blueprint.route("/disease/symptoms/<family_id>", methods=["GET"])
@@ -1973,17 +2409,14 @@ def get_disease_symptoms_by_family(family_id):
 @api_blueprint.route("/plant_disease/all", methods=["GET"])
 @require_jwt
 def plant_disease_all():
-    with _session_ctx() as s:
-        try:
-            # RIMOSSO .nulls_last() → MySQL non lo supporta
-            rows = s.query(PlantDisease).order_by(PlantDisease.detected_at.desc()).all()
-            serialized = [_serialize_instance(r) for r in rows]
-            return jsonify(serialized), 200
-        except Exception as e:
-            print(f"[ERROR] plant_disease_all serialization failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({"error": str(e)}), 500
+    # RIMOSSO .nulls_last() → MySQL non lo supporta
+    # in streaming dal cursore lato server: memoria costante anche con
+    # molte diagnosi (?limit=N per limitare la risposta)
+    _, _, limit = _keyset_args()
+    stmt = select(*PlantDisease.__table__.c).order_by(PlantDisease.detected_at.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    return _stream_json_list(stmt)
 
 
 @api_blueprint.route("/plant_disease/add", methods=["POST"])
@@ -1998,42 +2431,16 @@ def plant_disease_add():
         return jsonify({"error": f"Campi obbligatori: {', '.join(missing)}"}), 400
 
     with _session_ctx() as s:
-        if not s.get(UserPlant, (g.user_id, data["plant_id"])):
+        if not _owns_plant(s, g.user_id, data["plant_id"]):
             return jsonify({"error": "Forbidden: non possiedi questa pianta"}), 403
 
-        pd = PlantDisease(**data)
-        s.add(pd)
-        _commit_or_409(s)
-        write_changes_upsert("plant_disease", [_serialize_instance(pd)])
-        return jsonify({"ok": True, "id": pd.id}), 201
-
-
-@api_blueprint.route("/plant_disease/update/<pdid>", methods=["PATCH", "PUT"])
-@require_jwt
-def plant_disease_update(pdid: str):
-    _ensure_uuid(pdid, "plant_disease_id")
-    payload = _parse_json_body()
-    with _session_ctx() as s:
-        pd = s.get(PlantDisease, pdid)
-        if not pd: return jsonify({"error": "PlantDisease not found"}), 404
-        for k, v in _filter_fields_for_model(payload, PlantDisease).items():
-            setattr(pd, k, v)
+        row = _insert_one(s, PlantDisease, data)
         _commit_or_409(s)
-        write_changes_upsert("plant_disease", [_serialize_instance(pd)])
-        return jsonify({"ok": True, "id": pd.id}), 200
+        write_changes_upsert("plant_disease", [row])
+        return jsonify({"ok": True, "id": row["id"]}), 201
 
 
-@api_blueprint.route("/plant_disease/delete/<pdid>", methods=["DELETE"])
-@require_jwt
-def plant_disease_delete(pdid: str):
-    _ensure_uuid(pdid, "plant_disease_id")
-    with _session_ctx() as s:
-        pd = s.get(PlantDisease, pdid)
-        if pd:
-            s.delete(pd)
-            _commit_or_409(s)
-        write_changes_delete("plant_disease", pdid)
-        return ("", 204)
+_register_update_delete(PlantDisease, "plant_disease", "plant_disease_id")
 
 
 # ========= User =========
@@ -2041,14 +2448,11 @@ def plant_disease_delete(pdid: str):
 @require_jwt
 def user_all():
     with _session_ctx() as s:
-        # mostra solo l'utente corrente
-        rows = (
-            s.query(User)
-            .filter(User.id == g.user_id)
-            .order_by(User.created_at.desc())
-            .all()
-        )
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+        # mostra solo l'utente corrente (colonne via Core, niente istanza ORM)
+        rows = s.execute(
+            select(*User.__table__.c).where(User.id == g.user_id)
+        ).mappings().all()
+        return _json([dict(r) for r in rows])
 
 
 @api_blueprint.route("/user/add", methods=["POST"])
@@ -2059,7 +2463,7 @@ def user_add():
     if "password" in payload:
         payload["password_hash"] = generate_password_hash(payload.pop("password"))
 
-    data = _filter_fields_for_model(payload, User)
+    data = _filter_fields_for_model(payload, User, exclude={"short_id"})
     required = ["email", "password_hash", "first_name", "last_name"]
     missing = [k for k in required if not data.get(k)]
     if missing:
@@ -2115,10 +2519,10 @@ def user_update():
         if not u:
             return jsonify({"error": "User not found"}), 404
 
-        for k, v in _filter_fields_for_model(payload, User).items():
+        for k, v in _filter_fields_for_model(payload, User, exclude={"short_id"}).items():
             setattr(u, k, v)
 
-        u.updated_at = datetime.utcnow()
+        u.updated_at = _now()
         _commit_or_409(s)
         write_changes_upsert("user", [_serialize_instance(u)])
 
@@ -2135,7 +2539,6 @@ def delete_me():
     current_user_id = g.user_id
 
     # Collezioni per aggiornare il changes.json
-    user_plant_pairs: list[dict] = []
     orphan_plant_ids: list[str] = []
     orphan_photo_ids: list[str] = []
     orphan_plant_disease_ids: list[str] = []
@@ -2152,68 +2555,72 @@ def delete_me():
             return jsonify({"error": "User not found"}), 404
 
         # ------------------------------------------------------
-        # 1) USER_PLANT → salvo le coppie (user_id, plant_id)
-        #     (non le elimino a mano, ci pensa il CASCADE su user_id)
+        # 1-3) In un solo round-trip (CTE):
+        #   - my_plants: piante dell'utente (user_plant lo elimina il CASCADE su user_id)
+        #   - orphans:   piante che hanno SOLO questo utente come proprietario
+        #   - foto (id, url) delle piante orfane
         # ------------------------------------------------------
-        user_plants = (
-            s.query(UserPlant)
-            .filter(UserPlant.user_id == current_user_id)
-            .all()
+        my_plants = (
+            select(UserPlant.plant_id)
+            .where(UserPlant.user_id == current_user_id)
+            .cte("my_plants")
         )
-
-        plant_ids: list[str] = []
-        for up in user_plants:
-            plant_ids.append(up.plant_id)
-            user_plant_pairs.append(
-                {
-                    "user_id": str(up.user_id),
-                    "plant_id": str(up.plant_id),
-                    "_delete": True,
-                }
+        orphans = (
+            select(UserPlant.plant_id)
+            .where(UserPlant.plant_id.in_(select(my_plants.c.plant_id)))
+            .group_by(UserPlant.plant_id)
+            .having(func.count() == 1)
+            .cte("orphans")
+        )
+        discovery = (
+            select(
+                my_plants.c.plant_id,
+                orphans.c.plant_id.label("orphan_id"),
+                PlantPhoto.id.label("photo_id"),
+                PlantPhoto.url,
+            )
+            .select_from(
+                my_plants
+                .outerjoin(orphans, orphans.c.plant_id == my_plants.c.plant_id)
+                .outerjoin(PlantPhoto, PlantPhoto.plant_id == orphans.c.plant_id)
             )
+        )
 
-        # ------------------------------------------------------
-        # 2) Piante "orfane" = piante che hanno SOLO questo utente come proprietario
-        # ------------------------------------------------------
-        if plant_ids:
-            counts = (
-                s.query(UserPlant.plant_id, func.count(UserPlant.user_id))
-                .filter(UserPlant.plant_id.in_(plant_ids))
-                .group_by(UserPlant.plant_id)
-                .all()
-            )
-            orphan_plant_ids = [pid for (pid, cnt) in counts if cnt == 1]
+        # una riga per foto: dict come "set ordinato" per de-duplicare le piante
+        plant_ids: dict[str, None] = {}
+        orphans_seen: dict[str, None] = {}
+        photos: list[tuple[str, str]] = []
+        for pid, orphan_id, photo_id, url in s.execute(discovery):
+            plant_ids[pid] = None
+            if orphan_id:
+                orphans_seen[orphan_id] = None
+            if photo_id:
+                photos.append((photo_id, url))
+
+        orphan_plant_ids = list(orphans_seen)
+        up_rows = [(current_user_id, pid) for pid in plant_ids]
 
         # ------------------------------------------------------
-        # 3) Per le piante orfane: foto, file su disco, malattie
+        # 3) Per le piante orfane: file su disco, malattie
         # ------------------------------------------------------
-        photos = []
-        plant_diseases = []
-
         if orphan_plant_ids:
-            # Foto delle piante orfane
-            photos = (
-                s.query(PlantPhoto)
-                .filter(PlantPhoto.plant_id.in_(orphan_plant_ids))
-                .all()
-            )
+            orphan_photo_ids = [photo_id for (photo_id, _) in photos]
 
             # PlantDisease delle piante orfane
-            plant_diseases = (
-                s.query(PlantDisease)
+            orphan_plant_disease_ids = [
+                pdid for (pdid,) in
+                s.query(PlantDisease.id)
                 .filter(PlantDisease.plant_id.in_(orphan_plant_ids))
                 .all()
-            )
-            orphan_plant_disease_ids = [pd.id for pd in plant_diseases]
+            ]
 
             # Cancellazione fisica dei file associati alle foto
             base = os.path.realpath(current_app.config["UPLOAD_DIR"])
-            for pp in photos:
-                orphan_photo_ids.append(pp.id)
-                if pp.url and pp.url.startswith("/uploads/"):
+            for photo_id, url in photos:
+                if url and url.startswith("/uploads/"):
                     try:
                         # es. "/uploads/plant/<pid>/<uuid>.png"
-                        rel = pp.url[len("/uploads/"):]
+                        rel = url[len("/uploads/"):]
                         full = os.path.realpath(os.path.join(base, rel))
                         # sicurezza: cancella solo dentro UPLOAD_DIR
                         if full.startswith(base) and os.path.exists(full):
@@ -2222,71 +2629,56 @@ def delete_me():
                             dirpath = os.path.dirname(full)
                             try:
                                 os.rmdir(dirpath)
+                                _forget_dirs()
                             except OSError:
                                 # cartella non vuota → ok così
                                 pass
                     except Exception as e:
                         current_app.logger.warning(
-                            f"Impossibile rimuovere file per photo_id={pp.id}: {e}"
+                            f"Impossibile rimuovere file per photo_id={photo_id}: {e}"
                         )
 
         # ------------------------------------------------------
         # 4) WATERING_PLAN / WATERING_LOG / REMINDER dell'utente
         # ------------------------------------------------------
-        wps = (
-            s.query(WateringPlan)
-            .filter(WateringPlan.user_id == current_user_id)
-            .all()
-        )
-        watering_plan_ids = [wp.id for wp in wps]
-
-        wls = (
-            s.query(WateringLog)
-            .filter(WateringLog.user_id == current_user_id)
-            .all()
-        )
-        watering_log_ids = [wl.id for wl in wls]
-
-        rems = (
-            s.query(Reminder)
-            .filter(Reminder.user_id == current_user_id)
-            .all()
-        )
-        reminder_ids = [r.id for r in rems]
+        watering_plan_ids = [
+            wid for (wid,) in
+            s.query(WateringPlan.id).filter(WateringPlan.user_id == current_user_id)
+        ]
+        watering_log_ids = [
+            lid for (lid,) in
+            s.query(WateringLog.id).filter(WateringLog.user_id == current_user_id)
+        ]
+        reminder_ids = [
+            rid for (rid,) in
+            s.query(Reminder.id).filter(Reminder.user_id == current_user_id)
+        ]
 
         # ------------------------------------------------------
         # 5) SHARED_PLANT dove l'utente è owner o recipient
         # ------------------------------------------------------
-        sps_owner = (
-            s.query(SharedPlant)
-            .filter(SharedPlant.owner_user_id == current_user_id)
-            .all()
-        )
-        sps_recipient = (
-            s.query(SharedPlant)
-            .filter(SharedPlant.recipient_user_id == current_user_id)
-            .all()
-        )
-        for sp in sps_owner + sps_recipient:
-            if sp.id not in shared_plant_ids:
-                shared_plant_ids.append(sp.id)
+        shared_plant_ids = [
+            sid for (sid,) in
+            s.query(SharedPlant.id).filter(
+                or_(
+                    SharedPlant.owner_user_id == current_user_id,
+                    SharedPlant.recipient_user_id == current_user_id,
+                )
+            )
+        ]
 
         # ------------------------------------------------------
         # 6) FRIENDSHIP dove l'utente è user_id_a o user_id_b
         # ------------------------------------------------------
-        fr_a = (
-            s.query(Friendship)
-            .filter(Friendship.user_id_a == current_user_id)
-            .all()
-        )
-        fr_b = (
-            s.query(Friendship)
-            .filter(Friendship.user_id_b == current_user_id)
-            .all()
-        )
-        for fr in fr_a + fr_b:
-            if fr.id not in friendship_ids:
-                friendship_ids.append(fr.id)
+        friendship_ids = [
+            fid for (fid,) in
+            s.query(Friendship.id).filter(
+                or_(
+                    Friendship.user_id_a == current_user_id,
+                    Friendship.user_id_b == current_user_id,
+                )
+            )
+        ]
 
         # ------------------------------------------------------
         # 7) Cancellazione effettiva nel DB
@@ -2301,47 +2693,39 @@ def delete_me():
         s.delete(u)
         _commit_or_409(s)
 
+    # lo short_id dell'utente cancellato non deve più risolversi
+    RepositoryService.clear_short_id_cache()
+
     # ------------------------------------------------------
     # 8) LOGGING SU changes.json (fuori dalla sessione)
-    #    ATTENZIONE: qui passiamo solo ID singoli, mai liste.
+    #    Un evento per tabella: il writer in background li scrive a batch.
     # ------------------------------------------------------
-
     # user
     write_changes_delete("user", current_user_id)
 
     # user_plant (PK composta, via upsert con _delete=True)
-    if user_plant_pairs:
-        write_changes_upsert("user_plant", user_plant_pairs)
-
-    # piante orfane
-    for pid in orphan_plant_ids:
-        write_changes_delete("plant", pid)
-
-    # foto delle piante orfane
-    for photo_id in orphan_photo_ids:
-        write_changes_delete("plant_photo", photo_id)
-
-    # plant_disease delle piante orfane
-    for pdid in orphan_plant_disease_ids:
-        write_changes_delete("plant_disease", pdid)
-
-    # watering_plan / watering_log
-    for wid in watering_plan_ids:
-        write_changes_delete("watering_plan", wid)
-    for lid in watering_log_ids:
-        write_changes_delete("watering_log", lid)
-
-    # reminder
-    for rid in reminder_ids:
-        write_changes_delete("reminder", rid)
-
-    # shared_plant
-    for sid in shared_plant_ids:
-        write_changes_delete("shared_plant", sid)
+    if up_rows:
+        write_changes_upsert(
+            "user_plant",
+            [{"user_id": u_id, "plant_id": p_id, "_delete": True} for (u_id, p_id) in up_rows],
+        )
 
-    # friendship
-    for fid in friendship_ids:
-        write_changes_delete("friendship", fid)
+    for table, ids in (
+        ("plant", orphan_plant_ids),                   # piante orfane
+        ("plant_photo", orphan_photo_ids),             # foto delle piante orfane
+        ("plant_disease", orphan_plant_disease_ids),   # plant_disease delle piante orfane
+        ("watering_plan", watering_plan_ids),
+        ("watering_log", watering_log_ids),
+        ("reminder", reminder_ids),
+        ("shared_plant", shared_plant_ids),
+        ("friendship", friendship_ids),
+    ):
+        write_changes_delete_many(table, ids)
+    if orphan_plant_ids:
+        # piante orfane (e le loro foto) spariscono da tutti i cataloghi
+        _invalidate_catalog("plant", "plant_photo")
+    if orphan_photo_ids:
+        _invalidate_main_photo(catalog=False)
 
     return ("", 204)
 
@@ -2356,16 +2740,92 @@ def user_plant_all():
     user_id = g.user_id  # preso dal JWT
 
     with _session_ctx() as s:
+        # Solo colonne (niente istanze ORM / identity map): una riga per foto,
+        # raggruppata poi per plant_id.
         rows = (
-            s.query(UserPlant)
-            .options(
-                selectinload(UserPlant.plant).selectinload(Plant.photos)
+            s.query(
+                UserPlant.user_id,
+                UserPlant.plant_id,
+                UserPlant.location_note,
+                UserPlant.since,
+                UserPlant.health_status,
+                Plant.scientific_name,
+                Plant.common_name,
+                Plant.category,
+                Plant.climate,
+                Plant.origin,
+                Plant.use,
+                Plant.difficulty,
+                Plant.light_level,
+                Plant.min_temp_c,
+                Plant.max_temp_c,
+                Plant.family_id,
+                Plant.created_at,
+                Plant.size,
+                PlantPhoto.id,
+                PlantPhoto.url,
+                PlantPhoto.caption,
+                PlantPhoto.order_index,
+                PlantPhoto.created_at,
             )
+            .join(Plant, Plant.id == UserPlant.plant_id)
+            .outerjoin(PlantPhoto, PlantPhoto.plant_id == Plant.id)
             .filter(UserPlant.user_id == user_id)
+            .order_by(UserPlant.plant_id, PlantPhoto.order_index.asc())
             .all()
         )
 
-        return jsonify([_serialize_with_relations(r) for r in rows]), 200
+    out = {}
+    photos_by_plant = defaultdict(list)
+
+    for (up_user_id, plant_id, location_note, since, health_status,
+         scientific_name, common_name, category, climate, origin, use,
+         difficulty, light_level, min_temp_c, max_temp_c, family_id,
+         plant_created_at, size, photo_id, photo_url, photo_caption,
+         photo_order, photo_created_at) in rows:
+
+        if plant_id not in out:
+            size_value = size.value if size is not None else None
+            out[plant_id] = {
+                "user_id": up_user_id,
+                "plant_id": plant_id,
+                "location_note": location_note,
+                "since": since,
+                "health_status": health_status,
+                "size": size_value,
+                "plant": {
+                    "id": plant_id,
+                    "scientific_name": scientific_name,
+                    "common_name": common_name,
+                    "category": category,
+                    "climate": climate,
+                    "origin": origin,
+                    "use": use,
+                    "difficulty": difficulty,
+                    "light_level": light_level,
+                    "min_temp_c": min_temp_c,
+                    "max_temp_c": max_temp_c,
+                    "family_id": str(family_id) if family_id else None,
+                    "created_at": plant_created_at,
+                    "size": size_value,
+                    "photos": photos_by_plant[plant_id],
+                },
+            }
+
+        if photo_id is None:
+            continue
+
+        photos_by_plant[plant_id].append({
+            "id": photo_id,
+            "plant_id": plant_id,
+            "url": photo_url,
+            "caption": photo_caption,
+            "order_index": photo_order,
+            "created_at": photo_created_at,
+            "image": _encode_photo_webp(plant_id, photo_url) if photo_url else None,
+        })
+
+    return _json(list(out.values()))
 
 
 @api_blueprint.route("/user_plant/add", methods=["POST"])
@@ -2377,19 +2837,39 @@ def user_plant_add():
         return jsonify({"error": "Required field: plant_id"}), 400
     _ensure_uuid(plant_id, "plant_id")
 
+    try:
+        since = RepositoryService._parse_since_to_date(payload.get("since"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    row = {
+        "user_id": g.user_id,
+        "plant_id": plant_id,
+        "location_note": payload.get("location_note"),
+        "since": since,
+        "health_status": HealthStatus.HEALTHY.value,
+    }
+
     with _session_ctx() as s:
-        if s.get(UserPlant, (g.user_id, plant_id)):
-            return jsonify({"ok": True}), 200
+        # Un solo statement: INSERT semplice sulla PK composta (user_id, plant_id).
+        # Niente IGNORE (declasserebbe a warning anche dati troncati o non
+        # validi) né ON DUPLICATE KEY UPDATE (con CLIENT_FOUND_ROWS, attivo
+        # nel dialetto MySQL, rowcount vale 1 sia per l'insert sia per il
+        # no-op e non distinguerebbe 201 da 200): il duplicato arriva come
+        # IntegrityError 1062, FK e dati non validi come 409/400.
+        try:
+            s.execute(insert(UserPlant).values(**row))
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            if e.orig.args and e.orig.args[0] == _ER_DUP_ENTRY:
+                return jsonify({"ok": True}), 200
+            abort(409, description=f"Conflict: {e.orig}")
+        except DataError as e:
+            s.rollback()
+            abort(400, description=f"Bad data: {e.orig}")
 
-        up = UserPlant(
-            user_id=g.user_id,
-            plant_id=plant_id,
-            location_note=payload.get("location_note"),
-            since=payload.get("since"),
-        )
-        s.add(up)
-        _commit_or_409(s)
-        write_changes_upsert("user_plant", [_serialize_instance(up)])
+        write_changes_upsert("user_plant", [row])
         return jsonify({"ok": True}), 201
 
 
@@ -2424,49 +2904,50 @@ def user_plant_delete():
 @require_jwt
 def friendship_summary():
     user_id = g.user_id
-    print("\n===== [API] friendship_summary CALLED =====")
-    print(f"[USER]  Logged user_id: {user_id}")
+    logger.debug("===== [API] friendship_summary CALLED =====")
+    logger.debug("[USER]  Logged user_id: %s", user_id)
 
-    repo = RepositoryService()
+    repo = g.repo
 
     # short_id dell’utente loggato
-    short_id = user_id.split("-")[0]
-    print(f"[USER]  short_id (self): {short_id}")
+    # UUID in forma canonica: il primo "-" è sempre all'indice 8
+    short_id = user_id[:8]
+    logger.debug("[USER]  short_id (self): %s", short_id)
 
     # Tutte le friendship dell'utente
     rows = repo.get_friendships_for_user(user_id)
-    print(f"[DB]    Found {len(rows)} friendship rows for user {user_id}")
+    logger.debug("[DB]    Found %s friendship rows for user %s", len(rows), user_id)
 
     friends_out = []
     user_cache = {}
 
     with repo.Session() as s:
         for fr in rows:
-            print("\n--- Friendship Row ---")
-            print(f"[FR] friendship_id={fr.id}")
+            logger.debug("--- Friendship Row ---")
+            logger.debug("[FR] friendship_id=%s", fr.id)
 
             # Identifica l’amico
             friend_id = fr.user_id_b if fr.user_id_a == user_id else fr.user_id_a
-            print(f"[FR] friend_id resolved: {friend_id}")
+            logger.debug("[FR] friend_id resolved: %s", friend_id)
 
             # Carica info amico
             if friend_id not in user_cache:
-                print(f"[DB] Fetching friend user from DB: {friend_id}")
+                logger.debug("[DB] Fetching friend user from DB: %s", friend_id)
                 u = s.query(User).filter(User.id == friend_id).first()
                 user_cache[friend_id] = u
 
                 if u is None:
-                    print(f"[WARN] Friend user not found in DB: {friend_id}")
+                    logger.warning("[WARN] Friend user not found in DB: %s", friend_id)
                 else:
-                    print(f"[OK]   Loaded friend user: {u.first_name} {u.last_name}")
+                    logger.debug("[OK]   Loaded friend user: %s %s", u.first_name, u.last_name)
             else:
-                print(f"[CACHE] Using cached user for {friend_id}")
+                logger.debug("[CACHE] Using cached user for %s", friend_id)
 
             u = user_cache[friend_id]
 
             # Calcolo short_id dell’amico
-            friend_short_id = friend_id.split("-")[0]
-            print(f"[FR] friend_short_id: {friend_short_id}")
+            friend_short_id = friend_id[:8]
+            logger.debug("[FR] friend_short_id: %s", friend_short_id)
 
             # Aggiungi all’output
             out_entry = {
@@ -2475,24 +2956,24 @@ def friendship_summary():
                 "short_id": friend_short_id,
                 "first_name": u.first_name if u else None,
                 "last_name": u.last_name if u else None,
-                "created_at": fr.created_at.isoformat() if fr.created_at else None,
+                "created_at": fr.created_at,
             }
 
-            print(f"[OUT] Appended friend entry: {out_entry}")
+            logger.debug("[OUT] Appended friend entry: %s", out_entry)
 
             friends_out.append(out_entry)
 
-    print("\n===== FINAL OUTPUT =====")
-    print(f"[RETURN] Total friends: {len(friends_out)}")
+    logger.debug("===== FINAL OUTPUT =====")
+    logger.debug("[RETURN] Total friends: %s", len(friends_out))
     for f in friends_out:
-        print(f" → {f['first_name']} {f['last_name']} | user_id={f['user_id']} | short_id={f['short_id']}")
+        logger.debug("→ %s %s | user_id=%s | short_id=%s", f['first_name'], f['last_name'], f['user_id'], f['short_id'])
 
-    print("===== END friendship_summary =====\n")
+    logger.debug("===== END friendship_summary =====")
 
-    return jsonify({
+    return _json({
         "short_id": short_id,
         "my_friends": friends_out
-    }), 200
+    })
 
 
 # ============================
@@ -2505,18 +2986,18 @@ def friendship_add_by_short():
     payload = _parse_json_body()
     short_id = payload.get("short_id", "").strip()
 
-    print(f"[API] /friendship/add-by-short short_id={short_id}")
+    logger.debug("[API] /friendship/add-by-short short_id=%s", short_id)
 
     if not short_id or len(short_id) < 3:
         return jsonify({"error": "Invalid short_id"}), 400
 
-    repo = RepositoryService()
+    repo = g.repo
     current_user_id = g.user_id
-    print(f"[API] Current user = {current_user_id}")
+    logger.debug("[API] Current user = %s", current_user_id)
 
     # 1) trova user dal short id
     target_user_id = repo.get_user_id_by_short(short_id)
-    print(f"[API] get_user_id_by_short → {target_user_id}")
+    logger.debug("[API] get_user_id_by_short → %s", target_user_id)
 
     if not target_user_id:
         return jsonify({"error": "User not found"}), 404
@@ -2538,11 +3019,18 @@ def friendship_add_by_short():
 
     try:
         fr = repo.create_friendship(data)
-        print(f"[API] Friendship created → {fr.id}")
+        logger.debug("[API] Friendship created → %s", fr.id)
         return jsonify({"ok": True, "friendship_id": fr.id}), 201
 
+    except IntegrityError as e:
+        if e.orig.args and e.orig.args[0] == _ER_NO_REFERENCED_ROW:
+            # short_id in cache di un utente cancellato nel frattempo
+            repo.forget_short_id(short_id)
+            return jsonify({"error": "User not found"}), 404
+        return jsonify({"error": "Friendship already exists"}), 409
+
     except Exception as e:
-        print("[API] ERROR creating friendship:", e)
+        logger.debug("[API] ERROR creating friendship: %s", e)
         return jsonify({"error": "Could not create friendship"}), 500
 
 
@@ -2554,7 +3042,7 @@ def friendship_add_by_short():
 @require_jwt
 def friendship_add():
     payload = _parse_json_body()
-    repo = RepositoryService()
+    repo = g.repo
 
     data = _filter_fields_for_model(payload, Friendship)
 
@@ -2576,9 +3064,9 @@ def friendship_add():
 
     try:
         fr = repo.create_friendship(data)
-        print(f"[API] friendship_add → created {fr.id}")
+        logger.debug("[API] friendship_add → created %s", fr.id)
     except Exception as e:
-        print("[API] ERROR friendship_add:", e)
+        logger.debug("[API] ERROR friendship_add: %s", e)
         return jsonify({"error": "Could not create friendship"}), 500
 
     return jsonify({"ok": True, "id": fr.id}), 201
@@ -2593,28 +3081,28 @@ def friendship_add():
 def friendship_update(fid: str):
     _ensure_uuid(fid, "friendship_id")
     payload = _parse_json_body()
-    repo = RepositoryService()
+    repo = g.repo
 
-    fr = repo.get_friendship_by_id(fid)
-    if not fr:
-        return jsonify({"error": "Friendship not found"}), 404
-    # controllo: l'utente deve essere user_id_a o user_id_b
-    if str(fr.user_id_a) != str(g.user_id) and str(fr.user_id_b) != str(g.user_id):
-        return jsonify(
-            {"error": "Forbidden: non fai parte di questa friendship"}
-        ), 403
-
-    data = _filter_fields_for_model(payload, Friendship)
+    data = _filter_fields_for_model(
+        payload, Friendship, exclude={"id", "user_min", "user_max"}
+    )
 
     try:
-        updated = repo.update_friendship(fid, data)
-        if not updated:
-            return jsonify({"error": "Friendship not found"}), 404
-        print(f"[API] friendship_update → updated {fid}")
+        # UPDATE unico, già filtrato sull'utente loggato (user_id_a o user_id_b)
+        updated = repo.update_friendship(fid, data, member_id=g.user_id)
     except Exception as e:
-        print("[API] ERROR updating friendship:", e)
+        logger.debug("[API] ERROR updating friendship: %s", e)
         return jsonify({"error": "Update error"}), 500
 
+    if not updated:
+        # percorso raro: distinguo 404 da 403 solo qui
+        if repo.get_friendship_by_id(fid) is None:
+            return jsonify({"error": "Friendship not found"}), 404
+        return jsonify(
+            {"error": "Forbidden: non fai parte di questa friendship"}
+        ), 403
+
+    logger.debug("[API] friendship_update → updated %s", fid)
     return jsonify({"ok": True, "id": fid}), 200
 
 
@@ -2662,7 +3150,7 @@ def friendship_delete(friendship_id: str):
 @require_jwt
 def shared_plant_all():
     user_id = g.user_id
-    repo = RepositoryService()
+    repo = g.repo
 
     # Il repository restituisce già il JSON finale
     rows = repo.get_shared_plants_for_user(user_id)
@@ -2676,98 +3164,95 @@ def shared_plant_add():
     """
     Crea una nuova condivisione e assegna la pianta al recipient (tabella user_plant).
     """
-    from datetime import datetime
-
     payload = _parse_json_body()
-    repo = RepositoryService()
+    repo = g.repo
 
     plant_id = payload.get("plant_id")
     short_id = payload.get("short_id")
 
-    print("\n===== [API] SHARED PLANT ADD =====")
-    print(f"[PAYLOAD] plant_id={plant_id}, short_id={short_id}")
+    logger.debug("===== [API] SHARED PLANT ADD =====")
+    logger.debug("[PAYLOAD] plant_id=%s, short_id=%s", plant_id, short_id)
 
     # -------------------------
     # Validate input
     # -------------------------
     if not plant_id or not short_id:
-        print("[ERROR] Missing plant_id or short_id")
+        logger.debug("[ERROR] Missing plant_id or short_id")
         return jsonify({"error": "Missing plant_id or short_id"}), 400
+    if not isinstance(plant_id, str) or not isinstance(short_id, str):
+        # numeri/oggetti dal JSON: 400 invece del TypeError su len() → 500
+        logger.debug("[ERROR] plant_id/short_id not strings")
+        return jsonify({"error": "plant_id and short_id must be strings"}), 400
 
     owner_id = g.user_id
-    print(f"[OWNER] {owner_id}")
+    logger.debug("[OWNER] %s", owner_id)
 
     # -------------------------
-    # Check plant exists
+    # Un solo SELECT: pianta esiste? owner la possiede? short_id → recipient
     # -------------------------
-    print("[CHECK] Verifying plant exists…")
+    logger.debug("[CHECK] Verifying plant, ownership and recipient…")
+    recipient_id = None
     with repo.Session() as s:
-        plant = s.query(Plant).filter(Plant.id == plant_id).first()
-        if not plant:
-            print("[ERROR] Plant not found")
-            return jsonify({"error": "Plant not found"}), 404
+        recipient_sq = (
+            select(User.id)
+            .where(repo.short_id_clause(short_id))
+            .limit(1)
+            .scalar_subquery()
+            if len(short_id) >= 3 else None
+        )
+        plant_exists, owns_plant, recipient_id = s.execute(
+            select(
+                exists().where(Plant.id == plant_id),
+                exists().where(
+                    UserPlant.user_id == owner_id,
+                    UserPlant.plant_id == plant_id,
+                ),
+                recipient_sq if recipient_sq is not None else literal(None),
+            )
+        ).one()
 
-        # Verifica che l'utente loggato possieda questa pianta
-        up = s.get(UserPlant, (owner_id, plant_id))
-        if not up:
-            print("[ERROR] Owner does not own this plant")
-            return jsonify({"error": "Forbidden: non possiedi questa pianta"}), 403
+    if not plant_exists:
+        logger.debug("[ERROR] Plant not found")
+        return jsonify({"error": "Plant not found"}), 404
 
-    # -------------------------
-    # Resolve short_id → recipient
-    # -------------------------
-    recipient_id = repo.get_user_id_by_short(short_id)
+    # Verifica che l'utente loggato possieda questa pianta
+    if not owns_plant:
+        logger.debug("[ERROR] Owner does not own this plant")
+        return jsonify({"error": "Forbidden: non possiedi questa pianta"}), 403
 
     if not recipient_id:
-        print("[ERROR] Recipient short_id not found")
+        logger.debug("[ERROR] Recipient short_id not found")
         return jsonify({"error": "Recipient not found"}), 404
 
-    print(f"[RECIPIENT] {recipient_id}")
+    logger.debug("[RECIPIENT] %s", recipient_id)
 
     if recipient_id == owner_id:
-        print("[ERROR] Cannot share with yourself")
+        logger.debug("[ERROR] Cannot share with yourself")
         return jsonify({"error": "Cannot share with yourself"}), 400
 
     # -------------------------
-    # Create SharedPlant
-    # -------------------------
-    data = {
-        "owner_user_id": owner_id,
-        "recipient_user_id": recipient_id,
-        "plant_id": plant_id,
-        "can_edit": True
-    }
-
-    try:
-        sp = repo.create_shared_plant(data)
-        print(f"[OK] SharedPlant created id={sp.id}")
-    except Exception as e:
-        print("[FATAL] Error creating shared plant:", e)
-        return jsonify({"error": "Could not create shared plant"}), 500
-
-    # -------------------------
-    # Assign plant to recipient (user_plant)
+    # Create SharedPlant + assign plant to recipient (user_plant),
+    # con controllo duplicati, in un'unica transazione
     # -------------------------
-    print("[CHECK] Assigning plant to recipient…")
-
     try:
-        up = repo.ensure_user_plant_link(
-            user_id=recipient_id,
+        shared_id = repo.share_plant(
+            owner_id=owner_id,
+            recipient_id=recipient_id,
             plant_id=plant_id,
-            location_note=None,
-            since=datetime.utcnow(),
-            overwrite=False
+            can_edit=True,
         )
-        print("[OK] UserPlant linked:", up)
     except Exception as e:
-        print("[FATAL] Error linking plant to user:", e)
-        return jsonify({
-            "error": "Shared but could not assign plant to recipient (user_plant failed)"
-        }), 500
+        logger.debug("[FATAL] Error creating shared plant: %s", e)
+        return jsonify({"error": "Could not create shared plant"}), 500
+
+    if shared_id is None:
+        logger.debug("[ERROR] Plant already shared with this recipient")
+        return jsonify({"error": "Plant already shared with this user"}), 409
 
-    print("===== [API] FINISHED SHARED PLANT ADD =====\n")
+    logger.debug("[OK] SharedPlant created id=%s, plant linked to recipient", shared_id)
+    logger.debug("===== [API] FINISHED SHARED PLANT ADD =====")
 
-    return jsonify({"ok": True, "shared_id": sp.id}), 201
+    return jsonify({"ok": True, "shared_id": shared_id}), 201
 
 
 @api_blueprint.route("/shared_plant/update/<sid>", methods=["PATCH", "PUT"])
@@ -2775,7 +3260,7 @@ def shared_plant_add():
 def shared_plant_update(sid: str):
     _ensure_uuid(sid, "shared_plant_id")
     payload = _parse_json_body()
-    repo = RepositoryService()
+    repo = g.repo
     # carico la shared_plant per controllare l'owner
     sp = repo.get_shared_plant_by_id(sid)
     if not sp:
@@ -2851,14 +3336,15 @@ def get_watering_plan_for_plant(plant_id: str):
 @api_blueprint.route("/watering_plan/all", methods=["GET"])
 @require_jwt
 def watering_plan_all():
-    with _session_ctx() as s:
-        rows = (
-            s.query(WateringPlan)
-            .filter(WateringPlan.user_id == g.user_id)
-            .order_by(WateringPlan.next_due_at.asc())
-            .all()
+    user_id = g.user_id
+    page = _keyset_args()
+
+    return _stream_json_list(
+        _keyset(
+            select(*WateringPlan.__table__.c).where(WateringPlan.user_id == user_id),
+            WateringPlan.next_due_at, WateringPlan.id, page,
         )
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    )
 
 
 @api_blueprint.route("/watering_plan/add", methods=["POST"])
@@ -2873,7 +3359,7 @@ def watering_plan_add():
         return jsonify({"error": f"Campi obbligatori: {', '.join(missing)}"}), 400
 
     with _session_ctx() as s:
-        if not s.get(UserPlant, (g.user_id, data["plant_id"])):
+        if not _owns_plant(s, g.user_id, data["plant_id"]):
             return jsonify({"error": "Forbidden: non possiedi questa pianta"}), 403
 
         data["user_id"] = g.user_id
@@ -2928,8 +3414,7 @@ def watering_plan_delete(plan_id: str):
             return ("", 204)
 
         # Check di ownership tramite la pianta
-        owner_link = s.get(UserPlant, (current_user_id, wp.plant_id))
-        if not owner_link:
+        if not _owns_plant(s, current_user_id, wp.plant_id):
             return (
                 jsonify({"error": "Forbidden: non possiedi questa pianta"}),
                 403,
@@ -2946,14 +3431,15 @@ def watering_plan_delete(plan_id: str):
 @api_blueprint.route("/watering_log/all", methods=["GET"])
 @require_jwt
 def watering_log_all():
-    with _session_ctx() as s:
-        rows = (
-            s.query(WateringLog)
-            .filter(WateringLog.user_id == g.user_id)
-            .order_by(WateringLog.done_at.desc())
-            .all()
+    user_id = g.user_id
+    page = _keyset_args()
+
+    return _stream_json_list(
+        _keyset(
+            select(*WateringLog.__table__.c).where(WateringLog.user_id == user_id),
+            WateringLog.done_at, WateringLog.id, page, descending=True,
         )
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    )
 
 
 @api_blueprint.route("/watering_log/add", methods=["POST"])
@@ -2978,11 +3464,11 @@ def watering_log_add():
         return jsonify({"error": "amount_ml deve essere un intero"}), 400
 
     if not data.get("done_at"):
-        data["done_at"] = datetime.utcnow()
+        data["done_at"] = _now()
 
     with _session_ctx() as s:
         # Verifica che l'utente possieda la pianta
-        if not s.get(UserPlant, (g.user_id, data["plant_id"])):
+        if not _owns_plant(s, g.user_id, data["plant_id"]):
             return jsonify({"error": "Forbidden: non possiedi questa pianta"}), 403
 
         data["user_id"] = g.user_id
@@ -3036,8 +3522,7 @@ def watering_log_delete(log_id: str):
             write_changes_delete("watering_log", log_id)
             return ("", 204)
 
-        owner_link = s.get(UserPlant, (current_user_id, wl.plant_id))
-        if not owner_link:
+        if not _owns_plant(s, current_user_id, wl.plant_id):
             return (
                 jsonify({"error": "Forbidden: non possiedi questa pianta"}),
                 403,
@@ -3060,8 +3545,11 @@ def question_all():
     with _session_ctx() as s:
         # se Question avesse created_at lo useremmo, altrimenti ordiniamo per id
         order_col = getattr(Question, "created_at", Question.id)
+        # opzioni caricate in un'unica IN(...) e già ordinate per position
+        # (order_by della relationship): 2 query totali, niente sort in Python
         rows = (
             s.query(Question)
+            .options(selectinload(Question.options))
             .filter(Question.active.is_(True))
             .order_by(order_col.desc())
             .all()
@@ -3069,7 +3557,7 @@ def question_all():
 
         out = []
         for q in rows:
-            opts = sorted(q.options, key=lambda o: o.position)
+            opts = q.options
             out.append({
                 "id": str(q.id),
                 "text": q.text,
@@ -3089,6 +3577,10 @@ def question_all():
         return jsonify(out), 200
 
 
+# etichette delle opzioni (QuestionOption.label è String(1)): 'A'..'Z'
+_OPT_LABELS = tuple(chr(ord("A") + i) for i in range(26))
+
+
 @api_blueprint.route("/question/add", methods=["POST"])
 @require_jwt
 def question_add():
@@ -3120,6 +3612,8 @@ def question_add():
 
     if not isinstance(options, list) or not options:
         return jsonify({"error": "options deve essere una lista non vuota"}), 400
+    if len(options) > len(_OPT_LABELS):
+        return jsonify({"error": f"options: massimo {len(_OPT_LABELS)} elementi"}), 400
 
     with _session_ctx() as s:
         # crea la domanda
@@ -3131,17 +3625,19 @@ def question_add():
         s.add(q)
         s.flush()  # per avere q.id
 
-        # crea le opzioni
-        for idx, opt_text in enumerate(options, start=1):
-            label = chr(ord("A") + (idx - 1))  # 'A','B','C','D', ...
-            opt = QuestionOption(
-                question_id=q.id,
-                label=label,
-                text=str(opt_text),
-                is_correct=False,
-                position=idx,
-            )
-            s.add(opt)
+        # crea le opzioni con un solo INSERT multi-riga
+        # (executemany: PyMySQL lo riscrive in INSERT ... VALUES (...), (...))
+        option_rows = [
+            {
+                "question_id": q.id,
+                "label": label,  # 'A','B','C','D', ...
+                "text": str(opt_text),
+                "is_correct": False,
+                "position": idx,
+            }
+            for idx, (label, opt_text) in enumerate(zip(_OPT_LABELS, options), start=1)
+        ]
+        s.execute(insert(QuestionOption), option_rows)
 
         _commit_or_409(s)
         write_changes_upsert("question", [_serialize_instance(q)])
@@ -3161,7 +3657,8 @@ def question_update(qid: str):
     payload = _parse_json_body()
 
     with _session_ctx() as s:
-        q = s.get(Question, qid)
+        # options/answers sono selectin: qui non servono, niente SELECT extra
+        q = s.get(Question, qid, options=[raiseload("*")])
         if not q:
             return jsonify({"error": "Question not found"}), 404
 
@@ -3190,9 +3687,10 @@ def question_delete(qid: str):
     _ensure_uuid(qid, "question_id")
 
     with _session_ctx() as s:
-        q = s.get(Question, qid)
-        if q:
-            s.delete(q)
+        # un solo DELETE: opzioni e risposte le cancella il DB (FK CASCADE),
+        # senza caricarle prima come farebbe s.delete(q)
+        deleted = s.execute(delete(Question).where(Question.id == qid)).rowcount
+        if deleted:
             _commit_or_409(s)
             # log su changes.json
             write_changes_delete("question", qid)
@@ -3265,11 +3763,11 @@ def questionnaire_submit_answers():
 @api_blueprint.route("/reminders/check-plants", methods=["POST"])
 @require_jwt
 def reminders_check_plants():
-    print("\n==============================")
-    print("API CALL → /reminders/check-plants")
-    print("==============================")
+    logger.debug("==============================")
+    logger.debug("API CALL → /reminders/check-plants")
+    logger.debug("==============================")
 
-    print(f"→ USER ID from JWT: {g.user_id}")
+    logger.debug("→ USER ID from JWT: %s", g.user_id)
 
     try:
         result = reminder_service.check_due_plants_for_user_using_repo(
@@ -3277,15 +3775,14 @@ def reminders_check_plants():
             repo=repo,
         )
 
-        print("→ SERVICE RESULT:")
-        print(result)
+        logger.debug("→ SERVICE RESULT:")
+        logger.debug("%s", result)
 
-        print("=== END /reminders/check-plants (OK) ===\n")
+        logger.debug("=== END /reminders/check-plants (OK) ===")
         return jsonify(result), 200
 
     except Exception as e:
-        print("=== ERROR in /reminders/check-plants ===")
-        print(e)
+        logger.error("=== ERROR in /reminders/check-plants === %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -3305,7 +3802,7 @@ def watering_overview():
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
-        today = datetime.utcnow().date()
+        today = _now().date()
         week_start = today - timedelta(days=today.weekday())
         days = [(week_start + timedelta(days=i)) for i in range(7)]
 
@@ -3320,31 +3817,45 @@ def watering_overview():
         week_start_dt = datetime.combine(week_start, datetime.min.time())
         week_end_dt = week_start_dt + timedelta(days=7)
 
-        with SessionLocal() as s:
-            logs = (
-                s.query(WateringLog)
-                .filter(
-                    WateringLog.user_id == user_id,
-                    WateringLog.done_at >= week_start_dt,
-                    WateringLog.done_at < week_end_dt,
-                )
-                .all()
+        # Raggruppamento (giorno, pianta) fatto da MySQL: una riga per cella
+        # con i log già aggregati in un array JSON (done_at nello stesso
+        # formato di datetime.isoformat(), colonna DATETIME senza frazioni)
+        day_col = func.date(WateringLog.done_at)
+        cells = (
+            select(
+                day_col,
+                WateringLog.plant_id,
+                func.json_arrayagg(
+                    func.json_object(
+                        "done_at", func.date_format(WateringLog.done_at, "%Y-%m-%dT%H:%i:%s"),
+                        "amount_ml", WateringLog.amount_ml,
+                        "note", WateringLog.note,
+                    )
+                ),
+            )
+            .where(
+                WateringLog.user_id == user_id,
+                WateringLog.done_at >= week_start_dt,
+                WateringLog.done_at < week_end_dt,
             )
+            .group_by(day_col, WateringLog.plant_id)
+        )
 
-        # Raggruppiamo log per giorno e plant_id
-        logs_by_day = {}
-        for d in days:
-            logs_by_day[d.isoformat()] = {}
-
-        for log in logs:
-            day_key = log.done_at.date().isoformat()
-            pid = str(log.plant_id)
-            logs_by_day[day_key].setdefault(pid, [])
-            logs_by_day[day_key][pid].append({
-                "done_at": log.done_at.isoformat(),
-                "amount_ml": log.amount_ml,
-                "note": log.note,
-            })
+        logs_by_cell = {}
+        by_day_pids = defaultdict(set)
+
+        with SessionLocal() as s:
+            for day, pid, logs_json in s.execute(cells):
+                day_key = day.isoformat()
+                pid = str(pid)
+                logs_by_cell[(day_key, pid)] = orjson.loads(logs_json)
+                by_day_pids[day_key].add(pid)
+
+        # A) giorno di next_due_at (calcolato una volta per pianta)
+        for p in plants:
+            next_due = p.get("next_due_at")
+            if next_due:
+                by_day_pids[next_due[:10]].add(p["plant_id"])
 
         # ----------------------------------------
         # 3) Costruiamo settimana → solo giorni corretti
@@ -3353,27 +3864,13 @@ def watering_overview():
 
         for d in days:
             day_key = d.isoformat()
-            plants_today = []
-
-            for p in plants:
-                pid = p["plant_id"]
+            active = by_day_pids.get(day_key, ())
 
-                appears = False
-
-                # A) next_due_at coincide con il giorno
-                next_due = p.get("next_due_at")
-                if next_due and next_due[:10] == day_key:
-                    appears = True
-
-                # B) esiste un log per quel giorno
-                if pid in logs_by_day.get(day_key, {}):
-                    appears = True
-
-                if appears:
-                    plants_today.append({
-                        **p,
-                        "logs_today": logs_by_day[day_key].get(pid, [])
-                    })
+            plants_today = [
+                {**p, "logs_today": logs_by_cell.get((day_key, p["plant_id"]), [])}
+                for p in plants
+                if p["plant_id"] in active
+            ]
 
             result.append({
                 "date": day_key,
@@ -3384,7 +3881,7 @@ def watering_overview():
         return jsonify(result), 200
 
     except Exception as e:
-        print("[ERROR] /watering/overview:", e)
+        logger.error("[ERROR] /watering/overview: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -3392,23 +3889,23 @@ def watering_overview():
 @api_blueprint.route("/plant/<plant_id>/watering/do", methods=["POST"])
 @require_jwt
 def plant_do_watering(plant_id: str):
-    print(f"[WATERING][DO] Called for plant_id={plant_id}")
+    logger.debug("[WATERING][DO] Called for plant_id=%s", plant_id)
 
     _ensure_uuid(plant_id, "plant_id")
 
     payload = _parse_json_body() or {}
-    print(f"[WATERING][DO] Payload received: {payload}")
+    logger.debug("[WATERING][DO] Payload received: %s", payload)
 
     # amount_ml obbligatorio
     amount_ml = payload.get("amount_ml")
     if amount_ml is None:
-        print("[WATERING][DO] Missing amount_ml.")
+        logger.debug("[WATERING][DO] Missing amount_ml.")
         return jsonify({"error": "Campo obbligatorio: amount_ml"}), 400
 
     try:
         amount_ml = int(amount_ml)
     except (TypeError, ValueError):
-        print("[WATERING][DO] amount_ml is not an integer.")
+        logger.debug("[WATERING][DO] amount_ml is not an integer.")
         return jsonify({"error": "amount_ml deve essere un intero"}), 400
 
     note = payload.get("note") or None
@@ -3416,21 +3913,20 @@ def plant_do_watering(plant_id: str):
     done_at = None
 
     if done_at_raw:
-        print(f"[WATERING][DO] Parsing done_at: {done_at_raw}")
+        logger.debug("[WATERING][DO] Parsing done_at: %s", done_at_raw)
         if isinstance(done_at_raw, str):
-            try:
-                done_at = datetime.fromisoformat(done_at_raw)
-            except Exception:
-                print("[WATERING][DO] Invalid ISO format for done_at.")
+            done_at = _parse_iso_datetime(done_at_raw)
+            if done_at is None:
+                logger.debug("[WATERING][DO] Invalid ISO format for done_at.")
                 return jsonify({"error": "done_at deve essere in formato ISO 8601"}), 400
 
     # Verifica che l'utente possieda la pianta
     with _session_ctx() as s:
-        if not s.get(UserPlant, (g.user_id, plant_id)):
-            print(f"[WATERING][DO] Forbidden: user {g.user_id} does not own plant {plant_id}.")
+        if not _owns_plant(s, g.user_id, plant_id):
+            logger.debug("[WATERING][DO] Forbidden: user %s does not own plant %s.", g.user_id, plant_id)
             return jsonify({"error": "Forbidden: non possiedi questa pianta"}), 403
 
-    print(f"[WATERING][DO] Registering watering for user={g.user_id}, plant={plant_id}")
+    logger.debug("[WATERING][DO] Registering watering for user=%s, plant=%s", g.user_id, plant_id)
 
     res = reminder_service.register_watering_and_schedule_next(
         user_id=str(g.user_id),
@@ -3441,10 +3937,10 @@ def plant_do_watering(plant_id: str):
     )
 
     if not res.get("ok"):
-        print(f"[WATERING][DO] Error from service: {res}")
+        logger.debug("[WATERING][DO] Error from service: %s", res)
         return jsonify({"error": res.get("error", "Unable to register watering")}), 400
 
-    print(f"[WATERING][DO] Watering registered successfully: {res}")
+    logger.debug("[WATERING][DO] Watering registered successfully: %s", res)
 
     return jsonify(
         {
@@ -3462,21 +3958,22 @@ def plant_do_watering(plant_id: str):
 @require_jwt
 def plant_undo_watering(plant_id):
     user_id = str(g.user_id)
-    print(f"[UNDO][PLANT] plant_id={plant_id}, user_id={user_id}")
+    logger.debug("[UNDO][PLANT] plant_id=%s, user_id=%s", plant_id, user_id)
 
     with _session_ctx() as s:
 
-        now = datetime.utcnow()
+        now = _now()
         today_midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
         tomorrow_midnight = today_midnight + timedelta(days=1)
 
-        print(f"[UNDO] Today range: {today_midnight} → {tomorrow_midnight}")
+        logger.debug("[UNDO] Today range: %s → %s", today_midnight, tomorrow_midnight)
 
         # ---------------------------------------------------
         # 1) Trova SOLO il log REALE di oggi (ora ≠ 00:00)
+        #    (solo l'id: la DELETE è un'unica istruzione Core)
         # ---------------------------------------------------
-        real_log = (
-            s.query(WateringLog)
+        real_log_id = (
+            s.query(WateringLog.id)
             .filter(
                 WateringLog.user_id == user_id,
                 WateringLog.plant_id == plant_id,
@@ -3484,38 +3981,20 @@ def plant_undo_watering(plant_id):
                 WateringLog.done_at < tomorrow_midnight,
                 WateringLog.done_at != today_midnight
             )
-            .first()
+            .limit(1)
+            .scalar()
         )
 
-        if not real_log:
-            print("[UNDO] No REAL log to undo.")
+        if not real_log_id:
+            logger.debug("[UNDO] No REAL log to undo.")
             return jsonify({"error": "Nessun watering da annullare"}), 400
 
-        print(f"[UNDO] Removing REAL log: {real_log.done_at}")
-        s.delete(real_log)
-
         # ---------------------------------------------------
-        # 2) Cancella TUTTI i log FUTURI della pianta
+        # 2) Recupera piano + water_level della pianta (una query)
         # ---------------------------------------------------
-        future_logs = (
-            s.query(WateringLog)
-            .filter(
-                WateringLog.user_id == user_id,
-                WateringLog.plant_id == plant_id,
-                WateringLog.done_at >= tomorrow_midnight
-            )
-            .all()
-        )
-
-        for fl in future_logs:
-            print(f"[UNDO] Removing FUTURE log: {fl.done_at}")
-            s.delete(fl)
-
-        # ---------------------------------------------------
-        # 3) Recupera piano
-        # ---------------------------------------------------
-        plan = (
-            s.query(WateringPlan)
+        plan_row = (
+            s.query(WateringPlan, Plant.water_level)
+            .outerjoin(Plant, Plant.id == WateringPlan.plant_id)
             .filter(
                 WateringPlan.user_id == user_id,
                 WateringPlan.plant_id == plant_id
@@ -3523,22 +4002,35 @@ def plant_undo_watering(plant_id):
             .first()
         )
 
-        if not plan:
-            print("[UNDO] No plan found.")
-            s.rollback()
+        if not plan_row:
+            logger.debug("[UNDO] No plan found.")
             return jsonify({"error": "Nessun piano trovato"}), 400
 
-        interval_days = int(plan.interval_days or 3)
+        plan, water_level = plan_row
+
+        # ---------------------------------------------------
+        # 3) Cancella il log reale e TUTTI i log FUTURI della pianta
+        # ---------------------------------------------------
+        logger.debug("[UNDO] Removing REAL log: %s", real_log_id)
+        s.execute(delete(WateringLog).where(WateringLog.id == real_log_id))
+
+        removed = s.execute(
+            delete(WateringLog).where(
+                WateringLog.user_id == user_id,
+                WateringLog.plant_id == plant_id,
+                WateringLog.done_at >= tomorrow_midnight
+            )
+        ).rowcount
+        logger.debug("[UNDO] Removed %s FUTURE log(s)", removed)
 
         # ---------------------------------------------------
         # 4) Calcolo ml per log programmato
         # ---------------------------------------------------
-        plant_obj = s.query(Plant).filter(Plant.id == plant_id).one_or_none()
         scheduled_ml = 150  # fallback base
 
-        if plant_obj is not None:
+        if water_level is not None:
             ml = 150
-            wl = int(plant_obj.water_level or 3)
+            wl = int(water_level or 3)
             if wl <= 2:
                 ml = int(ml * 0.8)
             elif wl >= 4:
@@ -3548,7 +4040,7 @@ def plant_undo_watering(plant_id):
         # ---------------------------------------------------
         # 5) Ricrea log programmato a mezzanotte (00:00)
         # ---------------------------------------------------
-        print(f"[UNDO] Creating SCHEDULED log at midnight {today_midnight}")
+        logger.debug("[UNDO] Creating SCHEDULED log at midnight %s", today_midnight)
 
         new_sched = WateringLog(
             id=str(uuid.uuid4()),
@@ -3558,22 +4050,23 @@ def plant_undo_watering(plant_id):
             amount_ml=scheduled_ml,
             note="SCHEDULED FROM PLAN (UNDO)",
         )
-        s.add(new_sched)
 
         # ---------------------------------------------------
         # 6) next_due_at = oggi a mezzanotte
         # ---------------------------------------------------
         plan.next_due_at = today_midnight
-        print(f"[UNDO] next_due_at reset to {today_midnight}")
+        logger.debug("[UNDO] next_due_at reset to %s", today_midnight)
 
         # ---------------------------------------------------
         # 7) Ricrea reminder
         # ---------------------------------------------------
-        s.query(Reminder).filter(
-            Reminder.user_id == user_id,
-            Reminder.entity_type == "plant",
-            Reminder.entity_id == plant_id
-        ).delete()
+        s.execute(
+            delete(Reminder).where(
+                Reminder.user_id == user_id,
+                Reminder.entity_type == "plant",
+                Reminder.entity_id == plant_id
+            )
+        )
 
         new_rem = Reminder(
             user_id=user_id,
@@ -3585,14 +4078,14 @@ def plant_undo_watering(plant_id):
             entity_type="plant",
             entity_id=plant_id,
         )
-        s.add(new_rem)
+        s.add_all([new_sched, new_rem])
 
         # ---------------------------------------------------
         # 8) Commit finale
         # ---------------------------------------------------
         s.commit()
 
-        print("[UNDO] Completed successfully.")
+        logger.debug("[UNDO] Completed successfully.")
 
         return jsonify({
             "ok": True,
@@ -3611,51 +4104,63 @@ def watering_plan_calendar_export():
     user_id = g.user_id
 
     with _session_ctx() as s:
-        rows = (
-            s.query(WateringPlan, Plant)
+        # solo le colonne che servono (niente istanze ORM);
+        # ordinamento servito da idx_wp_user_due (user_id, next_due_at)
+        rows = s.execute(
+            select(
+                WateringPlan.id,
+                Plant.id,
+                Plant.common_name,
+                Plant.scientific_name,
+                WateringPlan.next_due_at,
+                WateringPlan.interval_days,
+                WateringPlan.notes,
+            )
             .join(Plant, Plant.id == WateringPlan.plant_id)
-            .filter(WateringPlan.user_id == user_id)
+            .where(WateringPlan.user_id == user_id)
             .order_by(WateringPlan.next_due_at.asc())
-            .all()
-        )
+        ).all()
 
-        events = []
-        for wp, plant in rows:
-            # Titolo leggibile per il calendario
-            title = f"Water {plant.common_name or plant.scientific_name}"
+    events = []
+    for wp_id, plant_id, common_name, scientific_name, next_due_at, interval_days, notes in rows:
+        plant_name = common_name or scientific_name
 
-            events.append({
-                "id": str(wp.id),
+        events.append({
+            "id": str(wp_id),
 
-                # Info pianta (SOLO ciò che serve!)
-                "plant_id": str(plant.id),
-                "plant_name": plant.common_name or plant.scientific_name,
+            # Info pianta (SOLO ciò che serve!)
+            "plant_id": str(plant_id),
+            "plant_name": plant_name,
 
-                # Evento
-                "title": title,
-                "start": wp.next_due_at.isoformat(),
+            # Evento (titolo leggibile per il calendario)
+            "title": f"Water {plant_name}",
+            "start": next_due_at.isoformat(),
 
-                # Ripetizione (opzionale)
-                "interval_days": wp.interval_days,
+            # Ripetizione (opzionale)
+            "interval_days": interval_days,
 
-                # Note opzionali
-                "notes": wp.notes or ""
-            })
+            # Note opzionali
+            "notes": notes or ""
+        })
 
-        return jsonify(events), 200
+    return jsonify(events), 200
 
 
 @api_blueprint.route("/reminder/all", methods=["GET"])
 @require_jwt
 def reminder_all():
-    with _session_ctx() as s:
-        rows = (
-            s.query(Reminder)
-            .filter(Reminder.user_id == g.user_id)
-            .order_by(Reminder.scheduled_at.asc())
-            .all()
+    user_id = g.user_id
+    page = _keyset_args()
+
+    return _stream_json_list(
+        _keyset(
+            select(*Reminder.__table__.c).where(Reminder.user_id == user_id),
+            Reminder.scheduled_at, Reminder.id, page,
         )
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    )
+
+
+_REMINDER_DATETIME_FIELDS = ("scheduled_at", "done_at")
 
 
 @api_blueprint.route("/reminder/add", methods=["POST"])
@@ -3668,6 +4173,9 @@ def reminder_add():
     missing = [k for k in required if not data.get(k)]
     if missing:
         return jsonify({"error": f"Campi obbligatori: {', '.join(missing)}"}), 400
+    bad = _coerce_iso_fields(data, _REMINDER_DATETIME_FIELDS)
+    if bad:
+        return jsonify({"error": f"{bad} deve essere in formato ISO 8601"}), 400
 
     data["user_id"] = g.user_id
     with _session_ctx() as s:
@@ -3683,6 +4191,10 @@ def reminder_add():
 def reminder_update(rid: str):
     _ensure_uuid(rid, "reminder_id")
     payload = _parse_json_body()
+    data = _filter_fields_for_model(payload, Reminder)
+    bad = _coerce_iso_fields(data, _REMINDER_DATETIME_FIELDS)
+    if bad:
+        return jsonify({"error": f"{bad} deve essere in formato ISO 8601"}), 400
     with _session_ctx() as s:
         r = s.get(Reminder, rid)
         if not r:
@@ -3691,7 +4203,7 @@ def reminder_update(rid: str):
             return jsonify(
                 {"error": "Forbidden: non possiedi questo reminder"}
             ), 403
-        for k, v in _filter_fields_for_model(payload, Reminder).items():
+        for k, v in data.items():
             setattr(r, k, v)
         _commit_or_409(s)
         write_changes_upsert("reminder", [_serialize_instance(r)])
@@ -3703,54 +4215,242 @@ def reminder_update(rid: str):
 def reminder_delete(rid: str):
     _ensure_uuid(rid, "reminder_id")
     with _session_ctx() as s:
-        r = s.get(Reminder, rid)
-        if r:
-            if str(r.user_id) != str(g.user_id):
-                return jsonify(
-                    {"error": "Forbidden: non possiedi questo reminder"}
-                ), 403
-            s.delete(r)
+        # DELETE diretto filtrato anche sul proprietario: nel caso normale
+        # un solo statement; se non tocca righe si distingue 403 da assente
+        deleted = s.execute(
+            delete(Reminder).where(Reminder.id == rid, Reminder.user_id == g.user_id)
+        ).rowcount
+        if deleted:
             _commit_or_409(s)
+        elif s.scalar(select(Reminder.id).where(Reminder.id == rid)) is not None:
+            return jsonify(
+                {"error": "Forbidden: non possiedi questo reminder"}
+            ), 403
         write_changes_delete("reminder", rid)
         return ("", 204)
 
 
-@api_blueprint.route("/plant/<plant_id>/reminders", methods=["GET"])
+REMINDER_BULK_MAX = int(os.getenv("REMINDER_BULK_MAX", "500"))
+
+
+@api_blueprint.route("/reminder/bulk", methods=["POST"])
 @require_jwt
-def get_reminders_for_plant(plant_id: str):
-    _ensure_uuid(plant_id, "plant_id")
+def reminder_bulk():
+    """
+    Inserisce più reminder in una richiesta (sync dei reminder creati offline).
+    Body: {"reminders": [{title, scheduled_at, ...}, ...]}; "id" opzionale:
+    se il client lo manda, un reinvio dello stesso batch non crea duplicati.
+
+    Due statement qualunque sia N: SELECT degli id già presenti, poi un
+    INSERT multi-riga (executemany → INSERT ... VALUES (...), (...)).
+    Le righe già presenti dell'utente vengono saltate e non finiscono in
+    changes.json; id ripetuti nel batch → 400, id di un altro utente → 409.
+    """
+    payload = _parse_json_body()
+    items = payload.get("reminders")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "'reminders' must be a non-empty list"}), 400
+    if len(items) > REMINDER_BULK_MAX:
+        return jsonify({"error": f"At most {REMINDER_BULK_MAX} reminders per request"}), 400
+
+    base = dict.fromkeys(_model_columns(Reminder))
+    now = _now()
+    rows = []
+    seen: set[str] = set()
+    for idx, item in enumerate(items):
+        if not isinstance(item, dict):
+            return jsonify({"error": f"reminders[{idx}] must be an object"}), 400
+        data = _filter_fields_for_model(item, Reminder, exclude={"user_id", "created_at"})
+        missing = [k for k in ("title", "scheduled_at") if not data.get(k)]
+        if missing:
+            return jsonify({"error": f"reminders[{idx}]: campi obbligatori: {', '.join(missing)}"}), 400
+        bad = _coerce_iso_fields(data, _REMINDER_DATETIME_FIELDS)
+        if bad:
+            return jsonify({"error": f"reminders[{idx}]: {bad} deve essere in formato ISO 8601"}), 400
+        if data.get("id"):
+            _ensure_uuid(data["id"], f"reminders[{idx}].id")
+            if data["id"] in seen:
+                return jsonify({"error": f"reminders[{idx}].id duplicato nel batch"}), 400
+            seen.add(data["id"])
+        else:
+            data["id"] = gen_uuid7()
+        row = dict(base)
+        row.update(data, user_id=g.user_id, created_at=now)
+        rows.append(row)
+
     with _session_ctx() as s:
-        reminders = (
-            s.query(Reminder)
-            .filter(
-                Reminder.user_id == g.user_id,
-                Reminder.entity_type == "plant",
-                Reminder.entity_id == plant_id,
+        ids = [r["id"] for r in rows]
+        owners = dict(s.execute(
+            select(Reminder.id, Reminder.user_id).where(Reminder.id.in_(ids))
+        ).all())
+        if any(uid != g.user_id for uid in owners.values()):
+            # id già usato da un altro utente: non è "già salvato" per chi scrive
+            return jsonify({"error": "Conflict: reminder id already in use"}), 409
+        new_rows = [r for r in rows if r["id"] not in owners]
+        if new_rows:
+            # INSERT semplice: dati non validi → 400, un id inserito in
+            # parallelo da un'altra richiesta → 409 (il reinvio lo salterà)
+            try:
+                s.execute(insert(Reminder), new_rows)
+            except IntegrityError as e:
+                s.rollback()
+                abort(409, description=f"Conflict: {e.orig}")
+            except DataError as e:
+                s.rollback()
+                abort(400, description=f"Bad data: {e.orig}")
+            _commit_or_409(s)
+            serialize = _compiled_serializer(Reminder)
+            write_changes_upsert(
+                "reminder", [serialize(SimpleNamespace(**r)) for r in new_rows]
             )
-            .order_by(Reminder.scheduled_at.asc())
-            .all()
-        )
 
-        # anche se non ce ne sono, restituisci una lista vuota (200)
-        return jsonify([_serialize_instance(r) for r in reminders]), 200
+    return jsonify({
+        "ok": True,
+        "created": [r["id"] for r in new_rows],
+        "skipped": [i for i in ids if i in owners],
+    }), 201 if new_rows else 200
+
+
+# Select precostruite all'import per le liste più richieste: ogni richiesta
+# passa solo i parametri, niente ricostruzione dello statement (la forma
+# compilata resta nella compiled cache dell'engine)
+_STMT_REMINDERS_FOR_USER = (
+    select(*Reminder.__table__.c)
+    .where(Reminder.user_id == bindparam("uid"))
+    .order_by(Reminder.scheduled_at.asc())
+)
+_STMT_REMINDERS_FOR_PLANT = (
+    select(*Reminder.__table__.c)
+    .where(
+        Reminder.user_id == bindparam("uid"),
+        Reminder.entity_type == "plant",
+        Reminder.entity_id == bindparam("pid"),
+    )
+    .order_by(Reminder.scheduled_at.asc())
+)
+
+
+@api_blueprint.route("/plant/<plant_id>/reminders", methods=["GET"])
+@require_jwt
+def get_reminders_for_plant(plant_id: str):
+    _ensure_uuid(plant_id, "plant_id")
+    # anche se non ce ne sono, restituisci una lista vuota (200)
+    return _stream_json_list(
+        _STMT_REMINDERS_FOR_PLANT, {"uid": g.user_id, "pid": plant_id}
+    )
 
 
 @api_blueprint.route("/reminders", methods=["GET"])
 @require_jwt
 def get_all_reminders():
-    with _session_ctx() as s:
-        reminders = (
-            s.query(Reminder)
-            .filter(Reminder.user_id == g.user_id)
-            .order_by(Reminder.scheduled_at.asc())
-            .all()
-        )
-        return jsonify([_serialize_instance(r) for r in reminders]), 200
+    return _stream_json_list(_STMT_REMINDERS_FOR_USER, {"uid": g.user_id})
 
 
 # ========= Upload Plant Photo =========
 ALLOWED_EXT = {".jpg", ".jpeg", ".png", ".webp"}
 
+# Upload "raw" (body = bytes dell'immagine): Content-Type → estensione
+RAW_UPLOAD_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "application/octet-stream": None,  # estensione da ?filename=
+}
+PHOTO_UPLOAD_MAX_BYTES = int(os.getenv("PHOTO_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK = 1 << 20
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+# scrittura su disco degli upload, in parallelo all'INSERT su DB
+_UPLOAD_IO = ThreadPoolExecutor(
+    max_workers=int(os.getenv("UPLOAD_IO_WORKERS", "4")),
+    thread_name_prefix="upload-io",
+)
+
+
+def _random_filename(ext: str) -> str:
+    # 80 bit di entropia in base32 (16 caratteri [a-z2-7], sicuri su ogni filesystem).
+    # os.urandom a ogni chiamata, senza buffer di modulo: dopo un fork
+    # (preload_app, fork server) padre e figli non ripetono gli stessi nomi
+    return base64.b32encode(os.urandom(10)).decode("ascii").lower() + ext
+
+
+# cartelle di upload già create da questo processo: niente stat/mkdir a ogni upload
+_KNOWN_DIRS: set[str] = set()
+
+
+def _ensure_dir(path: str) -> None:
+    if path not in _KNOWN_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _KNOWN_DIRS.add(path)
+
+
+def _forget_dirs() -> None:
+    """Da chiamare dopo os.rmdir su una cartella di upload."""
+    _KNOWN_DIRS.clear()
+
+
+def _stream_request_to_file(dest_path: str, stream) -> tuple[int, str]:
+    """
+    Copia lo stream (body raw o parte multipart) su disco a blocchi da 1 MB,
+    calcolando lo SHA-256 durante la copia. Abort 413 oltre
+    PHOTO_UPLOAD_MAX_BYTES (il file parziale viene rimosso).
+    Ritorna (byte scritti, digest esadecimale).
+    """
+    written = 0
+    digest = hashlib.sha256()
+    try:
+        with open(dest_path, "wb", buffering=UPLOAD_CHUNK) as out:
+            while chunk := stream.read(UPLOAD_CHUNK):
+                written += len(chunk)
+                if written > PHOTO_UPLOAD_MAX_BYTES:
+                    raise OverflowError
+                digest.update(chunk)
+                out.write(chunk)
+    except OverflowError:
+        os.remove(dest_path)
+        abort(413, description=f"File too large (max {PHOTO_UPLOAD_MAX_BYTES} bytes)")
+    return written, digest.hexdigest()
+
+
+def _spilled_fd(stream) -> int | None:
+    """
+    fd del file temporaneo su disco in cui werkzeug ha parcheggiato la parte
+    multipart (SpooledTemporaryFile oltre i 500 KB), None se è in memoria.
+    Su uno spooled non ancora su disco fileno() forzerebbe il rollover: si
+    controlla prima _rolled.
+    """
+    if not hasattr(os, "sendfile"):
+        return None
+    if getattr(stream, "_rolled", True) is False:
+        return None
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _sendfile_to_file(dest_path: str, stream, src_fd: int) -> tuple[int, str]:
+    """
+    Copia un file temporaneo già su disco con sendfile(2): i dati restano nel
+    kernel (page cache → page cache) invece di passare da read/write Python.
+    Lo SHA-256 si calcola con hashlib.file_digest (lettura a blocchi in C).
+    Stesso contratto di _stream_request_to_file.
+    """
+    size = os.fstat(src_fd).st_size
+    if size > PHOTO_UPLOAD_MAX_BYTES:
+        abort(413, description=f"File too large (max {PHOTO_UPLOAD_MAX_BYTES} bytes)")
+    stream.seek(0)
+    digest = hashlib.file_digest(stream, "sha256").hexdigest()
+    offset = 0
+    with open(dest_path, "wb") as out:
+        while offset < size:
+            sent = os.sendfile(out.fileno(), src_fd, offset, size - offset)
+            if not sent:
+                break
+            offset += sent
+    return offset, digest
+
 
 @api_blueprint.route("/upload/plant-photo", methods=["POST"])
 @require_jwt
@@ -3760,42 +4460,177 @@ def upload_plant_photo():
       - file (required)
       - plant_id (required)
       - caption (optional)
-    Returns: { ok: true, photo_id, url }
+    oppure body raw (Content-Type image/jpeg|png|webp o application/octet-stream)
+    con ?plant_id=...&caption=...&filename=... in query string: il body viene
+    scritto direttamente su disco in streaming.
+    Returns: { ok: true, photo_id, url } (201), oppure la foto già esistente
+    con lo stesso contenuto (SHA-256) per la pianta: { ok, photo_id, url,
+    duplicate: true } (200)
     """
-    f = request.files.get("file")
-    plant_id = request.form.get("plant_id")
-    caption = request.form.get("caption")
+    raw = request.mimetype in RAW_UPLOAD_TYPES
+
+    # Rifiuto immediato in base al Content-Length, prima di parsing o scritture
+    # (per il multipart si tollera l'overhead di boundary e campi testo).
+    # Senza Content-Length (chunked) il limite lo applicano la copia in
+    # streaming e MAX_CONTENT_LENGTH dell'app.
+    limit = PHOTO_UPLOAD_MAX_BYTES if raw else PHOTO_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({"error": f"File too large (max {PHOTO_UPLOAD_MAX_BYTES} bytes)"}), 413
+
+    if raw:
+        f = None
+        plant_id = request.args.get("plant_id")
+        caption = request.args.get("caption")
+        filename = request.args.get("filename") or ""
+    else:
+        f = request.files.get("file")
+        plant_id = request.form.get("plant_id")
+        caption = request.form.get("caption")
+        if not f or not f.filename:
+            return jsonify({"error": "file missing"}), 400
+        filename = f.filename
 
-    if not f or not f.filename:
-        return jsonify({"error": "file missing"}), 400
     if not plant_id:
         return jsonify({"error": "plant_id missing"}), 400
+    # plant_id finisce nel path su disco: deve essere un UUID
+    _ensure_uuid(plant_id, "plant_id")
 
-    _, ext = os.path.splitext(secure_filename(f.filename))
-    ext = ext.lower()
+    _, ext = os.path.splitext(secure_filename(filename))
+    ext = ext.lower() or (raw and RAW_UPLOAD_TYPES[request.mimetype]) or ""
     if ext not in ALLOWED_EXT:
         return jsonify({"error": f"Extension not allowed: {ext}"}), 400
 
     # Save the file in /app/uploads/plant/<plant_id>/<uuid>.ext
     dest_dir = os.path.join(current_app.config["UPLOAD_DIR"], "plant", plant_id)
-    os.makedirs(dest_dir, exist_ok=True)
-    fname = f"{uuid.uuid4().hex}{ext}"
+    fname = _random_filename(ext)
     dest_path = os.path.join(dest_dir, fname)
-    f.save(dest_path)
+    stream = request.stream if raw else f.stream
+    src_fd = None if raw else _spilled_fd(stream)
+
+    def _save():
+        # gira su un thread di _UPLOAD_IO: niente accesso al proxy request
+        def _write():
+            if src_fd is not None:
+                return _sendfile_to_file(dest_path, stream, src_fd)
+            return _stream_request_to_file(dest_path, stream)
+
+        _ensure_dir(dest_dir)
+        try:
+            return _write()
+        except FileNotFoundError:
+            # cartella rimossa da un altro worker dopo l'ultima foto: ricreala
+            _KNOWN_DIRS.discard(dest_dir)
+            _ensure_dir(dest_dir)
+            return _write()
+
+    def _discard_file():
+        try:
+            os.remove(dest_path)
+        except FileNotFoundError:
+            pass
 
     url = f"/uploads/plant/{plant_id}/{fname}"
 
+    # Un solo INSERT: l'esistenza della pianta la verifica la FK su plant_id
+    # (unico vincolo della tabella), valori calcolati qui → niente refresh
+    photo = {
+        "id": gen_uuid7(),
+        "plant_id": plant_id,
+        "url": url,
+        "caption": caption,
+        "order_index": 0,
+        "created_at": _now(),
+    }
+
+    # Scrittura del file e INSERT in parallelo; il commit avviene solo
+    # quando entrambe sono andate a buon fine
+    saving = _UPLOAD_IO.submit(_save)
     with _session_ctx() as s:
-        plant = s.get(Plant, plant_id)
-        if not plant:
+        try:
+            s.execute(insert(PlantPhoto).values(photo))
+        except IntegrityError:
+            s.rollback()
+            wait([saving])
+            _discard_file()
             return jsonify({"error": "Plant not found"}), 404
 
-        photo = PlantPhoto(plant_id=plant_id, url=url, caption=caption, order_index=0)
-        s.add(photo)
-        _commit_or_409(s)
+        try:
+            written, photo["sha256"] = saving.result()
+        except BaseException:
+            s.rollback()
+            _discard_file()
+            raise
+        if raw and not written:
+            s.rollback()
+            _discard_file()
+            return jsonify({"error": "file missing"}), 400
+
+        # Dedup: lo stesso contenuto già caricato per questa pianta viola
+        # uq_plantphoto_plant_sha256 → si scarta il nuovo file e si ritorna
+        # la foto esistente
+        try:
+            s.execute(
+                update(PlantPhoto)
+                .where(PlantPhoto.id == photo["id"])
+                .values(sha256=photo["sha256"])
+            )
+        except IntegrityError:
+            s.rollback()
+            _discard_file()
+            existing = s.execute(
+                select(PlantPhoto.id, PlantPhoto.url).where(
+                    PlantPhoto.plant_id == plant_id,
+                    PlantPhoto.sha256 == photo["sha256"],
+                )
+            ).first()
+            if existing is None:
+                # la foto esistente è stata cancellata nel frattempo
+                return jsonify({"error": "Conflict, retry"}), 409
+            return jsonify({
+                "ok": True, "photo_id": existing.id, "url": existing.url, "duplicate": True,
+            }), 200
+
+        try:
+            s.commit()
+        except Exception:
+            s.rollback()
+            _discard_file()
+            raise
+
+    _invalidate_main_photo(plant_id)
+    write_changes_upsert("plant_photo", [{**photo, "created_at": photo["created_at"].isoformat()}])
+    return jsonify({"ok": True, "photo_id": photo["id"], "url": url}), 201
+
 
-        write_changes_upsert("plant_photo", [_serialize_instance(photo)])
-        return jsonify({"ok": True, "photo_id": photo.id, "url": url}), 201
+# Cache della "foto principale" per pianta (per processo, con TTL: le altre
+# istanze vedono le modifiche al più dopo MAIN_PHOTO_TTL secondi)
+MAIN_PHOTO_TTL = float(os.getenv("MAIN_PHOTO_TTL", "30"))
+MAIN_PHOTO_CACHE_SIZE = 2048
+_main_photo_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _invalidate_main_photo(plant_id: str | None = None, *, catalog: bool = True) -> None:
+    """
+    Da chiamare dopo ogni scrittura su plant_photo (None = svuota tutto).
+    catalog=False se il chiamante fa già _invalidate_catalog(..., "plant_photo").
+    """
+    if catalog:
+        _invalidate_catalog("plant_photo")
+    if plant_id is None:
+        _main_photo_cache.clear()
+    else:
+        _main_photo_cache.pop(str(plant_id), None)
+
+
+# foto di una pianta nell'ordine delle liste (vedi ix_plantphoto_plant_order_created)
+_STMT_PLANT_PHOTOS = (
+    select(*PlantPhoto.__table__.c)
+    .where(PlantPhoto.plant_id == bindparam("pid"))
+    .order_by(PlantPhoto.order_index.asc(), PlantPhoto.created_at.desc())
+)
+_STMT_PLANT_PHOTOS_LIMIT = _STMT_PLANT_PHOTOS.limit(bindparam("lim"))
+_STMT_MAIN_PHOTO = _STMT_PLANT_PHOTOS.limit(1)
+_STMT_PLANT_EXISTS = select(exists().where(Plant.id == bindparam("pid")))
 
 
 @api_blueprint.route("/plant/<pid>/photo", methods=["GET"])
@@ -3804,21 +4639,25 @@ def plant_main_photo(pid: str):
     Returns the 'main photo' of the plant (first by order_index, then the most recent).
     404 if plant or photo not present.
     """
-    with _session_ctx() as s:
-        p = s.get(Plant, pid)
-        if not p:
-            return jsonify({"error": "Plant not found"}), 404
+    now = time.monotonic()
+    hit = _main_photo_cache.get(pid)
+    if hit and hit[0] > now:
+        return _json(hit[1])
 
-        photo = (
-            s.query(PlantPhoto)
-            .filter(PlantPhoto.plant_id == pid)
-            .order_by(PlantPhoto.order_index.asc(), PlantPhoto.created_at.desc())
-            .first()
-        )
-        if not photo:
+    # una sola query (LIMIT 1 sull'indice plant_id, order_index, created_at);
+    # l'esistenza della pianta si controlla solo per distinguere i 404
+    with _session_ctx() as s:
+        photo = s.execute(_STMT_MAIN_PHOTO, {"pid": pid}).mappings().first()
+        if photo is None:
+            if not s.scalar(_STMT_PLANT_EXISTS, {"pid": pid}):
+                return jsonify({"error": "Plant not found"}), 404
             return jsonify({"error": "No photo for this plant"}), 404
 
-        return jsonify(_serialize_instance(photo)), 200
+    photo = dict(photo)
+    if len(_main_photo_cache) >= MAIN_PHOTO_CACHE_SIZE:
+        _main_photo_cache.pop(next(iter(_main_photo_cache)), None)
+    _main_photo_cache[pid] = (now + MAIN_PHOTO_TTL, photo)
+    return _json(photo)
 
 
 @api_blueprint.route("/plant/<pid>/photos", methods=["GET"])
@@ -3828,11 +4667,6 @@ def plant_photos(pid: str):
     Query param: ?limit=K to limit the number.
     """
     limit = request.args.get("limit", type=int)
-    with _session_ctx() as s:
-        q = (
-            s.query(PlantPhoto)
-            .filter(PlantPhoto.plant_id == pid)
-            .order_by(PlantPhoto.order_index.asc(), PlantPhoto.created_at.desc())
-        )
-        rows = q.limit(limit).all() if limit else q.all()
-        return jsonify([_serialize_instance(r) for r in rows]), 200
+    if limit:
+        return _stream_json_list(_STMT_PLANT_PHOTOS_LIMIT, {"pid": pid, "lim": limit})
+    return _stream_json_list(_STMT_PLANT_PHOTOS, {"pid": pid})
@@ -1,45 +1,53 @@
 from __future__ import annotations
-import os, time
+import mimetypes, os
+from functools import lru_cache
+
+import orjson
 from flask import Flask, jsonify, send_from_directory 
-from sqlalchemy.exc import OperationalError
-from werkzeug.exceptions import HTTPException, BadRequest
+from werkzeug.exceptions import HTTPException, BadRequest, NotFound
+from werkzeug.security import safe_join
 from flask import request
-from models.base import Base, engine
+from models.base import bootstrap_lock, ensure_schema, wait_for_db
 import models.entities  # noqa: F401
 from models.scripts.replay_changes import (
     seed_from_changes,
     seed_disease_definitions_from_file,  # NEW
+    start_changes_writer,
 )
 from api import api_blueprint
+from services.repository_service import RepositoryService
+from utils.config import settings
+from utils.json_provider import OrjsonProvider
+from utils.logging_setup import setup_logging
+from utils.probe_middleware import ProbeMiddleware
 
 
-def create_app() -> Flask:
-    app = Flask(__name__)
-    app.config.update(
-        DEBUG=False,  # niente Werkzeug debugger HTML
-        TESTING=False,
-        PROPAGATE_EXCEPTIONS=False,  # lascia gestire agli handler
-        JSON_SORT_KEYS=False,
-    )
+@lru_cache(maxsize=256)
+def _error_prefix(name: str, message: str, status: int) -> bytes:
+    """
+    '{"error":...,"message":...,"status":...,"path":' serializzato una volta
+    per combinazione: 400/401/404 con il messaggio di default si ripetono a
+    ogni client che sbaglia, e per rispondere basta accodare il path.
+    """
+    return orjson.dumps({"error": name, "message": message, "status": status})[:-1] + b',"path":'
 
-    UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/app/uploads")
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    app.config["UPLOAD_DIR"] = UPLOAD_DIR
 
-    # Aspetta il DB con retry esponenziale (max ~30s)
-    backoff = 0.5
-    for attempt in range(10):
-        try:
-            with engine.begin() as conn:
-                Base.metadata.create_all(bind=conn)
-            break
-        except OperationalError:
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 5.0)
-    else:
-        # ultimo tentativo fuori dal loop (fa raise se ancora giù)
-        with engine.begin() as conn:
-            Base.metadata.create_all(bind=conn)
+def _bootstrap_db(app: Flask) -> None:
+    """
+    Schema e seed all'avvio (DB_AUTO_MIGRATE=true, default): aspetta il DB,
+    crea le tabelle mancanti e riapplica changes.json e le definizioni
+    delle malattie. Con DB_AUTO_MIGRATE=false create_app resta solo wiring.
+    """
+    # Aspetta il DB con retry esponenziale (max DB_WAIT_TIMEOUT secondi)
+    wait_for_db()
+    with bootstrap_lock():
+        _bootstrap_locked(app)
+
+
+def _bootstrap_locked(app: Flask) -> None:
+    created = ensure_schema()
+    if created:
+        app.logger.info("Created %d missing table(s)", created)
 
     try:
         applied = seed_from_changes()
@@ -59,27 +67,68 @@ def create_app() -> Flask:
         )
     except Exception as e:
         app.logger.error("Disease seed from plant_disease file failed: %s", e)
-        
+
+
+def create_app() -> Flask:
+    # log in coda, scritti da un thread dedicato (LOG_LEVEL=DEBUG per i dettagli)
+    setup_logging(settings.LOG_LEVEL)
+    app = Flask(__name__)
+    # jsonify/get_json via orjson
+    app.json_provider_class = OrjsonProvider
+    app.json = OrjsonProvider(app)
+    app.config.update(
+        DEBUG=False,  # niente Werkzeug debugger HTML
+        TESTING=False,
+        PROPAGATE_EXCEPTIONS=False,  # lascia gestire agli handler
+        JSON_SORT_KEYS=False,
+    )
+
+    UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/app/uploads")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    app.config["UPLOAD_DIR"] = UPLOAD_DIR
+    # tetto globale al body: Werkzeug rifiuta con 413 prima di leggere/parsare
+    app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", str(32 * 1024 * 1024)))
+
+    # changes.json viene scritto in background, fuori dal percorso delle richieste
+    start_changes_writer()
+
+    # RepositoryService è stateless (solo la session factory): un'istanza per processo
+    app.extensions["repo"] = RepositoryService()
+
+    if settings.DB_AUTO_MIGRATE:
+        _bootstrap_db(app)
+
     @app.get("/health")
     def health():
         return jsonify(status="ok")
 
+    # Dietro un reverse proxy i file di /uploads li serve il proxy (sendfile):
+    # - UPLOADS_ACCEL_PREFIX=/internal_uploads/ → header X-Accel-Redirect (nginx)
+    # - USE_X_SENDFILE=1 → header X-Sendfile (Apache/lighttpd), gestito da Flask
+    accel_prefix = os.getenv("UPLOADS_ACCEL_PREFIX", "")
+    app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0").lower() in ("1", "true", "yes")
+
     @app.get("/uploads/<path:relpath>")
     def serve_upload(relpath: str):
+        if accel_prefix:
+            full = safe_join(app.config["UPLOAD_DIR"], relpath)
+            if full is None or not os.path.isfile(full):
+                raise NotFound()
+            resp = app.response_class(mimetype=mimetypes.guess_type(full)[0] or "application/octet-stream")
+            resp.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + relpath
+            return resp
         return send_from_directory(app.config["UPLOAD_DIR"], relpath)
 
     app.register_blueprint(api_blueprint, url_prefix="/api")
+    # /health e /api/ping (probe dei load balancer) senza passare da Flask
+    app.wsgi_app = ProbeMiddleware(app.wsgi_app)
 
     @app.errorhandler(HTTPException)
     def handle_http_exc(e: HTTPException):
-        # errori 4xx/5xx di Flask/Werkzeug -> JSON
-        payload = {
-            "error": e.name,
-            "message": e.description or e.name,
-            "status": e.code,
-            "path": request.path,
-        }
-        return jsonify(payload), e.code
+        # errori 4xx/5xx di Flask/Werkzeug -> JSON; stesso corpo di prima
+        # (error, message, status, path) ma con il prefisso già serializzato
+        body = _error_prefix(e.name, e.description or e.name, e.code) + orjson.dumps(request.path) + b"}"
+        return app.response_class(body, status=e.code, mimetype="application/json")
 
     @app.errorhandler(Exception)
     def handle_unexpected_exc(e: Exception):
@@ -98,4 +147,9 @@ def create_app() -> Flask:
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "8000")), debug=True)
+    # solo sviluppo locale: in container si parte con gunicorn (gunicorn_conf.py)
+    app.run(
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        debug=os.getenv("FLASK_DEBUG", "0").lower() in ("1", "true", "yes"),
+    )
@@ -6,7 +6,10 @@
 
 from __future__ import annotations
 
+import fcntl
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 import sys
 # Ensure project root is on sys.path when invoked as a script.
@@ -14,8 +17,55 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-import numpy as np
-from PIL import Image
-
 from disease_detection.models.checkpoint_cache import ensure_mobileclip_checkpoint
 
+
+@contextmanager
+def _cache_lock(cache_dir: Path):
+    """Exclusive flock on ``<cache_dir>/.lock`` so parallel boots don't download twice."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(cache_dir / ".lock", "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _u2net_home() -> Path:
+    xdg = os.environ.get("XDG_CACHE_HOME", str(Path.home() / ".cache"))
+    return Path(os.environ.get("U2NET_HOME", Path(xdg) / ".u2net")).expanduser()
+
+
+def _warm_mobileclip_cache() -> str:
+    cache_root = Path(
+        os.environ.get("ECOGROW_MODEL_CACHE", PROJECT_ROOT / "artifacts" / "pretrained")
+    ).expanduser()
+    with _cache_lock(cache_root):
+        return ensure_mobileclip_checkpoint()
+
+
+def _warm_rembg_cache() -> Path:
+    from rembg import new_session
+
+    u2net_home = _u2net_home()
+    with _cache_lock(u2net_home):
+        # Creating the session downloads the ONNX weights; no inference needed.
+        new_session(os.environ.get("REMBG_MODEL", "u2net"))
+    return u2net_home
+
+
+def main() -> None:
+    # Disjoint cache dirs and I/O-bound downloads: run both at once so cold
+    # start costs the slower download, not the sum of the two.
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        clip_future = ex.submit(_warm_mobileclip_cache)
+        rembg_future = ex.submit(_warm_rembg_cache)
+        clip_path = clip_future.result()
+        u2net_home = rembg_future.result()
+    print(f"MobileCLIP checkpoint ready: {clip_path}")
+    print(f"U2Net weights cached in: {u2net_home}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Configurazione gunicorn per l'API (Dockerfile e docker-compose).
+
+Worker gthread: le route passano quasi tutto il tempo ad aspettare MySQL o il
+servizio del modello, quindi i thread di ogni processo servono altre richieste
+nel frattempo. gevent non serve: PyMySQL è bloccante ma i thread bastano, senza
+monkeypatching.
+
+preload_app resta disattivato: create_app avvia thread (log, changes-writer)
+e apre connessioni del pool che non sopravvivono al fork; ogni worker crea
+la propria app, e schema/seed sono serializzati da bootstrap_lock.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() * 2 + 1, 4))))
+# workers * threads connessioni contemporanee al massimo: tenerlo entro
+# DB_POOL_SIZE + DB_MAX_OVERFLOW per worker e sotto max_connections di MySQL
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+preload_app = False
+accesslog = "-"
+errorlog = "-"
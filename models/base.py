@@ -1,6 +1,11 @@
+import random
+import time
+from contextlib import contextmanager
 from typing import Dict
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from sqlalchemy import MetaData, create_engine
+from sqlalchemy.orm import DeclarativeBase, scoped_session, sessionmaker
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn
 from utils.config import settings
 
 NAMING_CONVENTION: Dict[str, str] = {
@@ -14,5 +19,178 @@ NAMING_CONVENTION: Dict[str, str] = {
 class Base(DeclarativeBase):
     metadata = MetaData(naming_convention=NAMING_CONVENTION)
 
-engine = create_engine(settings.DB_URI, echo=settings.DB_ECHO, future=True, pool_pre_ping=True)
+engine = create_engine(
+    settings.DB_URI,
+    echo=settings.DB_ECHO,
+    future=True,
+    # niente SELECT 1 a ogni checkout: le connessioni vengono riciclate prima
+    # del wait_timeout di MySQL (DB_POOL_PRE_PING=true per riattivarlo)
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    # cache degli statement compilati (SQL + mappa dei parametri): PyMySQL
+    # non ha prepared statement lato server, quindi il risparmio possibile è
+    # lato Python. Con le select precostruite, le query delle route e i
+    # caricamenti selectin delle relazioni si possono superare i 500 slot di
+    # default, e a quel punto le voci più vecchie vengono ricompilate a rotazione
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+)
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_conn, connection_record):
+    """
+    Impostazioni di sessione MySQL, una volta per ogni nuova connessione del pool:
+    - READ COMMITTED: letture sempre sullo snapshot più recente e meno gap
+      lock tra le GET e le scritture concorrenti (upload, watering)
+    - lock wait breve: una scrittura bloccata fallisce in fretta invece di
+      tenere occupato un worker per 50s (default InnoDB)
+    - max_execution_time: un SELECT fuori controllo viene interrotto dal
+      server invece di occupare worker e connessione a tempo indefinito
+    """
+    # un solo SET per tutte le variabili: un round trip per connessione
+    with dbapi_conn.cursor() as cur:
+        cur.execute(
+            "SET SESSION transaction_isolation = %s,"
+            " SESSION innodb_lock_wait_timeout = %s,"
+            " SESSION max_execution_time = %s",
+            (
+                settings.DB_ISOLATION_LEVEL,
+                settings.DB_LOCK_WAIT_TIMEOUT,
+                settings.DB_MAX_EXECUTION_MS,
+            ),
+        )
+
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+# Sessione per richiesta usata dalle route (_session_ctx), rimossa a fine
+# richiesta. expire_on_commit=False: dopo il commit gli oggetti restano
+# leggibili senza un SELECT di refresh.
+ScopedSession = scoped_session(
+    sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+)
+
+
+def wait_for_db(
+    timeout: float = settings.DB_WAIT_TIMEOUT, base: float = 0.25, cap: float = 3.0
+) -> None:
+    """
+    Aspetta che MySQL accetti connessioni: SELECT 1 subito, poi backoff
+    esponenziale (base, 2*base, ... fino a cap) con un po' di jitter, così i
+    worker/container che partono insieme non riprovano tutti nello stesso
+    istante. Ritorna al primo SELECT riuscito; allo scadere di timeout
+    rilancia l'ultimo errore.
+    """
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+            return
+        except OperationalError:
+            delay = min(cap, base * 2 ** attempt) + random.uniform(0, 0.1)
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            attempt += 1
+
+
+# Colonne e indici aggiunti a tabelle già esistenti: create_all non tocca le
+# tabelle presenti e il DB vive su un volume persistente, quindi senza questo
+# passo ogni SELECT che elenca le colonne fallirebbe ("Unknown column") finché
+# qualcuno non lancia l'ALTER a mano. Ogni nuova colonna/indice su una
+# tabella esistente va aggiunto qui: (tabella, nome) come nei modelli.
+LATE_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("user", "short_id"),
+    ("plant_photo", "sha256"),
+)
+LATE_INDEXES: tuple[tuple[str, str], ...] = (
+    ("user", "ix_user_short_id"),
+    # le righe esistenti hanno sha256 NULL: nessun conflitto sull'UNIQUE
+    ("plant_photo", "uq_plantphoto_plant_sha256"),
+)
+
+
+def ensure_schema() -> int:
+    """
+    Crea le tabelle mancanti. I nomi esistenti arrivano con una sola query
+    su information_schema: se ci sono già tutte (il caso normale a ogni
+    avvio) non parte nessun DDL né un controllo per tabella. Poi aggiunge
+    alle tabelle esistenti le LATE_COLUMNS/LATE_INDEXES che mancano.
+    Ritorna il numero di tabelle create.
+    """
+    with engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        missing = [t for t in Base.metadata.sorted_tables if t.name not in existing]
+        if missing:
+            Base.metadata.create_all(bind=conn, tables=missing)
+        _add_late_columns_and_indexes(conn, existing)
+    return len(missing)
+
+
+def _add_late_columns_and_indexes(conn, existing_tables: set) -> None:
+    """
+    Idempotente: una query su information_schema per le colonne e una per
+    gli indici, ALTER/CREATE INDEX solo per ciò che manca. Le tabelle appena
+    create da create_all hanno già tutto e vengono saltate.
+    """
+    tables = Base.metadata.tables
+    columns = [(t, c) for t, c in LATE_COLUMNS if t in existing_tables]
+    indexes = [(t, i) for t, i in LATE_INDEXES if t in existing_tables]
+    if not columns and not indexes:
+        return
+
+    have_cols = set(conn.execute(text(
+        "SELECT table_name, column_name FROM information_schema.columns"
+        " WHERE table_schema = DATABASE()"
+    )).tuples())
+    have_idx = set(conn.execute(text(
+        "SELECT DISTINCT table_name, index_name FROM information_schema.statistics"
+        " WHERE table_schema = DATABASE()"
+    )).tuples())
+
+    preparer = conn.dialect.identifier_preparer
+    for table_name, column_name in columns:
+        if (table_name, column_name) in have_cols:
+            continue
+        table = tables[table_name]
+        ddl = CreateColumn(table.c[column_name]).compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}")
+
+    for table_name, index_name in indexes:
+        if (table_name, index_name) in have_idx:
+            continue
+        index = next(i for i in tables[table_name].indexes if i.name == index_name)
+        index.create(bind=conn)
+
+
+@contextmanager
+def bootstrap_lock(timeout: float = settings.DB_WAIT_TIMEOUT):
+    """
+    Lock applicativo MySQL (GET_LOCK) attorno a schema + seed: con più worker
+    gunicorn che partono insieme uno solo crea le tabelle e riapplica i seed,
+    gli altri aspettano e poi trovano lo schema già pronto (niente CREATE
+    TABLE concorrenti).
+    """
+    with engine.connect() as conn:
+        # GET_LOCK è un SELECT: senza questo il limite di sessione
+        # (DB_MAX_EXECUTION_MS) interromperebbe l'attesa mentre un altro
+        # worker fa un replay lungo di changes.json
+        conn.exec_driver_sql("SET SESSION max_execution_time = 0")
+        try:
+            got = conn.execute(
+                text("SELECT GET_LOCK('ecogrow_bootstrap', :t)"), {"t": int(timeout)}
+            ).scalar()
+            try:
+                yield bool(got)
+            finally:
+                if got:
+                    conn.execute(text("SELECT RELEASE_LOCK('ecogrow_bootstrap')"))
+        finally:
+            # la connessione torna nel pool: ripristina il limite normale
+            conn.exec_driver_sql(
+                "SET SESSION max_execution_time = %s", (settings.DB_MAX_EXECUTION_MS,)
+            )
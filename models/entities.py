@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+import time
 import uuid
 from datetime import datetime, date
 from enum import Enum
@@ -19,6 +21,7 @@ from sqlalchemy import (
     String,
     Text,
     UniqueConstraint,
+    func,
 )
 from sqlalchemy.dialects.mysql import JSON as MySQLJSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -35,6 +38,21 @@ def gen_uuid() -> str:
     return str(uuid.uuid4())
 
 
+def gen_uuid7() -> str:
+    """
+    UUIDv7 (RFC 9562): 48 bit di timestamp in ms + 74 bit casuali.
+    Gli id crescono nel tempo, quindi gli INSERT finiscono in coda al
+    B-tree della PK invece che in pagine sparse.
+    """
+    ms = time.time_ns() // 1_000_000
+    rnd = int.from_bytes(os.urandom(10), "big")
+    value = (ms & 0xFFFF_FFFF_FFFF) << 80 | rnd
+    # version 7 nei bit 48-51, variant RFC 4122 nei bit 64-65
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return str(uuid.UUID(int=value))
+
+
 # ======================================================================
 # CORE
 # ======================================================================
@@ -185,24 +203,42 @@ class Plant(Base):
     )
 
 
+# /plants/by_use filtra su lower(use) e ordina per scientific_name: indice
+# funzionale (MySQL >= 8.0.13) sulla stessa espressione, così niente full scan
+Index("ix_plant_use_lower_name", func.lower(Plant.use), Plant.scientific_name)
+
+
 class PlantPhoto(Base):
     __tablename__ = "plant_photo"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_uuid)
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_uuid7)
     plant_id: Mapped[str] = mapped_column(
         String(36),
         ForeignKey("plant.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
-        index=True,
     )
     url: Mapped[str] = mapped_column(Text, nullable=False)
     caption: Mapped[Optional[str]] = mapped_column(String(255))
     order_index: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=True, default=datetime.utcnow)
+    # SHA-256 (hex) del file caricato; NULL per le foto aggiunte via URL
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     plant: Mapped["Plant"] = relationship(back_populates="photos")
 
 
+# foto di una pianta nell'ordine delle liste (order_index ASC, created_at DESC);
+# copre anche la FK su plant_id
+Index(
+    "ix_plantphoto_plant_order_created",
+    PlantPhoto.plant_id,
+    PlantPhoto.order_index,
+    PlantPhoto.created_at.desc(),
+)
+# lo stesso file caricato due volte sulla stessa pianta è un duplicato
+Index("uq_plantphoto_plant_sha256", PlantPhoto.plant_id, PlantPhoto.sha256, unique=True)
+
+
 # ======================================================================
 # DISEASES
 # ======================================================================
@@ -278,6 +314,12 @@ class User(Base):
     __tablename__ = "user"
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_uuid)
+    # Colonna generata (prime 8 cifre dell'UUID) indicizzata per la ricerca amici
+    short_id: Mapped[Optional[str]] = mapped_column(
+        String(8),
+        Computed("LEFT(id, 8)", persisted=False),
+        index=True,
+    )
     email: Mapped[str] = mapped_column(String(255), unique=True, nullable=False, index=True)
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     first_name: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -467,7 +509,11 @@ class SharedPlant(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
     ended_sharing_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
 
-
+    __table_args__ = (
+        # lookup "condivisione attiva" (MySQL non ha indici parziali:
+        # ended_sharing_at in coda copre il filtro IS NULL)
+        Index("ix_sp_active", "owner_user_id", "recipient_user_id", "plant_id", "ended_sharing_at"),
+    )
 
     owner_user: Mapped["User"] = relationship(
         foreign_keys=[owner_user_id],
@@ -508,6 +554,8 @@ class WateringPlan(Base):
     __table_args__ = (
         UniqueConstraint("user_id", "plant_id", name="uq_wp_user_plant"),
         Index("idx_wp_due", "next_due_at"),
+        # lista per utente ordinata per scadenza (+ keyset su next_due_at)
+        Index("idx_wp_user_due", "user_id", "next_due_at"),
     )
 
     user: Mapped["User"] = relationship(back_populates="watering_plans")
@@ -516,13 +564,19 @@ class WateringPlan(Base):
 
 class WateringLog(Base):
     __tablename__ = "watering_log"
+    __table_args__ = (
+        # undo/annaffiatura: (utente, pianta, intervallo su done_at)
+        Index("ix_wl_user_plant_done", "user_id", "plant_id", "done_at"),
+        # overview settimanale e lista log per utente ordinata per done_at;
+        # copre anche la FK su user_id (niente più indice singolo)
+        Index("ix_wl_user_done", "user_id", "done_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_uuid)
     user_id: Mapped[str] = mapped_column(
         String(36),
         ForeignKey("user.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
-        index=True,
     )
     plant_id: Mapped[str] = mapped_column(
         String(36),
@@ -637,13 +691,18 @@ class UserQuestionAnswer(Base):
 
 class Reminder(Base):
     __tablename__ = "reminder"
+    __table_args__ = (
+        # promemoria di una pianta, già nell'ordine di scheduled_at (no filesort)
+        Index("ix_reminder_user_plant_time", "user_id", "entity_type", "entity_id", "scheduled_at"),
+        # tutti i promemoria dell'utente per scheduled_at; copre anche la FK
+        Index("ix_reminder_user_time", "user_id", "scheduled_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=gen_uuid)
     user_id: Mapped[str] = mapped_column(
         String(36),
         ForeignKey("user.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
-        index=True,
     )
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     note: Mapped[Optional[str]] = mapped_column(Text)
@@ -679,3 +738,18 @@ class RefreshToken(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
     last_used_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
     expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+# ==============================
+# Metadati applicativi (chiave/valore)
+# ==============================
+
+class AppMeta(Base):
+    """Stato interno dell'app, es. il checkpoint del replay di changes.json."""
+    __tablename__ = "app_meta"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(String(255), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
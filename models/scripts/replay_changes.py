@@ -1,20 +1,35 @@
 # models/scripts/replay_changes.py
 from __future__ import annotations
 
+import atexit
+import hashlib
 import json
 import logging
 import os
+import queue
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, date
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
+import orjson
 from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+try:
+    import fcntl  # Linux only, ok in Docker
+except ImportError:  # pragma: no cover - Windows dev box
+    fcntl = None
+
 from models.base import SessionLocal
+from utils.config import _float_env
 from models.entities import (
+    AppMeta,
     Family,
     Plant,
     PlantPhoto,
@@ -134,7 +149,7 @@ def load_changes(path: str | Path) -> Dict[str, List[Dict[str, Any]]]:
     if raw.startswith(b"\xef\xbb\xbf"):
         raw = raw[3:]
 
-    data = json.loads(raw)
+    data = orjson.loads(raw)
     if not isinstance(data, dict):
         raise ValueError(f"[seed] invalid changes format (want object): {p}")
 
@@ -146,26 +161,28 @@ def load_changes(path: str | Path) -> Dict[str, List[Dict[str, Any]]]:
     return data
 
 
-def save_changes(path: str | Path, data: Dict[str, List[Dict[str, Any]]]) -> None:
+def save_changes(path: str | Path, data: Dict[str, List[Dict[str, Any]]]) -> bytes:
     """
-    Salva JSON su 'path'.
+    Salva JSON su 'path' e ritorna i byte scritti.
     - Prova atomico: write su .tmp + replace.
     - Fallback robusto (bind-mount): lock + truncate+write+fsync sul file target.
     """
-    import json, os, errno
+    import os, errno
     from pathlib import Path
 
     p = Path(path)
     _ensure_parent(p)
 
-    payload = json.dumps(data, ensure_ascii=False, indent=2, default=_json_default)
+    # orjson (C) con indentazione 2 come prima: il file resta leggibile nei diff,
+    # ma la serializzazione non è più il costo dominante di ogni save
+    payload = orjson.dumps(data, default=_json_default, option=orjson.OPT_INDENT_2)
 
     # 1) Tentativo atomico classico
     tmp = p.with_suffix(p.suffix + ".tmp")
     try:
-        tmp.write_text(payload, encoding="utf-8")
+        tmp.write_bytes(payload)
         os.replace(tmp, p)  # atomic move
-        return
+        return payload
     except OSError as e:
         # Tipico su bind-mount di singolo file: [Errno 16] Device or resource busy
         try:
@@ -187,7 +204,7 @@ def save_changes(path: str | Path, data: Dict[str, List[Dict[str, Any]]]) -> Non
 
         fd = os.open(p, os.O_RDWR | os.O_CREAT, 0o666)
         try:
-            with os.fdopen(fd, "r+", encoding="utf-8") as f:
+            with os.fdopen(fd, "r+b") as f:
                 if fcntl is not None:
                     try:
                         fcntl.flock(f.fileno(), fcntl.LOCK_EX)
@@ -208,7 +225,7 @@ def save_changes(path: str | Path, data: Dict[str, List[Dict[str, Any]]]) -> Non
         except Exception:
             # 3) Ultimo fallback: scrivo su /tmp e poi copio i bytes
             import shutil, tempfile
-            with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8") as tf:
+            with tempfile.NamedTemporaryFile("wb", delete=False) as tf:
                 tf.write(payload)
                 tmp_path = tf.name
             try:
@@ -224,6 +241,7 @@ def save_changes(path: str | Path, data: Dict[str, List[Dict[str, Any]]]) -> Non
     except Exception:
         # Se proprio qui va tutto male, allora sì: facciamo emergere l'errore
         raise
+    return payload
 
 
 # ---------------------------------------------------------------------------
@@ -258,14 +276,18 @@ def _coerce_datetimes_for_db(row: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
-def _normalize_for_file(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+def _normalize_for_file(
+    table: str, row: Dict[str, Any], now_iso: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Normalizza una riga PRIMA di scriverla su changes.json.
-    In particolare aggiunge created_at/updated_at per alcune tabelle se mancanti.
+    In particolare aggiunge created_at/updated_at per alcune tabelle se mancanti
+    (now_iso: istante dell'evento, di default adesso).
     """
     needs_created = table in {"plant", "user", "reminder", "plant_photo"}
     needs_updated = table in {"plant", "user"}
-    now_iso = datetime.utcnow().isoformat(timespec="seconds")
+    if now_iso is None:
+        now_iso = datetime.utcnow().isoformat(timespec="seconds")
 
     out = dict(row)
     if needs_created and "created_at" not in out:
@@ -286,6 +308,10 @@ def _upsert_db(session: Session, model: Any, row: Dict[str, Any]) -> None:
     - Salta le colonne generated/computed (es. user_min/user_max in Friendship)
     """
     table = model.__table__
+    # le colonne generate non accettano valori espliciti in INSERT
+    computed = {c.name for c in table.columns if getattr(c, "computed", None) is not None}
+    if computed:
+        row = {k: v for k, v in row.items() if k not in computed}
     stmt = mysql_insert(table).values(**row)
 
     update_cols: Dict[str, Any] = {}
@@ -337,19 +363,11 @@ def _delete_db(session: Session, model: Any, row: Dict[str, Any]) -> int:
 # API per le route / aggiornamento changes.json
 # ---------------------------------------------------------------------------
 
-def write_changes_upsert(
-    table: str,
-    rows: List[Dict[str, Any]],
-    path: str | Path | None = None,
-) -> int:
+def _upsert_into(data: Dict[str, List[Dict[str, Any]]], table: str, rows: List[Dict[str, Any]]) -> int:
     """
-    Aggiorna il file changes.json facendo upsert per chiave 'id' nella tabella indicata.
-    Se una row non ha 'id', viene aggiunta così com'è (non deduplicabile).
-    Ritorna quante righe sono state scritte/aggiornate.
+    Upsert per chiave 'id' delle righe (già normalizzate) dentro il dict caricato
+    da changes.json. Se una row non ha 'id', viene aggiunta così com'è.
     """
-    p = Path(path) if path is not None else CHANGES_PATH
-    data = load_changes(p)
-
     existing: List[Dict[str, Any]] = data.get(table, [])
     if not isinstance(existing, list):
         existing = []
@@ -361,11 +379,7 @@ def write_changes_upsert(
     }
 
     applied = 0
-    for r in rows:
-        if not isinstance(r, dict):
-            continue
-
-        r_norm = _normalize_for_file(table, r)
+    for r_norm in rows:
         rid = r_norm.get("id")
 
         if rid and rid in index_by_id:
@@ -378,11 +392,195 @@ def write_changes_upsert(
         applied += 1
 
     data[table] = existing
-    save_changes(p, data)
-    logger.info(f"[changes] upsert file {p} table={table} applied={applied}")
     return applied
 
 
+# ---------------------------------------------------------------------------
+# Writer in background: le route accodano, un solo thread scrive su disco
+# ---------------------------------------------------------------------------
+
+CHANGES_QUEUE_MAXSIZE = int(os.getenv("CHANGES_QUEUE_MAXSIZE", "10000"))
+CHANGES_BATCH_MAX = int(os.getenv("CHANGES_BATCH_MAX", "256"))
+# finestra di raccolta dopo il primo evento: più eventi -> un solo save
+CHANGES_FLUSH_WINDOW_S = _float_env("CHANGES_FLUSH_MS", 50.0) / 1000.0
+
+# elementi: (path, table, [righe grezze], istante ISO dell'evento)
+_changes_q: "queue.Queue[tuple[Path, str, List[Dict[str, Any]], str]]" = queue.Queue(
+    maxsize=CHANGES_QUEUE_MAXSIZE
+)
+_writer_lock = threading.Lock()
+# load+save di changes.json: writer thread, flush all'uscita e scritture
+# sincrone a coda piena non devono sovrapporsi
+_file_lock = threading.Lock()
+_writer_thread: Optional[threading.Thread] = None
+# ultimo contenuto scritto per file, con (mtime_ns, size) dopo il save: se il
+# file non è stato toccato da altri (altro worker, modifica a mano) il batch
+# successivo riparte da qui invece di rileggere e riparsare tutto il file
+_data_cache: Dict[Path, tuple[tuple[int, int], Dict[str, List[Dict[str, Any]]]]] = {}
+
+
+@contextmanager
+def _changes_file_lock(p: Path):
+    """
+    flock esclusivo su ``<file>.lock`` accanto a changes.json. Con più worker
+    gunicorn ogni processo ha il suo writer: _file_lock serializza solo i
+    thread del processo, questo serializza load+save fra processi (altrimenti
+    due flush contemporanei si perdono a vicenda le righe).
+    """
+    if fcntl is None:
+        yield
+        return
+    _ensure_parent(p)
+    with open(p.with_name(p.name + ".lock"), "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _stat_key(p: Path) -> Optional[tuple[int, int]]:
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_changes_cached(p: Path) -> Dict[str, List[Dict[str, Any]]]:
+    hit = _data_cache.pop(p, None)
+    if hit is not None and hit[0] == _stat_key(p):
+        return hit[1]
+    return load_changes(p)
+
+
+def _flush_batch(batch: List[tuple]) -> None:
+    """
+    Applica un batch di eventi: un solo load + un solo save per file,
+    qualunque sia il numero di eventi accodati. La normalizzazione delle
+    righe avviene qui, fuori dal thread della richiesta.
+    """
+    by_path: Dict[Path, List[tuple]] = {}
+    for p, table, rows, now_iso in batch:
+        norm = [_normalize_for_file(table, r, now_iso) for r in rows]
+        by_path.setdefault(p, []).append((table, norm))
+
+    for p, items in by_path.items():
+        with _file_lock, _changes_file_lock(p):
+            # sotto flock il confronto (mtime_ns, size) non è più un
+            # check-then-write: nessun altro processo può salvare nel mezzo
+            data = _load_changes_cached(p)
+            applied = 0
+            for table, rows in items:
+                applied += _upsert_into(data, table, rows)
+            payload = save_changes(p, data)
+            key = _stat_key(p)
+            if key is not None:
+                _data_cache[p] = (key, data)
+            if p == CHANGES_PATH:
+                # hash e scrittura su DB rimandati a _store_checkpoint
+                _pending_checkpoint[p] = payload
+        logger.info(f"[changes] flushed {len(items)} event(s), {applied} row(s) to {p}")
+
+
+def _drain(block: bool = True) -> int:
+    """
+    Preleva fino a CHANGES_BATCH_MAX eventi dalla coda e li scrive.
+    In modalità bloccante, dopo il primo evento attende al massimo
+    CHANGES_FLUSH_WINDOW_S per raccoglierne altri nello stesso batch.
+    """
+    try:
+        first = _changes_q.get(block=block)
+    except queue.Empty:
+        return 0
+
+    batch = [first]
+    deadline = time.monotonic() + CHANGES_FLUSH_WINDOW_S if block else 0.0
+    while len(batch) < CHANGES_BATCH_MAX:
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining > 0:
+                batch.append(_changes_q.get(timeout=remaining))
+            else:
+                batch.append(_changes_q.get_nowait())
+        except queue.Empty:
+            break
+
+    try:
+        _flush_batch(batch)
+    except Exception:
+        logger.exception("[changes] failed to write batch of %d event(s)", len(batch))
+    finally:
+        for _ in batch:
+            _changes_q.task_done()
+    return len(batch)
+
+
+def _writer_loop() -> None:
+    while True:
+        _drain(block=True)
+        _store_checkpoint()
+
+
+def start_changes_writer() -> None:
+    """Avvia il thread "changes-writer" (idempotente). Chiamata dall'app factory."""
+    _ensure_writer()
+
+
+def _ensure_writer() -> None:
+    global _writer_thread
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(
+                target=_writer_loop, name="changes-writer", daemon=True
+            )
+            _writer_thread.start()
+
+
+def flush_changes() -> None:
+    """
+    Scrive subito tutto quello che è ancora in coda (nel thread chiamante).
+    Usata all'uscita del processo; utile anche negli script.
+    """
+    while _drain(block=False):
+        pass
+    _store_checkpoint(force=True)
+
+
+atexit.register(flush_changes)
+
+
+def write_changes_upsert(
+    table: str,
+    rows: List[Dict[str, Any]],
+    path: str | Path | None = None,
+) -> int:
+    """
+    Accoda un upsert (per chiave 'id') sulla tabella indicata di changes.json.
+    Nel thread chiamante si fa solo una copia superficiale delle righe;
+    normalizzazione e scrittura su disco avvengono nel thread
+    "changes-writer", a batch. Con la coda piena l'evento viene scritto
+    subito nel thread chiamante (niente perdite, niente attese indefinite).
+    Ritorna quante righe sono state accodate o scritte.
+    """
+    p = Path(path) if path is not None else CHANGES_PATH
+
+    snapshot = [dict(r) for r in rows if isinstance(r, dict)]
+    if not snapshot:
+        return 0
+
+    _ensure_writer()
+    event = (p, table, snapshot, datetime.utcnow().isoformat(timespec="seconds"))
+    try:
+        _changes_q.put_nowait(event)
+    except queue.Full:
+        logger.warning("[changes] queue full, writing %s synchronously", table)
+        _flush_batch([event])
+    return len(snapshot)
+
+
 def write_changes_delete(
     table: str,
     id_value: str,
@@ -396,6 +594,79 @@ def write_changes_delete(
     return write_changes_upsert(table, [{"id": id_value, "_delete": True}], path=path)
 
 
+def write_changes_delete_many(
+    table: str,
+    ids: Iterable[str],
+    path: str | Path | None = None,
+) -> int:
+    """
+    Come write_changes_delete per più id della stessa tabella, con un solo
+    evento in coda (es. le righe figlie nella cancellazione a cascata di una plant).
+    """
+    rows = [{"id": i, "_delete": True} for i in ids if i]
+    if not rows:
+        return 0
+    return write_changes_upsert(table, rows, path=path)
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint del replay
+# ---------------------------------------------------------------------------
+# Hash del changes.json già riflesso nel DB, salvato in app_meta. Lo scrivono
+# il seed dopo un replay completo e il writer dopo i save (le righe che
+# accoda sono già committate). All'avvio, se l'hash del file coincide, il
+# replay si salta: il costo resta O(dimensione file) per l'hash invece di
+# un upsert per riga. DB nuovo o ricreato → nessun checkpoint → replay completo.
+#
+# Il writer non aggiorna il checkpoint a ogni batch: tiene da parte i byte
+# dell'ultimo save e li hasha/scrive al più ogni CHANGES_CHECKPOINT_S secondi
+# (e all'uscita), dal suo thread. Un checkpoint in ritardo costa solo un
+# replay completo in più al prossimo avvio.
+
+_CHECKPOINT_KEY = "changes_sha256"
+CHANGES_CHECKPOINT_S = _float_env("CHANGES_CHECKPOINT_S", 30.0)
+_pending_checkpoint: Dict[Path, bytes] = {}
+_last_checkpoint = 0.0
+
+
+def _file_digest(p: Path) -> Optional[str]:
+    try:
+        with open(p, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _get_checkpoint(session: Session) -> Optional[str]:
+    return session.scalar(select(AppMeta.value).where(AppMeta.key == _CHECKPOINT_KEY))
+
+
+def _set_checkpoint(session: Session, digest: str) -> None:
+    stmt = mysql_insert(AppMeta).values(key=_CHECKPOINT_KEY, value=digest)
+    session.execute(
+        stmt.on_duplicate_key_update(value=stmt.inserted.value, updated_at=datetime.utcnow())
+    )
+    session.commit()
+
+
+def _store_checkpoint(force: bool = False) -> None:
+    """Dal writer: registra che l'ultimo contenuto salvato è già nel DB (best effort)."""
+    global _last_checkpoint
+    if not force and time.monotonic() - _last_checkpoint < CHANGES_CHECKPOINT_S:
+        return
+    with _file_lock:
+        payload = _pending_checkpoint.pop(CHANGES_PATH, None)
+    if payload is None:
+        return
+    _last_checkpoint = time.monotonic()
+    try:
+        with SessionLocal() as session:
+            _set_checkpoint(session, hashlib.sha256(payload).hexdigest())
+    except Exception as e:
+        # al peggio il prossimo avvio rifà il replay completo
+        logger.warning("[changes] checkpoint update failed: %s", e)
+
+
 # ---------------------------------------------------------------------------
 # Seed generale da changes.json
 # ---------------------------------------------------------------------------
@@ -411,13 +682,25 @@ def seed_from_changes(path: str | Path | None = None) -> int:
     saltata e si prosegue con le successive.
     """
     p = Path(path) if path is not None else CHANGES_PATH
-    changes = load_changes(p)
+    # hash e contenuto letti sotto lo stesso flock dei writer: il checkpoint
+    # corrisponde esattamente alle righe riapplicate
+    with _changes_file_lock(p):
+        digest = _file_digest(p)
+        if digest is not None:
+            with SessionLocal() as session:
+                if _get_checkpoint(session) == digest:
+                    logger.info(f"[seed] {p} unchanged since last replay – skipped")
+                    return 0
+
+        changes = load_changes(p)
     if not changes:
         return 0
 
     total = 0
+    skipped = 0
 
     def _apply_table(session: Session, table_name: str, entries: List[Any]) -> int:
+        nonlocal skipped
         model = TABLES.get(table_name)
         if model is None or not isinstance(entries, list):
             return 0
@@ -436,6 +719,7 @@ def seed_from_changes(path: str | Path | None = None) -> int:
                     applied_here += deleted
                 except IntegrityError as e:
                     session.rollback()
+                    skipped += 1
                     logger.warning(
                         "[seed] IntegrityError on DELETE table=%s row=%s: %s – skipped",
                         table_name,
@@ -455,6 +739,7 @@ def seed_from_changes(path: str | Path | None = None) -> int:
                 applied_here += 1
             except IntegrityError as e:
                 session.rollback()
+                skipped += 1
                 logger.warning(
                     "[seed] IntegrityError on UPSERT table=%s row=%s: %s – skipped",
                     table_name,
@@ -482,6 +767,12 @@ def seed_from_changes(path: str | Path | None = None) -> int:
             if entries:
                 total += _apply_table(session, table_name, entries)
 
+        # righe saltate: niente checkpoint, il prossimo avvio le ritenta
+        if digest is not None and not skipped:
+            _set_checkpoint(session, digest)
+        elif skipped:
+            logger.info(f"[seed] {skipped} row(s) skipped – checkpoint not updated")
+
     logger.info(f"[seed] total applied: {total} from {p}")
     return total
 def seed_disease_definitions_from_file(path: str | Path | None = None) -> int:
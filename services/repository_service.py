@@ -3,8 +3,10 @@ from __future__ import annotations
 import uuid
 import base64
 import json
+import logging
 import os
 import re
+import time
 import unicodedata
 from functools import lru_cache
 from datetime import datetime, date, timedelta
@@ -12,7 +14,9 @@ from io import BytesIO
 from typing import List, Dict, Optional, Tuple
 
 from PIL import Image
-from sqlalchemy import select, func
+from sqlalchemy import bindparam, exists, func, insert, literal, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.dialects.postgresql import Any
 
 from models.base import SessionLocal
@@ -28,8 +32,104 @@ from models.entities import (
     WateringPlan,
     Reminder,
     WateringLog, Friendship, User, SharedPlant, Disease, PlantDisease,
+    HealthStatus, gen_uuid,
 )
 
+logger = logging.getLogger(__name__)
+
+# short_id -> user.id, cache per processo con TTL breve: la cancellazione di
+# un utente svuota solo la cache del worker che la serve, gli altri la
+# vedono al più dopo SHORT_ID_TTL secondi (o subito, se il FK fallisce).
+# Solo gli short_id esatti (8 caratteri): un prefisso più corto può
+# corrispondere a più utenti e il LIMIT 1 non è una risposta stabile.
+SHORT_ID_CACHE_SIZE = 10_000
+SHORT_ID_TTL = float(os.getenv("SHORT_ID_TTL", "60"))
+_short_id_cache: dict[str, tuple[float, str]] = {}
+
+
+def _short_to_uid(short_id: str) -> str:
+    """
+    Risolve short_id -> user.id. Se non trova nulla solleva LookupError, così
+    i "miss" non finiscono in cache (l'utente potrebbe registrarsi dopo).
+    """
+    cacheable = len(short_id) == 8
+    now = time.monotonic()
+    if cacheable:
+        hit = _short_id_cache.get(short_id)
+        if hit and hit[0] > now:
+            return hit[1]
+
+    with SessionLocal() as s:
+        user_id = (
+            s.query(User.id)
+            .filter(RepositoryService.short_id_clause(short_id))
+            .limit(1)
+            .scalar()
+        )
+    if not user_id:
+        _short_id_cache.pop(short_id, None)
+        raise LookupError(short_id)
+
+    user_id = str(user_id)
+    if cacheable:
+        if len(_short_id_cache) >= SHORT_ID_CACHE_SIZE:
+            _short_id_cache.pop(next(iter(_short_id_cache)), None)
+        _short_id_cache[short_id] = (now + SHORT_ID_TTL, user_id)
+    return user_id
+
+
+# Select delle pagine più richieste costruite una volta all'import (come le
+# _STMT_* di api/routes.py): a ogni chiamata si passano solo i parametri e la
+# forma compilata resta nella compiled cache dell'engine, senza ricostruire
+# l'albero dello statement né ricalcolarne la chiave di cache da zero
+_STMT_PLANTS_BY_USER = (
+    select(
+        Plant.id,
+        Plant.scientific_name,
+        Plant.common_name,
+        UserPlant.location_note,
+    )
+    .select_from(Plant)
+    .join(UserPlant, UserPlant.plant_id == Plant.id)
+    .where(UserPlant.user_id == bindparam("uid"))
+    .order_by(Plant.common_name, Plant.scientific_name)
+)
+
+_STMT_ALL_FAMILIES = (
+    select(Family.id, Family.name, func.count(Plant.id).label("plants_count"))
+    .select_from(Family)
+    .join(Plant, Plant.family_id == Family.id, isouter=True)
+    .group_by(Family.id, Family.name)
+    .order_by(Family.name.asc())
+)
+
+_STMT_PLANTS_CATALOG = (
+    select(
+        Plant.id,
+        Plant.scientific_name,
+        Plant.common_name,
+        Plant.category,
+        Plant.climate,
+        Plant.water_level,
+        Plant.light_level,
+        Family.name.label("family_name"),
+        func.count(PlantPhoto.id).label("photos_count"),
+    )
+    .select_from(Plant)
+    .join(Family, Plant.family_id == Family.id, isouter=True)
+    .join(PlantPhoto, PlantPhoto.plant_id == Plant.id, isouter=True)
+    .group_by(
+        Plant.id,
+        Plant.scientific_name,
+        Plant.common_name,
+        Plant.category,
+        Plant.climate,
+        Plant.water_level,
+        Plant.light_level,
+        Family.name,
+    )
+    .order_by(Plant.scientific_name.asc())
+)
 
 class RepositoryService:
     def __init__(self):
@@ -149,7 +249,7 @@ class RepositoryService:
         # 2) fallback: se c'è almeno genere + qualcosa, prova solo il genere
         if len(q_tokens) > 1:
             genus = q_tokens[0]
-            print(f"[RepositoryService] Fallback match sul genere: {genus!r} per {scientific_name!r}")
+            logger.debug("[RepositoryService] Fallback match sul genere: %r per %r", genus, scientific_name)
             item = _search_with_tokens([genus])
             if item is not None:
                 return item
@@ -169,23 +269,20 @@ class RepositoryService:
         - cercare quella family nel DB
         - restituire l'id della family, oppure None se non trovata.
         """
-        print(f"[get_family] scientific_name={scientific_name!r}")
+        logger.debug("[get_family] scientific_name=%r", scientific_name)
 
         item = self._match_houseplant_item(scientific_name)
         if not item:
-            print(f"[get_family] NO MATCH in JSON for scientific_name={scientific_name!r}")
+            logger.debug("[get_family] NO MATCH in JSON for scientific_name=%r", scientific_name)
             return None
 
         latin = (item.get("latin") or "").strip()
         matched_family_name = (item.get("family") or item.get("name") or "").strip()
 
-        print(
-            f"[get_family] MATCH item: latin={latin!r}, "
-            f"matched_family_name={matched_family_name!r}"
-        )
+        logger.debug("[get_family] MATCH item: latin=%r, matched_family_name=%r", latin, matched_family_name)
 
         if not matched_family_name:
-            print(f"[get_family] Item has no 'family'/'name' field, giving up.")
+            logger.debug("[get_family] Item has no 'family'/'name' field, giving up.")
             return None
 
         with self.Session() as s:
@@ -196,12 +293,10 @@ class RepositoryService:
             )
 
             if not fam:
-                print(
-                    f"[get_family] NO DB family row for name={matched_family_name!r}"
-                )
+                logger.debug("[get_family] NO DB family row for name=%r", matched_family_name)
                 return None
 
-            print(f"[get_family] DB family found: id={fam.id}, name={fam.name!r}")
+            logger.debug("[get_family] DB family found: id=%s, name=%r", fam.id, fam.name)
             return str(fam.id)
 
     def get_common_name(self, scientific_name: str) -> Optional[str]:
@@ -330,87 +425,60 @@ class RepositoryService:
         since_date = self._parse_since_to_date(since) if since else None
         location_note = (location_note or "").strip() or None
 
+        # Campi da sovrascrivere se il link esiste già
+        forced = {}
+        if overwrite or location_note is not None:
+            forced["location_note"] = location_note
+        if overwrite or since is not None:
+            forced["since"] = since_date
+
+        # Un solo statement: INSERT ... ON DUPLICATE KEY UPDATE
+        # (senza campi da aggiornare: no-op user_id = user_id)
+        stmt = mysql_insert(UserPlant).values(
+            user_id=user_id,
+            plant_id=plant_id,
+            location_note=location_note,
+            since=since_date,
+        )
+        stmt = stmt.on_duplicate_key_update(
+            {k: stmt.inserted[k] for k in forced} or {"user_id": UserPlant.user_id}
+        )
+
         with self.Session() as s:
-            plant = s.get(Plant, plant_id)
-            if not plant:
+            try:
+                s.execute(stmt)
+            except IntegrityError:
+                # FK su plant_id: la pianta non esiste
+                s.rollback()
                 raise ValueError("Plant not found")
 
-            up = s.get(UserPlant, (user_id, plant_id))
-            if up:
-                changed = False
-                if overwrite:
-                    if up.location_note != location_note:
-                        up.location_note = location_note
-                        changed = True
-                    if up.since != since_date:
-                        up.since = since_date
-                        changed = True
-                else:
-                    if location_note is not None and location_note != up.location_note:
-                        up.location_note = location_note
-                        changed = True
-                    if since is not None and since_date != up.since:
-                        up.since = since_date
-                        changed = True
-
-                if changed:
-                    s.commit()
-                    write_changes_upsert("user_plant", [{
-                        "user_id": user_id,
-                        "plant_id": plant_id,
-                        "location_note": up.location_note,
-                        "since": up.since.isoformat() if up.since else None,
-                    }])
-
-                return {
-                    "user_id": user_id,
-                    "plant_id": plant_id,
-                    "location_note": up.location_note,
-                    "since": up.since.isoformat() if up.since else None,
-                }
-
-            # Non esiste: crea
-            up = UserPlant(
-                user_id=user_id,
-                plant_id=plant_id,
-                location_note=location_note,
-                since=since_date,
-            )
-            s.add(up)
+            current = dict(forced)
+            missing = [c for c in ("location_note", "since") if c not in forced]
+            if missing:
+                # valori già salvati per i campi non sovrascritti
+                row = s.execute(
+                    select(*(getattr(UserPlant, c) for c in missing)).where(
+                        UserPlant.user_id == user_id, UserPlant.plant_id == plant_id
+                    )
+                ).one()
+                current.update(zip(missing, row))
             s.commit()
 
-            write_changes_upsert("user_plant", [{
-                "user_id": user_id,
-                "plant_id": plant_id,
-                "location_note": up.location_note,
-                "since": up.since.isoformat() if up.since else None,
-            }])
-
-            return {
-                "user_id": user_id,
-                "plant_id": plant_id,
-                "location_note": up.location_note,
-                "since": up.since.isoformat() if up.since else None,
-            }
+        result = {
+            "user_id": user_id,
+            "plant_id": plant_id,
+            "location_note": current["location_note"],
+            "since": current["since"].isoformat() if current["since"] else None,
+        }
+        write_changes_upsert("user_plant", [result])
+        return result
 
     # =======================
     # Query su DB
     # =======================
     def get_plants_by_user(self, user_id: str) -> List[Dict]:
         with self.Session() as s:
-            stmt = (
-                select(
-                    Plant.id,
-                    Plant.scientific_name,
-                    Plant.common_name,
-                    UserPlant.location_note,
-                )
-                .select_from(Plant)
-                .join(UserPlant, UserPlant.plant_id == Plant.id)
-                .where(UserPlant.user_id == user_id)
-                .order_by(Plant.common_name, Plant.scientific_name)
-            )
-            rows = s.execute(stmt).all()
+            rows = s.execute(_STMT_PLANTS_BY_USER, {"uid": user_id}).all()
             return [
                 {
                     "id": r.id,
@@ -423,14 +491,7 @@ class RepositoryService:
 
     def get_all_families(self) -> List[Dict]:
         with self.Session() as s:
-            q = (
-                select(Family.id, Family.name, func.count(Plant.id).label("plants_count"))
-                .select_from(Family)
-                .join(Plant, Plant.family_id == Family.id, isouter=True)
-                .group_by(Family.id, Family.name)
-                .order_by(Family.name.asc())
-            )
-            rows = s.execute(q).all()
+            rows = s.execute(_STMT_ALL_FAMILIES).all()
             return [
                 {
                     "id": fid,
@@ -442,34 +503,7 @@ class RepositoryService:
 
     def get_all_plants_catalog(self) -> List[Dict]:
         with self.Session() as s:
-            q = (
-                select(
-                    Plant.id,
-                    Plant.scientific_name,
-                    Plant.common_name,
-                    Plant.category,
-                    Plant.climate,
-                    Plant.water_level,
-                    Plant.light_level,
-                    Family.name.label("family_name"),
-                    func.count(PlantPhoto.id).label("photos_count"),
-                )
-                .select_from(Plant)
-                .join(Family, Plant.family_id == Family.id, isouter=True)
-                .join(PlantPhoto, PlantPhoto.plant_id == Plant.id, isouter=True)
-                .group_by(
-                    Plant.id,
-                    Plant.scientific_name,
-                    Plant.common_name,
-                    Plant.category,
-                    Plant.climate,
-                    Plant.water_level,
-                    Plant.light_level,
-                    Family.name,
-                )
-                .order_by(Plant.scientific_name.asc())
-            )
-            rows = s.execute(q).all()
+            rows = s.execute(_STMT_PLANTS_CATALOG).all()
 
             return [
                 {
@@ -632,35 +666,51 @@ class RepositoryService:
     # FRIENDSHIP
     # =======================
 
+    @staticmethod
+    def short_id_clause(short_id: str):
+        """
+        Condizione SQL per trovare un utente dal suo short_id.
+        """
+        if len(short_id) == 8:
+            # caso normale: uguaglianza sulla colonna indicizzata user.short_id
+            return User.short_id == short_id
+        # prefisso parziale: range scan sulla PK
+        return User.id.like(f"{short_id}%")
+
     def get_user_id_by_short(self, short_id: str) -> Optional[str]:
         """
         Restituisce l'ID completo dell'utente il cui UUID inizia con short_id.
         short_id = prime 8 cifre dell'UUID.
         """
-        print(f"[RepositoryService] get_user_id_by_short -> short_id={short_id}")
+        logger.debug("[RepositoryService] get_user_id_by_short -> short_id=%s", short_id)
 
         if not short_id or len(short_id) < 3:
             return None
 
-        with self.Session() as s:
-            row = (
-                s.query(User)
-                .filter(User.id.like(f"{short_id}%"))
-                .first()
-            )
+        try:
+            user_id = _short_to_uid(short_id)
+        except LookupError:
+            logger.debug("[RepositoryService] No user found for short_id=%s", short_id)
+            return None
 
-            if not row:
-                print(f"[RepositoryService] No user found for short_id={short_id}")
-                return None
+        logger.debug("[RepositoryService] Found user: %s", user_id)
+        return user_id
+
+    @staticmethod
+    def clear_short_id_cache() -> None:
+        """Da chiamare quando un utente viene cancellato."""
+        _short_id_cache.clear()
 
-            print(f"[RepositoryService] Found user: {row.id}")
-            return str(row.id)
+    @staticmethod
+    def forget_short_id(short_id: str) -> None:
+        """Scarta una voce risultata obsoleta (utente cancellato da un altro worker)."""
+        _short_id_cache.pop(short_id, None)
 
     def get_existing_friendship(self, user_a: str, user_b: str) -> Optional[Friendship]:
         """
         Controlla se una friendship esiste già in una delle due direzioni.
         """
-        print(f"[RepositoryService] get_existing_friendship {user_a} <-> {user_b}")
+        logger.debug("[RepositoryService] get_existing_friendship %s <-> %s", user_a, user_b)
 
         with self.Session() as s:
             fr = (
@@ -673,9 +723,9 @@ class RepositoryService:
             )
 
             if fr:
-                print(f"[RepositoryService] Existing friendship found: {fr.id}")
+                logger.debug("[RepositoryService] Existing friendship found: %s", fr.id)
             else:
-                print("[RepositoryService] No existing friendship")
+                logger.debug("[RepositoryService] No existing friendship")
 
             return fr
 
@@ -683,7 +733,7 @@ class RepositoryService:
         """
         Crea una friendship (senza controllare duplicati).
         """
-        print(f"[RepositoryService] create_friendship data={data}")
+        logger.debug("[RepositoryService] create_friendship data=%s", data)
 
         with self.Session() as s:
             fr = Friendship(**data)
@@ -700,14 +750,14 @@ class RepositoryService:
                 "updated_at": fr.updated_at.isoformat() if fr.updated_at else None,
             }])
 
-            print(f"[RepositoryService] Friendship created id={fr.id}")
+            logger.debug("[RepositoryService] Friendship created id=%s", fr.id)
             return fr
 
     def get_friendships_for_user(self, user_id: str):
         """
         Restituisce tutte le amicizie dove compare user_id.
         """
-        print(f"[RepositoryService] get_friendships_for_user user_id={user_id}")
+        logger.debug("[RepositoryService] get_friendships_for_user user_id=%s", user_id)
 
         with self.Session() as s:
             rows = (
@@ -720,55 +770,75 @@ class RepositoryService:
                 .all()
             )
 
-            print(f"[RepositoryService] Found {len(rows)} friendships.")
+            logger.debug("[RepositoryService] Found %s friendships.", len(rows))
             return rows
 
     def get_friendship_by_id(self, fid: str) -> Optional[Friendship]:
-        print(f"[RepositoryService] get_friendship_by_id fid={fid}")
+        logger.debug("[RepositoryService] get_friendship_by_id fid=%s", fid)
         with self.Session() as s:
             fr = s.get(Friendship, fid)
             if fr:
-                print(f"[RepositoryService] Found friendship {fid}")
+                logger.debug("[RepositoryService] Found friendship %s", fid)
             else:
-                print(f"[RepositoryService] Friendship {fid} NOT found")
+                logger.debug("[RepositoryService] Friendship %s NOT found", fid)
             return fr
 
     def delete_friendship(self, fid: str) -> None:
-        print(f"[RepositoryService] delete_friendship fid={fid}")
+        logger.debug("[RepositoryService] delete_friendship fid=%s", fid)
         with self.Session() as s:
             fr = s.get(Friendship, fid)
             if not fr:
-                print(f"[RepositoryService] Nothing to delete (not found)")
+                logger.debug("[RepositoryService] Nothing to delete (not found)")
                 return
 
             s.delete(fr)
             s.commit()
 
             write_changes_delete("friendship", fid)
-            print(f"[RepositoryService] Deleted friendship {fid}")
+            logger.debug("[RepositoryService] Deleted friendship %s", fid)
     
-    def update_friendship(self, fid: str, data: dict) -> Optional[Friendship]:
-        print(f"[RepositoryService] update_friendship fid={fid}, data={data}")
+    def update_friendship(self, fid: str, data: dict, member_id: Optional[str] = None) -> bool:
+        """
+        Aggiorna la friendship con un solo UPDATE (niente SELECT preventivo).
+        Se member_id è passato, aggiorna solo se l'utente fa parte della coppia.
+        Ritorna False se nessuna riga corrisponde (non trovata / non autorizzato).
+        """
+        logger.debug("[RepositoryService] update_friendship fid=%s, data=%s", fid, data)
         with self.Session() as s:
-            fr = s.get(Friendship, fid)
-            if not fr:
-                print("[RepositoryService] Friendship not found")
-                return None
-
-            for k, v in data.items():
-                setattr(fr, k, v)
+            stmt = update(Friendship).where(Friendship.id == fid)
+            if member_id is not None:
+                stmt = stmt.where(
+                    (Friendship.user_id_a == member_id) | (Friendship.user_id_b == member_id)
+                )
+            # rowcount = righe trovate (PyMySQL usa CLIENT.FOUND_ROWS)
+            res = s.execute(stmt.values(**data))
+            if res.rowcount == 0:
+                s.rollback()
+                logger.debug("[RepositoryService] Friendship not found")
+                return False
 
             s.commit()
 
+            # MySQL non ha RETURNING: rileggo solo le colonne per changes.json
+            row = s.execute(
+                select(
+                    Friendship.id,
+                    Friendship.user_id_a,
+                    Friendship.user_id_b,
+                    Friendship.status,
+                    Friendship.created_at,
+                ).where(Friendship.id == fid)
+            ).one()
+
             write_changes_upsert("friendship", [{
-                "id": fr.id,
-                "user_id_a": fr.user_id_a,
-                "user_id_b": fr.user_id_b,
-                "status": fr.status,
-                "created_at": fr.created_at.isoformat() if fr.created_at else None,
+                "id": row.id,
+                "user_id_a": row.user_id_a,
+                "user_id_b": row.user_id_b,
+                "status": row.status,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
             }])
 
-            return fr
+            return True
 
 
 
@@ -777,7 +847,7 @@ class RepositoryService:
     # ===========================
 
     def create_shared_plant(self, data: dict):
-        print(f"[RepositoryService] create_shared_plant data={data}")
+        logger.debug("[RepositoryService] create_shared_plant data=%s", data)
 
         with self.Session() as s:
             sp = SharedPlant(**data)
@@ -795,17 +865,89 @@ class RepositoryService:
                 "ended_sharing_at": sp.ended_sharing_at.isoformat() if sp.ended_sharing_at else None,
             }])
 
-            print(f"[RepositoryService] SharedPlant created id={sp.id}")
+            logger.debug("[RepositoryService] SharedPlant created id=%s", sp.id)
             return sp
 
+    def share_plant(
+            self,
+            *,
+            owner_id: str,
+            recipient_id: str,
+            plant_id: str,
+            can_edit: bool = True,
+    ) -> Optional[str]:
+        """
+        Condivide la pianta e la assegna al recipient in UNA transazione:
+          1) INSERT shared_plant ... SELECT ... WHERE NOT EXISTS (condivisione attiva)
+             -> controllo duplicati + insert in un solo statement (indice ix_sp_active)
+          2) INSERT user_plant ... ON DUPLICATE KEY UPDATE since
+        Ritorna l'id della nuova SharedPlant, oppure None se esiste già una
+        condivisione attiva per (owner, recipient, plant).
+        """
+        sp_id = gen_uuid()
+        now = datetime.utcnow()
+        today = now.date()
+
+        active_dup = exists().where(
+            SharedPlant.owner_user_id == owner_id,
+            SharedPlant.recipient_user_id == recipient_id,
+            SharedPlant.plant_id == plant_id,
+            SharedPlant.ended_sharing_at.is_(None),
+        )
+
+        with self.Session() as s:
+            res = s.execute(
+                insert(SharedPlant).from_select(
+                    ["id", "owner_user_id", "recipient_user_id", "plant_id", "can_edit", "created_at"],
+                    select(
+                        literal(sp_id),
+                        literal(owner_id),
+                        literal(recipient_id),
+                        literal(plant_id),
+                        literal(bool(can_edit)),
+                        literal(now),
+                    ).where(~active_dup),
+                )
+            )
+            if res.rowcount == 0:
+                s.rollback()
+                return None
+
+            link = mysql_insert(UserPlant).values(
+                user_id=recipient_id,
+                plant_id=plant_id,
+                since=today,
+                health_status=HealthStatus.HEALTHY.value,
+            )
+            s.execute(link.on_duplicate_key_update(since=link.inserted.since))
+            s.commit()
+
+        write_changes_upsert("shared_plant", [{
+            "id": sp_id,
+            "owner_user_id": owner_id,
+            "recipient_user_id": recipient_id,
+            "plant_id": plant_id,
+            "can_edit": bool(can_edit),
+            "created_at": now.isoformat(),
+            "ended_sharing_at": None,
+        }])
+        write_changes_upsert("user_plant", [{
+            "user_id": recipient_id,
+            "plant_id": plant_id,
+            "since": today.isoformat(),
+        }])
+
+        logger.debug("[RepositoryService] SharedPlant created id=%s", sp_id)
+        return sp_id
+
     def get_shared_plant_by_id(self, sid: str) -> Optional[SharedPlant]:
-        print(f"[RepositoryService] get_shared_plant_by_id sid={sid}")
+        logger.debug("[RepositoryService] get_shared_plant_by_id sid=%s", sid)
         with self.Session() as s:
             sp = s.get(SharedPlant, sid)
             if sp:
-                print(f"[RepositoryService] Found shared plant {sid}")
+                logger.debug("[RepositoryService] Found shared plant %s", sid)
             else:
-                print(f"[RepositoryService] Shared plant {sid} NOT found")
+                logger.debug("[RepositoryService] Shared plant %s NOT found", sid)
             return sp
 
     def get_shared_plants_for_user(self, user_id: str):
@@ -813,7 +955,7 @@ class RepositoryService:
         Ritorna tutte le piante condivise ATTIVE (ended_sharing_at IS NULL)
         dove l’utente è owner o recipient.
         """
-        print(f"[RepositoryService] get_shared_plants_for_user user_id={user_id}")
+        logger.debug("[RepositoryService] get_shared_plants_for_user user_id=%s", user_id)
 
         with self.Session() as s:
             shared = (
@@ -829,7 +971,7 @@ class RepositoryService:
                 .all()
             )
 
-            print(f"[RepositoryService] Found {len(shared)} active shared plants.")
+            logger.debug("[RepositoryService] Found %s active shared plants.", len(shared))
 
             out = []
 
@@ -883,7 +1025,7 @@ class RepositoryService:
                         with open(file_path, "rb") as f:
                             photo_b64 = base64.b64encode(f.read()).decode("utf-8")
                     except Exception as e:
-                        print(f"[WARN] Cannot read file {file_path}: {e}")
+                        logger.warning("[WARN] Cannot read file %s: %s", file_path, e)
 
                 # ---------------------------------------------------------
                 # OUTPUT
@@ -948,11 +1090,11 @@ class RepositoryService:
             }
 
     def update_shared_plant(self, sid: str, data: dict):
-        print(f"[RepositoryService] update_shared_plant sid={sid}, data={data}")
+        logger.debug("[RepositoryService] update_shared_plant sid=%s, data=%s", sid, data)
         with self.Session() as s:
             sp = s.get(SharedPlant, sid)
             if not sp:
-                print("[RepositoryService] Shared plant not found")
+                logger.debug("[RepositoryService] Shared plant not found")
                 return None
 
             for k, v in data.items():
@@ -977,17 +1119,17 @@ class RepositoryService:
         Termina una condivisione (soft delete) impostando ended_sharing_at.
         Solo l'owner può rimuoverla.
         """
-        print(f"[RepositoryService] soft-delete shared plant sid={sid}")
+        logger.debug("[RepositoryService] soft-delete shared plant sid=%s", sid)
 
         with self.Session() as s:
             sp = s.get(SharedPlant, sid)
             if not sp:
-                print("[RepositoryService] Not found")
+                logger.debug("[RepositoryService] Not found")
                 return False
 
             # Autorizzazione: solo l'owner può rimuovere la condivisione
             if sp.owner_user_id != user_id:
-                print("[RepositoryService] Not authorized")
+                logger.debug("[RepositoryService] Not authorized")
                 return False
 
             # Soft delete
@@ -1005,7 +1147,7 @@ class RepositoryService:
                 "ended_sharing_at": sp.ended_sharing_at.isoformat() if sp.ended_sharing_at else None,
             }])
 
-            print(f"[RepositoryService] Shared plant {sid} marked as ended")
+            logger.debug("[RepositoryService] Shared plant %s marked as ended", sid)
             return True
 
     # =======================
@@ -1280,8 +1422,8 @@ class RepositoryService:
                 base_dir = os.path.join("uploads", plant_id)
                 image_path = os.path.join(base_dir, photo_row.url)
 
-                print("[DEBUG PHOTO] Image path:", image_path)
-                print("[DEBUG PHOTO] Exists? ->", os.path.exists(image_path))
+                logger.debug("[DEBUG PHOTO] Image path: %s", image_path)
+                logger.debug("[DEBUG PHOTO] Exists? -> %s", os.path.exists(image_path))
 
                 if os.path.exists(image_path):
                     try:
@@ -1297,10 +1439,10 @@ class RepositoryService:
                         photo_base64 = base64.b64encode(buffer.read()).decode("utf-8")
 
                     except Exception as e:
-                        print("[DEBUG PHOTO] ERROR opening/compressing image:", e)
+                        logger.debug("[DEBUG PHOTO] ERROR opening/compressing image: %s", e)
                         photo_base64 = None
                 else:
-                    print("[DEBUG PHOTO] File not found on disk.")
+                    logger.debug("[DEBUG PHOTO] File not found on disk.")
 
             # ==========================
             # RETURN INFO
@@ -1449,7 +1591,7 @@ class RepositoryService:
           - liste vuote
         Elimina duplicati mantenendo l’ordine.
         """
-        print(f"[Repository] get_family_symptoms family_id={family_id}")
+        logger.debug("[Repository] get_family_symptoms family_id=%s", family_id)
 
         with self.Session() as s:
             diseases = (
@@ -1487,7 +1629,7 @@ class RepositoryService:
             }
 
     def enrich_disease_prediction(self, family_id: str, predicted_label: str, image_base64: str):
-        print(f"[enrich_disease_prediction] family={family_id}, label={predicted_label}")
+        logger.debug("[enrich_disease_prediction] family=%s, label=%s", family_id, predicted_label)
 
         label = (predicted_label or "").strip()
         if not label:
@@ -1549,7 +1691,7 @@ class RepositoryService:
             # 1️⃣ Verifica plant
             plant = s.get(Plant, plant_id)
             if not plant:
-                print("[ERROR] Plant not found:", plant_id)
+                logger.debug("[ERROR] Plant not found: %s", plant_id)
                 return None
 
             # 2️⃣ Verifica disease (solo se disease_id è valido)
@@ -1557,11 +1699,11 @@ class RepositoryService:
             if disease_id:
                 disease = s.get(Disease, disease_id)
                 if not disease:
-                    print("[ERROR] Disease not found:", disease_id)
+                    logger.debug("[ERROR] Disease not found: %s", disease_id)
                     return None
             else:
                 # Unknown → non salvare un record plant_disease
-                print("[INFO] No disease_id provided → skipping plant_disease creation")
+                logger.debug("[INFO] No disease_id provided → skipping plant_disease creation")
                 return None
 
             # 3️⃣ Crea record
@@ -1605,7 +1747,7 @@ class RepositoryService:
             # 1️⃣ Verifica plant
             plant = s.get(Plant, plant_id)
             if not plant:
-                print("[ERROR] Plant not found:", plant_id)
+                logger.debug("[ERROR] Plant not found: %s", plant_id)
                 return None
 
             # 2️⃣ Prepara path
@@ -1659,7 +1801,7 @@ class RepositoryService:
         with self.Session() as s:
             up = s.get(UserPlant, (user_id, plant_id))
             if not up:
-                print("[ERROR] UserPlant link not found:", user_id, plant_id)
+                logger.debug("[ERROR] UserPlant link not found: %s %s", user_id, plant_id)
                 return None
 
             up.health_status = new_status
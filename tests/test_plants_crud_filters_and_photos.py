@@ -3,6 +3,8 @@ import os
 import uuid
 import time
 
+import pytest
+
 from conftest import ensure_family, find_plant_id, get_test_image_base64
 
 
@@ -167,3 +169,112 @@ def test_plant_update_invalid_uuid(user_token_and_session, base_url):
     })
     assert r.status_code in (400, 404), f"Expected 400/404, got {r.status_code}"
 
+
+# ==========================================
+# Photo Upload Tests
+# ==========================================
+
+
+def _create_test_plant(http, base_url):
+    """
+    Creates a fresh plant the user owns. Returns its id.
+    PlantNet overrides the scientific name, so there is no lookup fallback:
+    skip only when identification itself is unavailable.
+    """
+    fam_id = ensure_family(http, base_url, "Testaceae")
+    r = http.post(f"{base_url}/plant/add", json={
+        "scientific_name": f"Testium uploadensis {uuid.uuid4().hex[:6]}",
+        "common_name": "Upload Plant",
+        "use": "ornamental",
+        "size": "small",
+        "family_id": fam_id,
+        "image": get_test_image_base64(),
+    })
+    if r.status_code == 422 or (r.status_code == 500 and "Image processing failed" in r.text):
+        pytest.skip(f"Plant identification unavailable: {r.status_code} {r.text}")
+    assert r.status_code == 201, f"/plant/add failed: {r.status_code} {r.text}"
+    return r.json()["id"]
+
+
+def test_photo_upload_same_content_is_deduplicated(user_token_and_session, base_url):
+    """Verify that a second upload of identical bytes returns the existing photo (200)."""
+    access, http = user_token_and_session
+    pid = _create_test_plant(http, base_url)
+
+    content = os.urandom(256)
+    r = http.post(
+        f"{base_url}/upload/plant-photo",
+        files={"file": ("dup.jpg", content, "image/jpeg")},
+        data={"plant_id": pid},
+    )
+    assert r.status_code == 201, r.text
+    photo_id = r.json()["photo_id"]
+
+    r = http.post(
+        f"{base_url}/upload/plant-photo",
+        files={"file": ("dup-again.jpg", content, "image/jpeg")},
+        data={"plant_id": pid},
+    )
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["duplicate"] is True
+    assert body["photo_id"] == photo_id
+
+    http.delete(f"{base_url}/plant/delete/{pid}")
+
+
+def test_photo_upload_raw_body(user_token_and_session, base_url):
+    """Verify the raw-body upload (Content-Type image/*, params in query string)."""
+    access, http = user_token_and_session
+    pid = _create_test_plant(http, base_url)
+
+    content = os.urandom(256)
+    r = http.post(
+        f"{base_url}/upload/plant-photo",
+        params={"plant_id": pid, "caption": "raw"},
+        data=content,
+        headers={"Content-Type": "image/png"},
+    )
+    assert r.status_code == 201, r.text
+    url = r.json()["url"]
+    assert url.endswith(".png")
+
+    app_root = base_url.rsplit("/api", 1)[0]
+    file_resp = http.get(f"{app_root}{url}")
+    assert file_resp.status_code == 200
+    assert file_resp.content == content
+
+    # raw senza plant_id → 400
+    r = http.post(
+        f"{base_url}/upload/plant-photo",
+        data=content,
+        headers={"Content-Type": "image/png"},
+    )
+    assert r.status_code == 400
+
+    http.delete(f"{base_url}/plant/delete/{pid}")
+
+
+# ==========================================
+# Catalog Caching Tests
+# ==========================================
+
+
+def test_catalog_etag_revalidation(user_token_and_session, base_url):
+    """Verify catalog GETs carry an ETag and answer If-None-Match with 304."""
+    access, http = user_token_and_session
+
+    r = http.get(f"{base_url}/plants/all")
+    assert r.status_code == 200
+    etag = r.headers.get("ETag")
+    assert etag
+    assert "max-age" in r.headers.get("Cache-Control", "")
+
+    r = http.get(f"{base_url}/plants/all", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert not r.content
+
+    # ETag non corrispondente → corpo completo
+    r = http.get(f"{base_url}/plants/all", headers={"If-None-Match": 'W/"stale"'})
+    assert r.status_code == 200
+    assert isinstance(r.json(), list)
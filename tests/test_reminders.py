@@ -113,6 +113,63 @@ def test_reminder_delete(user_token_and_session, base_url):
     assert rid not in [rem["id"] for rem in r.json()]
 
 
+def test_reminder_bulk_add_is_idempotent(user_token_and_session, base_url):
+    """Test bulk insert: client ids are kept and a resend skips existing rows."""
+    access, http = user_token_and_session
+
+    fixed_id = str(uuid.uuid4())
+    body = {"reminders": [
+        {"id": fixed_id, "title": "Bulk 1", "scheduled_at": "2030-03-01 08:00:00"},
+        {"title": "Bulk 2", "scheduled_at": "2030-03-02 08:00:00"},
+    ]}
+    r = http.post(f"{base_url}/reminder/bulk", json=body)
+    assert r.status_code == 201, f"reminder/bulk failed: {r.text}"
+    created = r.json()["created"]
+    assert len(created) == 2 and fixed_id in created
+
+    # Resend: nothing new
+    r = http.post(f"{base_url}/reminder/bulk", json={"reminders": body["reminders"][:1]})
+    assert r.status_code == 200
+    assert r.json()["skipped"] == [fixed_id]
+
+    # Missing required field -> 400
+    r = http.post(f"{base_url}/reminder/bulk", json={"reminders": [{"title": "x"}]})
+    assert r.status_code == 400
+
+    # Cleanup
+    for rid in created:
+        http.delete(f"{base_url}/reminder/delete/{rid}")
+
+
+def test_reminder_bulk_rejects_duplicate_and_foreign_ids(user_token_and_session, additional_user, base_url):
+    """Test bulk insert: repeated ids in one batch -> 400, another user's id -> 409."""
+    access_a, http_a = user_token_and_session
+    http_b = additional_user["http"]
+
+    dup_id = str(uuid.uuid4())
+    r = http_a.post(f"{base_url}/reminder/bulk", json={"reminders": [
+        {"id": dup_id, "title": "Dup 1", "scheduled_at": "2030-03-01 08:00:00"},
+        {"id": dup_id, "title": "Dup 2", "scheduled_at": "2030-03-02 08:00:00"},
+    ]})
+    assert r.status_code == 400
+
+    r = http_a.post(f"{base_url}/reminder/add", json={
+        "title": "Owned by A",
+        "scheduled_at": "2030-03-01 08:00:00"
+    })
+    assert r.status_code == 201
+    rid_a = r.json()["id"]
+
+    # User B reuses A's id: not reported as already stored
+    r = http_b.post(f"{base_url}/reminder/bulk", json={"reminders": [
+        {"id": rid_a, "title": "Hijack", "scheduled_at": "2030-03-01 08:00:00"},
+    ]})
+    assert r.status_code == 409
+
+    # Cleanup
+    http_a.delete(f"{base_url}/reminder/delete/{rid_a}")
+
+
 def test_reminder_add_missing_fields(user_token_and_session, base_url):
     """Test reminder creation fails without required fields."""
     access, http = user_token_and_session
@@ -130,6 +187,18 @@ def test_reminder_add_missing_fields(user_token_and_session, base_url):
     assert r.status_code == 400
 
 
+def test_reminder_add_invalid_datetime(user_token_and_session, base_url):
+    """Test malformed scheduled_at is rejected with 400 before reaching the DB."""
+    access, http = user_token_and_session
+
+    r = http.post(f"{base_url}/reminder/add", json={
+        "title": "Test",
+        "scheduled_at": "2030-13-45 08:00:00"
+    })
+    assert r.status_code == 400
+    assert "scheduled_at" in r.json()["error"]
+
+
 # ==========================================
 # Reminder Isolation Tests
 # ==========================================
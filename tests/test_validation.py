@@ -175,3 +175,26 @@ def test_TAD0_watering_plan_and_log_validation(user_token_and_session, base_url)
         f"got {r.status_code} {r.text}"
     )
 
+
+# ==========================================
+# JSON Body Guards
+# ==========================================
+
+
+def test_json_body_guards(user_token_and_session, base_url):
+    """
+    Body JSON non validi → 400 JSON (non 500); body oltre JSON_BODY_MAX_BYTES
+    (default 20 MiB) → 413 senza essere letto.
+    """
+    access, http = user_token_and_session
+    url = f"{base_url}/reminder/add"
+    headers = {"Content-Type": "application/json"}
+
+    for raw in (b"", b"{not json", b"[1, 2, 3]"):
+        r = http.post(url, data=raw, headers=headers)
+        assert r.status_code == 400, f"{raw!r} -> {r.status_code} {r.text}"
+        assert r.headers["Content-Type"].startswith("application/json")
+
+    too_big = b'{"title": "' + b"x" * (21 * 1024 * 1024) + b'"}'
+    r = http.post(url, data=too_big, headers=headers)
+    assert r.status_code == 413, r.text
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import os
+import typing as t
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dipendenza opzionale: si ripiega su gzip
+    brotli = None
+
+# sotto questa soglia la compressione costa più di quanto risparmia
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 5
+
+
+def _pick_encoding(accept_encodings) -> str | None:
+    if brotli is not None and "br" in accept_encodings:
+        return "br"
+    if "gzip" in accept_encodings:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding: str):
+    """
+    Terna (process(bytes) -> bytes, flush() -> bytes, finish() -> bytes) per
+    la codifica scelta. flush() svuota il buffer interno senza chiudere lo
+    stream (sync flush): il client può decodificare quanto ricevuto finora.
+    """
+    if encoding == "br":
+        c = brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+        return c.process, c.flush, c.finish
+    c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = header gzip
+    return c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+
+
+def _compress_iter(chunks: t.Iterable[bytes], encoding: str) -> t.Iterator[bytes]:
+    process, flush, finish = _compressor(encoding)
+    for chunk in chunks:
+        # senza flush zlib/brotli tratterrebbero i blocchi fino a finish() e
+        # lo streaming arriverebbe al client tutto in una volta alla fine
+        out = process(chunk) + flush()
+        if out:
+            yield out
+    yield finish()
+
+
+def compress_json_response(response, accept_encodings):
+    """
+    Comprime (Brotli se disponibile e accettato dal client, altrimenti gzip)
+    le risposte JSON: liste di reminder/foto/log ripetono le stesse chiavi e
+    date ISO a ogni riga e si riducono di 5-10 volte.
+
+    - risposte bufferizzate: compresse in blocco se >= COMPRESS_MIN_BYTES
+    - risposte in streaming (_stream_json_list): compresse blocco per blocco,
+      senza Content-Length e con X-Accel-Buffering: no, così nginx inoltra
+      i blocchi invece di accumularli
+    """
+    if (
+        response.mimetype != "application/json"
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _pick_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_iter(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+        response.headers["X-Accel-Buffering"] = "no"
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        process, _, finish = _compressor(encoding)
+        response.set_data(process(body) + finish())
+
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -29,6 +29,20 @@ class Settings:
     DB_PASS: str = os.getenv("DB_PASS", "ecogrow")
     DB_NAME: str = os.getenv("DB_NAME", "ecogrow")
     DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "6"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING: bool = _bool_env("DB_POOL_PRE_PING", False)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_ISOLATION_LEVEL: str = os.getenv("DB_ISOLATION_LEVEL", "READ-COMMITTED")
+    DB_LOCK_WAIT_TIMEOUT: int = int(os.getenv("DB_LOCK_WAIT_TIMEOUT", "5"))
+    # tetto ai SELECT (ms, max_execution_time di MySQL); 0 = nessun limite
+    DB_MAX_EXECUTION_MS: int = int(os.getenv("DB_MAX_EXECUTION_MS", "10000"))
+    DB_QUERY_CACHE_SIZE: int = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+    # schema + seed da changes.json all'avvio; false se lo schema lo gestisce
+    # uno step di deploy separato (avvio del worker senza DDL né replay)
+    DB_AUTO_MIGRATE: bool = _bool_env("DB_AUTO_MIGRATE", True)
+    DB_WAIT_TIMEOUT: float = _float_env("DB_WAIT_TIMEOUT", 30.0)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
     
     ECOGROW_MODEL_CACHE: str = os.getenv("ECOGROW_MODEL_CACHE", "artifacts/pretrained")
     ECOGROW_CLIP_PRETRAINED: str = os.getenv("ECOGROW_CLIP_PRETRAINED", "")
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import typing as t
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+# Opzioni condivise da jsonify (provider) e dagli helper di streaming in api/routes.py
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def orjson_dumps(obj: t.Any) -> bytes:
+    """Serializza con orjson; i tipi non nativi passano dal default di Flask."""
+    return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider di Flask basato su orjson (C): jsonify() e request.get_json()
+    passano da qui.
+
+    Differenze rispetto al provider di default:
+    - datetime/date/UUID serializzati nativamente (datetime e date in ISO-8601,
+      non nel formato HTTP-date di Flask)
+    - chiavi non ordinate (JSON_SORT_KEYS=False era già l'intento della config)
+    - output UTF-8 invece di escape \\uXXXX
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        return orjson_dumps(obj).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: t.Any) -> t.Any:
+        return orjson.loads(s)
+
+    def response(self, *args: t.Any, **kwargs: t.Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = ORJSON_OPTIONS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=option)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+_listener: QueueListener | None = None
+
+
+def setup_logging(level: str = "INFO") -> None:
+    """
+    Configura il root logger con QueueHandler + QueueListener: i thread delle
+    richieste accodano soltanto il record, la scrittura su stderr avviene sul
+    thread del listener. Idempotente (create_app può essere chiamata più volte).
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level, logging.INFO))
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(
+        logging.Formatter("[%(asctime)s] %(levelname)s in %(name)s: %(message)s")
+    )
+    log_queue: queue.Queue = queue.Queue(-1)
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root.handlers[:] = [QueueHandler(log_queue)]
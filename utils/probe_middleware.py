@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import typing as t
+
+# path -> corpo JSON, identico a quello delle route Flask corrispondenti
+PROBE_BODIES: dict[str, bytes] = {
+    "/health": b'{"status":"ok"}',
+    "/api/ping": b'{"ping":"pong"}',
+}
+
+
+class ProbeMiddleware:
+    """
+    Risponde ai probe dei load balancer (GET/HEAD su /health e /api/ping)
+    prima del dispatch di Flask: niente routing, before_request, contesto di
+    richiesta né jsonify. Le route Flask restano per gli altri metodi (405)
+    e quando il middleware non è installato.
+    """
+
+    def __init__(self, app: t.Callable, bodies: dict[str, bytes] | None = None):
+        self.app = app
+        self.responses = {
+            path: (
+                [("Content-Type", "application/json"), ("Content-Length", str(len(body)))],
+                body,
+            )
+            for path, body in (bodies or PROBE_BODIES).items()
+        }
+
+    def __call__(self, environ, start_response):
+        hit = self.responses.get(environ.get("PATH_INFO", ""))
+        method = environ.get("REQUEST_METHOD")
+        if hit is None or method not in ("GET", "HEAD"):
+            return self.app(environ, start_response)
+        headers, body = hit
+        start_response("200 OK", list(headers))
+        return [b""] if method == "HEAD" else [body]